@@ -1,7 +1,7 @@
 from json import loads, dumps
 from os import environ
 
-from gink import Directory
+from gink import Directory, Database, ChangeVersions
 
 """
 WSGI application to GET, PUT, and DELETE data in a Gink database.
@@ -18,13 +18,21 @@ curl -X GET http://localhost:8099/key
 
 # Returns 3
 
+GET responses carry an ETag; repeating the request with it in If-None-Match gets a
+304 Not Modified (without reading any data) until something in the database changes.
+
 To run this application, pass --wsgi crud.app when starting gink.
 
 Set auth key with env AUTH_TOKEN.
 
 """
+_versions = None
+
 def app(env, start_response):
+    global _versions
     root = Directory(root=True)
+    if _versions is None:
+        _versions = ChangeVersions(Database.get_most_recently_created_database())
     auth_token = environ.get("AUTH_TOKEN")
 
     # If auth token is present, expect token in the Authorization header.
@@ -38,6 +46,10 @@ def app(env, start_response):
         return _bad_path_handler(start_response)
 
     if env.get("REQUEST_METHOD") == "GET":
+        not_modified = _versions.not_modified(env, start_response)
+        if not_modified is not None:
+            return not_modified
+        etag = _versions.get_etag()  # taken before reading, so it's never newer than the data
         default = object()
         try:
             result = root.get(raw_path.split("/"), default)
@@ -45,7 +57,7 @@ def app(env, start_response):
             return _data_not_found_handler(start_response, "A subdirectory in the path does not exist.")
         if result is default:
             return _data_not_found_handler(start_response)
-        return _get_handler(result, start_response)
+        return _get_handler(result, start_response, etag)
 
     elif env.get("REQUEST_METHOD") == "PUT":
         request_body: bytes = env.get("wsgi.input").read()
@@ -78,7 +90,7 @@ def app(env, start_response):
     else:
         return _bad_method_handler(start_response)
 
-def _get_handler(data, start_response):
+def _get_handler(data, start_response, etag=None):
     """
     Default response handler to return gink data in JSON format.
     """
@@ -92,6 +104,8 @@ def _get_handler(data, start_response):
         content_type = 'application/json'
         data = dumps(data).encode()
     headers = [('Content-type', content_type)]
+    if etag:
+        headers.append(('ETag', etag))
     start_response(status, headers)
     assert type(data) == bytes, "data isn't bytes?"
     return [data]
@@ -21,11 +21,17 @@ from .impl.builders import ClaimBuilder
 from .impl.tuples import Chain, SequenceKey
 from .impl.braid import Braid
 from .impl.accumulator import Accumulator, Decimal
+from .impl.blob import Blob, BlobWriter
 from .impl.timing import Timer, report_timing
 from .impl.selectable_console import SelectableConsole
 from .impl.braid_server import BraidServer
 from .impl.relay import Relay
-from .impl.looping import loop
+from .impl.async_relay import AsyncRelay
+from .impl.change_versions import ChangeVersions
+from .impl.subscriptions import ContainerChanges, Subscription
+from .impl.change_stream import ChangeStream, Resync
+from .impl.sse_feed import SseFeed
+from .impl.looping import loop, call_at, call_later, call_every
 from .impl.typedefs import (
     inf, GenericTimestamp, Request, AUTH_FULL, AUTH_NONE, AUTH_RITE, AUTH_READ, AUTH_WRITE, AuthFunc
 )
@@ -70,12 +76,24 @@ __all__ = [
     "GenericTimestamp",
     "Accumulator",
     "Decimal",
+    "Blob",
+    "BlobWriter",
     "Timer",
     "report_timing",
     "SelectableConsole",
     "BraidServer",
     "Relay",
+    "AsyncRelay",
+    "ChangeVersions",
+    "ContainerChanges",
+    "Subscription",
+    "ChangeStream",
+    "Resync",
+    "SseFeed",
     "loop",
+    "call_at",
+    "call_later",
+    "call_every",
     "get_identity",
     "Request",
     "Pair",
@@ -18,8 +18,12 @@ from .impl.selectable_console import SelectableConsole
 from .impl.utilities import get_identity, make_auth_func
 from .impl.looping import loop
 from .impl.wsgi_listener import WsgiListener
+from .impl.sse_feed import SseFeed
 from .impl.decomposition import Decomposition
 from .impl.get_container import get_container
+from .impl.blob import Blob, BlobWriter, DEFAULT_CHUNK_SIZE, put_chunks  # dumps store blobs' chunks with it
+from .impl.coding import make_array  # arrays in dumps are written as calls to it
+from .impl.workers import fork_workers
 
 parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
 parser.add_argument("db_path", nargs="?", help="path to a database; created if doesn't exist")
@@ -27,6 +31,7 @@ parser.add_argument("--verbosity", "-v", default="INFO", help="the log level to
 parser.add_argument("--file_format", help="storage file format", choices=["lmdb", "binlog"])
 parser.add_argument("--set", help="set key/value in path from root, reading value from stdin")
 parser.add_argument("--get", help="get a value from specified path and write to stdout")
+parser.add_argument("--blob", action="store_true", help="with --set, stream stdin into a chunked blob")
 parser.add_argument("--delete", help="delete the value at the specified key or path")
 parser.add_argument("--dump", nargs="?", const=True,
                     help="dump contents to stdout and exit (path or muid, or everything if blank)")
@@ -41,7 +46,13 @@ parser.add_argument("--limit", help="limit the number of log entries")
 parser.add_argument("--log_format", help="format for the log")
 parser.add_argument("--listen_on", "-l", nargs="?", const=True,
                     help="start listening on ip:port (default *:8080)")
-parser.add_argument("--connect_to", "-c", nargs="+", help="remote instances to connect to")
+parser.add_argument("--listen_unix", type=Path, help="also listen on a unix domain socket at this path")
+parser.add_argument("--connect_to", "-c", nargs="+",
+                    help="remote instances to connect to (ws://, wss://, or unix:///path/to/socket)")
+parser.add_argument("--bootstrap", action="store_true",
+                    help="with --connect_to and an empty db, start from a snapshot instead of every bundle")
+parser.add_argument("--no_reconnect", action="store_true",
+                    help="don't keep retrying --connect_to peers that can't be reached or disconnect")
 parser.add_argument("--show_arguments", action="store_true")
 parser.add_argument("--show_bundles", action="store_true")
 parser.add_argument("--repr", action="store_true", help="show repr of stored value when using --get")
@@ -51,6 +62,10 @@ parser.add_argument("--identity", help="explicitly set identity to be associated
 parser.add_argument("--starts", help="include starting bundles when showing log", action="store_true")
 parser.add_argument("--wsgi", help="serve module.function via wsgi")
 parser.add_argument("--wsgi_listen_on", help="ip:port or port to listen on (defaults to *:8081)")
+parser.add_argument("--wsgi_threads", type=int, default=0,
+                    help="handle wsgi requests on this many threads (default: in the sync loop)")
+parser.add_argument("--sse", nargs="?", const="/changes", metavar="PATH",
+                    help="stream changes as server-sent events at PATH (default /changes) on the wsgi port")
 parser.add_argument("--auth_token", default=environ.get("GINK_AUTH_TOKEN"), help="auth token for connections")
 parser.add_argument("--ssl-cert", default=environ.get("GINK_SSL_CERT"), help="path to ssl certificate file")
 parser.add_argument("--ssl-key", default=environ.get("GINK_SSL_KEY"), help="path to ssl key file")
@@ -60,6 +75,8 @@ parser.add_argument("--exclusive", action="store_true", help="prevent other prog
 parser.add_argument("--json", action="store_true", help="expect/output json to set and get")
 parser.add_argument("--jsonl", action="store_true", help="output json lines")
 parser.add_argument("--string", action="store_true", help="store a string when passed to set (default is bytes)")
+parser.add_argument("--workers", type=int, default=1,
+                    help="with --listen_on, fork this many relay processes sharing the port and db file")
 args: Namespace = parser.parse_args()
 if args.show_arguments:
     print(args)
@@ -72,6 +89,16 @@ if args.parse:
     LogBackedStore.dump(args.db_path)
     exit(0)
 
+worker: Optional[int] = None
+if args.workers > 1:
+    if not args.listen_on or args.db_path is None:
+        parser.error("--workers needs --listen_on and a db_path that the workers can share")
+    # fork before opening the store: each worker needs its own LMDB environment
+    worker, exit_status = fork_workers(args.workers)
+    if worker is None:
+        exit(exit_status)
+    logger.info("worker %d starting", worker)
+
 store: AbstractStore
 if args.db_path is None:
     logger.warning("Using a transient in-memory database.")
@@ -128,6 +155,9 @@ if args.show_bundles:
         bundle_builder = decomposition.get_builder()
         print("=" * 79)
         print(bundle_builder)
+        if bundle_builder.encrypted:
+            for change in store.get_changes(decomposition):
+                print(change)
     store.get_bundles(show)
     database.close()
     exit(0)
@@ -142,6 +172,12 @@ if args.set:
         root.set(args.set.split("/"), parsed, comment=args.comment)
     elif args.jsonl:
         raise NotImplementedError("not set up to read jsonl")
+    elif args.blob:
+        with BlobWriter(database, comment=args.comment) as writer:
+            while chunk := stdin.buffer.read(DEFAULT_CHUNK_SIZE):
+                writer.write(chunk)
+        root.set(args.set.split("/"), writer.get_blob(), comment=args.comment)
+        database.close()
     else:
         value = stdin.buffer.read()
         container = root
@@ -173,6 +209,12 @@ if args.get:
             exit(0)
         print(f"don't know how to write as json: {type(result)}", file=stderr)
         exit(1)
+    if isinstance(result, Blob):
+        for chunk in result.iter_chunks(database):
+            stdout.buffer.write(chunk)
+        stdout.buffer.flush()
+        database.close()
+        exit(0)
     if isinstance(result, str):
         result = result.encode()
     assert isinstance(result, bytes)
@@ -234,19 +276,23 @@ def parse_listen_on(
     return (ip_addr, port)
 
 wsgi_listener: Optional[WsgiListener] = None
-if args.wsgi:
-    match = fullmatch(r"([\w.]+)\.(\w+)", args.wsgi)
-    if not match:
-        raise ValueError(f"need to specify module.function, got '{args.wsgi}'")
-    module, function = match.groups()
-    imported = import_module(module)
-    app = getattr(imported, function, None)
-    if not app:
-        raise ValueError(f"{function} not found in {module}")
+if (args.wsgi or args.sse) and not worker:  # only the first worker serves wsgi
+    app = None
+    if args.wsgi:
+        match = fullmatch(r"([\w.]+)\.(\w+)", args.wsgi)
+        if not match:
+            raise ValueError(f"need to specify module.function, got '{args.wsgi}'")
+        module, function = match.groups()
+        imported = import_module(module)
+        app = getattr(imported, function, None)
+        if not app:
+            raise ValueError(f"{function} not found in {module}")
     ip_addr, port = parse_listen_on(args.wsgi_listen_on, "*", "8081")
     # Note: this should always be called after a database is initialized
     # to prevent Database.get_last() from breaking.
-    wsgi_listener = WsgiListener(app, ip_addr=ip_addr, port=int(port))
+    sse_feed = SseFeed(database, args.sse) if args.sse else None
+    wsgi_listener = WsgiListener(
+        app, ip_addr=ip_addr, port=int(port), threads=args.wsgi_threads, sse_feed=sse_feed)
 
 auth_func = make_auth_func(args.auth_token) if args.auth_token else None
 
@@ -257,19 +303,24 @@ if args.listen_on:
         port=port,
         auth=auth_func,
         certfile=args.ssl_cert,
-        keyfile=args.ssl_key)
+        keyfile=args.ssl_key,
+        reuse_port=worker is not None)
+
+if args.listen_unix and not worker:  # a socket file can't be shared, so only the first worker has it
+    database.start_listening(unix_path=args.listen_unix, auth=auth_func)
 
-for target in (args.connect_to or []):
+# when there are several workers only the first dials out; the others see what it gets via the store
+for target in ((args.connect_to or []) if not worker else []):
     auth_data = f"Token {args.auth_token}" if args.auth_token else None
-    database.connect_to(target, auth_data=auth_data)
+    database.connect_to(target, auth_data=auth_data, bootstrap=args.bootstrap, reconnect=not args.no_reconnect)
 
 console: Optional[SelectableConsole]
-if args.interactive or stdin.isatty():
+if worker is None and (args.interactive or stdin.isatty()):
     console = SelectableConsole(locals(), heartbeat_to=args.heartbeat_to)
 else:
     console = None
 
-if console or args.loop:
+if console or args.loop or worker is not None:
     loop(console, database, wsgi_listener, context_manager=console)
 else:
     exec(stdin.read())
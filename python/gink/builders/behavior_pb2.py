@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/behavior.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14proto/behavior.proto\x12\x04gink*\xe6\x01\n\x08\x42\x65havior\x12\x0f\n\x0bUNSPECIFIED\x10\x00\x12\x07\n\x03\x42OX\x10\x01\x12\x0c\n\x08SEQUENCE\x10\x02\x12\x0c\n\x08PAIR_MAP\x10\x03\x12\r\n\tDIRECTORY\x10\x04\x12\x0b\n\x07KEY_SET\x10\x05\x12\t\n\x05GROUP\x10\x06\x12\n\n\x06VERTEX\x10\x07\x12\x0c\n\x08PAIR_SET\x10\x08\x12\x0e\n\nEVENT_TYPE\x10\t\x12\x0c\n\x08PROPERTY\x10\n\x12\r\n\tEDGE_TYPE\x10\x0b\x12\t\n\x05TABLE\x10\x0c\x12\t\n\x05\x42RAID\x10\r\x12\x0f\n\x0b\x41\x43\x43UMULATOR\x10\x0e\x12\x0f\n\x0b\x42LOB_CHUNKS\x10\x0f\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.behavior_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _BEHAVIOR._serialized_start=31
+  _BEHAVIOR._serialized_end=261
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/bundle.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import change_pb2 as proto_dot_change__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12proto/bundle.proto\x12\x04gink\x1a\x12proto/change.proto\"\xe2\x01\n\x06\x42undle\x12\x10\n\x08identity\x18\x01 \x01(\t\x12\x1d\n\x07\x63hanges\x18\x02 \x03(\x0b\x32\x0c.gink.Change\x12\x12\n\nverify_key\x18\x03 \x01(\x0c\x12\x11\n\ttimestamp\x18\x04 \x01(\x04\x12\x13\n\x0b\x63hain_start\x18\x05 \x01(\x04\x12\x11\n\tmedallion\x18\x06 \x01(\x04\x12\x10\n\x08previous\x18\x07 \x01(\x04\x12\x12\n\nprior_hash\x18\x08 \x01(\x0c\x12\x0e\n\x06key_id\x18\t \x01(\x04\x12\x11\n\tencrypted\x18\n \x01(\x0c\x12\x0f\n\x07\x63omment\x18\x0b \x01(\tb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.bundle_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _BUNDLE._serialized_start=49
+  _BUNDLE._serialized_end=275
+# @@protoc_insertion_point(module_scope)
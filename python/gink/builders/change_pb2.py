@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/change.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import container_pb2 as proto_dot_container__pb2
+from . import entry_pb2 as proto_dot_entry__pb2
+from . import movement_pb2 as proto_dot_movement__pb2
+from . import clearance_pb2 as proto_dot_clearance__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12proto/change.proto\x12\x04gink\x1a\x15proto/container.proto\x1a\x11proto/entry.proto\x1a\x14proto/movement.proto\x1a\x15proto/clearance.proto\"\x9d\x01\n\x06\x43hange\x12$\n\tcontainer\x18\x01 \x01(\x0b\x32\x0f.gink.ContainerH\x00\x12\x1c\n\x05\x65ntry\x18\x02 \x01(\x0b\x32\x0b.gink.EntryH\x00\x12\"\n\x08movement\x18\x03 \x01(\x0b\x32\x0e.gink.MovementH\x00\x12$\n\tclearance\x18\x04 \x01(\x0b\x32\x0f.gink.ClearanceH\x00\x42\x05\n\x03objb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.change_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _CHANGE._serialized_start=116
+  _CHANGE._serialized_end=273
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/claim.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11proto/claim.proto\x12\x04gink\"W\n\x05\x43laim\x12\x11\n\tmedallion\x18\x01 \x01(\x04\x12\x13\n\x0b\x63hain_start\x18\x02 \x01(\x04\x12\x12\n\nprocess_id\x18\x03 \x01(\x04\x12\x12\n\nclaim_time\x18\x04 \x01(\x04\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.claim_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _CLAIM._serialized_start=27
+  _CLAIM._serialized_end=114
+# @@protoc_insertion_point(module_scope)
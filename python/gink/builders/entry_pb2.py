@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/entry.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import value_pb2 as proto_dot_value__pb2
+from . import muid_pb2 as proto_dot_muid__pb2
+from . import behavior_pb2 as proto_dot_behavior__pb2
+from . import key_pb2 as proto_dot_key__pb2
+from . import pair_pb2 as proto_dot_pair__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11proto/entry.proto\x12\x04gink\x1a\x11proto/value.proto\x1a\x10proto/muid.proto\x1a\x14proto/behavior.proto\x1a\x0fproto/key.proto\x1a\x10proto/pair.proto\"\xba\x02\n\x05\x45ntry\x12\x1d\n\tcontainer\x18\x01 \x01(\x0b\x32\n.gink.Muid\x12 \n\x08\x62\x65havior\x18\x02 \x01(\x0e\x32\x0e.gink.Behavior\x12\x18\n\x03key\x18\x03 \x01(\x0b\x32\t.gink.KeyH\x00\x12\x1a\n\x04pair\x18\x04 \x01(\x0b\x32\n.gink.PairH\x00\x12 \n\ndescribing\x18\x06 \x01(\x0b\x32\n.gink.MuidH\x00\x12\x1c\n\x05value\x18\x07 \x01(\x0b\x32\x0b.gink.ValueH\x01\x12\x12\n\x08\x64\x65letion\x18\t \x01(\x08H\x01\x12\x1d\n\x07pointee\x18\n \x01(\x0b\x32\n.gink.MuidH\x01\x12\x0e\n\x06\x65xpiry\x18\x0b \x01(\x04\x12\x11\n\teffective\x18\x0c \x01(\x12\x12\r\n\x05purge\x18\r \x01(\x08\x42\t\n\x07subjectB\n\n\x08\x63ontainsb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.entry_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _ENTRY._serialized_start=122
+  _ENTRY._serialized_end=436
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/key.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fproto/key.proto\x12\x04gink\"F\n\x03Key\x12\x10\n\x06number\x18\x01 \x01(\x12H\x00\x12\x10\n\x06octets\x18\x02 \x01(\x0cH\x00\x12\x14\n\ncharacters\x18\x03 \x01(\tH\x00\x42\x05\n\x03keyb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.key_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _KEY._serialized_start=25
+  _KEY._serialized_end=95
+# @@protoc_insertion_point(module_scope)
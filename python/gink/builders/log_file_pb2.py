@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/log_file.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import claim_pb2 as proto_dot_claim__pb2
+from . import key_pair_pb2 as proto_dot_key__pair__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14proto/log_file.proto\x12\x04gink\x1a\x11proto/claim.proto\x1a\x14proto/key_pair.proto\"o\n\x07LogFile\x12\x14\n\x0cmagic_number\x18\x01 \x01(\x07\x12\x1b\n\x06\x63laims\x18\x02 \x03(\x0b\x32\x0b.gink.Claim\x12\x0f\n\x07\x62undles\x18\x03 \x03(\x0c\x12 \n\tkey_pairs\x18\x04 \x03(\x0b\x32\r.gink.KeyPairb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.log_file_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _LOGFILE._serialized_start=71
+  _LOGFILE._serialized_end=182
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/movement.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import muid_pb2 as proto_dot_muid__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14proto/movement.proto\x12\x04gink\x1a\x10proto/muid.proto\"a\n\x08Movement\x12\x1d\n\tcontainer\x18\x01 \x01(\x0b\x32\n.gink.Muid\x12\x19\n\x05\x65ntry\x18\x02 \x01(\x0b\x32\n.gink.Muid\x12\x0c\n\x04\x64\x65st\x18\x03 \x01(\x12\x12\r\n\x05purge\x18\x04 \x01(\x08\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.movement_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _MOVEMENT._serialized_start=48
+  _MOVEMENT._serialized_end=145
+# @@protoc_insertion_point(module_scope)
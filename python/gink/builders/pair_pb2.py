@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/pair.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import muid_pb2 as proto_dot_muid__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10proto/pair.proto\x12\x04gink\x1a\x10proto/muid.proto\":\n\x04Pair\x12\x18\n\x04left\x18\x01 \x01(\x0b\x32\n.gink.Muid\x12\x18\n\x04rite\x18\x02 \x01(\x0b\x32\n.gink.Muidb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.pair_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _PAIR._serialized_start=44
+  _PAIR._serialized_end=102
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/sync_message.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18proto/sync_message.proto\x12\x04gink\"\xb6\x06\n\x0bSyncMessage\x12\x10\n\x06\x62undle\x18\x01 \x01(\x0cH\x00\x12.\n\x08greeting\x18\x02 \x01(\x0b\x32\x1a.gink.SyncMessage.GreetingH\x00\x12$\n\x03\x61\x63k\x18\x03 \x01(\x0b\x32\x15.gink.SyncMessage.AckH\x00\x12*\n\x06signal\x18\x04 \x01(\x0e\x32\x18.gink.SyncMessage.SignalH\x00\x12(\n\x05\x62\x61tch\x18\x05 \x01(\x0b\x32\x17.gink.SyncMessage.BatchH\x00\x12.\n\x08snapshot\x18\x06 \x01(\x0b\x32\x1a.gink.SyncMessage.SnapshotH\x00\x1a\xd9\x01\n\x08Greeting\x12\x39\n\x07\x65ntries\x18\x01 \x03(\x0b\x32(.gink.SyncMessage.Greeting.GreetingEntry\x12+\n\x08\x66\x65\x61tures\x18\x02 \x03(\x0e\x32\x19.gink.SyncMessage.Feature\x12\x16\n\x0epacked_entries\x18\x03 \x01(\x0c\x1aM\n\rGreetingEntry\x12\x11\n\tmedallion\x18\x01 \x01(\x04\x12\x13\n\x0b\x63hain_start\x18\x02 \x01(\x04\x12\x14\n\x0cseen_through\x18\x03 \x01(\x04\x1a=\n\x05\x42\x61tch\x12\x0f\n\x07\x62undles\x18\x01 \x03(\x0c\x12#\n\x04\x61\x63ks\x18\x02 \x03(\x0b\x32\x15.gink.SyncMessage.Ack\x1aI\n\x08Snapshot\x12\r\n\x05table\x18\x01 \x01(\t\x12\x0c\n\x04keys\x18\x02 \x03(\x0c\x12\x0e\n\x06values\x18\x03 \x03(\x0c\x12\x10\n\x08\x63omplete\x18\x04 \x01(\x08\x1aR\n\x03\x41\x63k\x12\x11\n\tmedallion\x18\x01 \x01(\x04\x12\x13\n\x0b\x63hain_start\x18\x02 \x01(\x04\x12\x11\n\ttimestamp\x18\x03 \x01(\x04\x12\x10\n\x08previous\x18\x04 \x01(\x04\"&\n\x07\x46\x65\x61ture\x12\x0e\n\nNO_FEATURE\x10\x00\x12\x0b\n\x07\x42\x41TCHES\x10\x01\"K\n\x06Signal\x12\r\n\tUNDEFINED\x10\x00\x12\x18\n\x14INITIAL_BUNDLES_SENT\x10\x01\x12\x18\n\x14READ_ONLY_CONNECTION\x10\x02\x42\n\n\x08\x63ontentsb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.sync_message_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _SYNCMESSAGE._serialized_start=35
+  _SYNCMESSAGE._serialized_end=857
+  _SYNCMESSAGE_GREETING._serialized_start=289
+  _SYNCMESSAGE_GREETING._serialized_end=506
+  _SYNCMESSAGE_GREETING_GREETINGENTRY._serialized_start=429
+  _SYNCMESSAGE_GREETING_GREETINGENTRY._serialized_end=506
+  _SYNCMESSAGE_BATCH._serialized_start=508
+  _SYNCMESSAGE_BATCH._serialized_end=569
+  _SYNCMESSAGE_SNAPSHOT._serialized_start=571
+  _SYNCMESSAGE_SNAPSHOT._serialized_end=644
+  _SYNCMESSAGE_ACK._serialized_start=646
+  _SYNCMESSAGE_ACK._serialized_end=728
+  _SYNCMESSAGE_FEATURE._serialized_start=730
+  _SYNCMESSAGE_FEATURE._serialized_end=768
+  _SYNCMESSAGE_SIGNAL._serialized_start=770
+  _SYNCMESSAGE_SIGNAL._serialized_end=845
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/value.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import key_pb2 as proto_dot_key__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11proto/value.proto\x12\x04gink\x1a\x0fproto/key.proto\"\xbe\x04\n\x05Value\x12\x11\n\x07integer\x18\x01 \x01(\tH\x00\x12\x12\n\x08\x66loating\x18\x02 \x01(\x01H\x00\x12\x14\n\ncharacters\x18\x03 \x01(\tH\x00\x12&\n\x07special\x18\x04 \x01(\x0e\x32\x13.gink.Value.SpecialH\x00\x12\x13\n\ttimestamp\x18\x05 \x01(\x03H\x00\x12(\n\x08\x64ocument\x18\x06 \x01(\x0b\x32\x14.gink.Value.DocumentH\x00\x12\"\n\x05tuple\x18\x07 \x01(\x0b\x32\x11.gink.Value.TupleH\x00\x12\x10\n\x06octets\x18\x08 \x01(\x0cH\x00\x12\"\n\x05\x61rray\x18\t \x01(\x0b\x32\x11.gink.Value.ArrayH\x00\x12 \n\x04\x62lob\x18\n \x01(\x0b\x32\x10.gink.Value.BlobH\x00\x1a$\n\x05Tuple\x12\x1b\n\x06values\x18\x01 \x03(\x0b\x32\x0b.gink.Value\x1a\x33\n\x05\x41rray\x12\r\n\x05\x64type\x18\x01 \x01(\t\x12\r\n\x05shape\x18\x02 \x03(\x04\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x1a\x38\n\x04\x42lob\x12\x0c\n\x04size\x18\x01 \x01(\x04\x12\x12\n\nchunk_size\x18\x02 \x01(\r\x12\x0e\n\x06\x63hunks\x18\x03 \x03(\x0c\x1a@\n\x08\x44ocument\x12\x17\n\x04keys\x18\x01 \x03(\x0b\x32\t.gink.Key\x12\x1b\n\x06values\x18\x02 \x03(\x0b\x32\x0b.gink.Value\"5\n\x07Special\x12\x0b\n\x07MISSING\x10\x00\x12\x08\n\x04TRUE\x10\x01\x12\t\n\x05\x46\x41LSE\x10\x02\x12\x08\n\x04NULL\x10\x03\x42\x07\n\x05valueb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.value_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _VALUE._serialized_start=45
+  _VALUE._serialized_end=619
+  _VALUE_TUPLE._serialized_start=342
+  _VALUE_TUPLE._serialized_end=378
+  _VALUE_ARRAY._serialized_start=380
+  _VALUE_ARRAY._serialized_end=431
+  _VALUE_BLOB._serialized_start=433
+  _VALUE_BLOB._serialized_end=489
+  _VALUE_DOCUMENT._serialized_start=491
+  _VALUE_DOCUMENT._serialized_end=555
+  _VALUE_SPECIAL._serialized_start=557
+  _VALUE_SPECIAL._serialized_end=610
+# @@protoc_insertion_point(module_scope)
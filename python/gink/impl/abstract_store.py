@@ -1,14 +1,17 @@
 """Contains AbstractStore class."""
 
 # standard python modules
-from typing import Tuple, Optional, Iterable, List, Union, Mapping, TypeVar, Generic, Callable
+from typing import Tuple, Optional, Iterable, List, Union, Mapping, TypeVar, Generic, Callable, Dict, Sequence
 from abc import abstractmethod
+from collections import OrderedDict
+from threading import RLock
 from nacl.signing import SigningKey, VerifyKey
+from nacl.secret import SecretBox
 from sys import stderr
 
 
 # Gink specific modules
-from .builders import ContainerBuilder, ChangeBuilder, EntryBuilder, ClaimBuilder, Behavior
+from .builders import ContainerBuilder, ChangeBuilder, EntryBuilder, ClaimBuilder, Behavior, BundleBuilder
 from .bundle_info import BundleInfo
 from .has_map import HasMap
 from .typedefs import UserKey, MuTimestamp, Medallion, Limit, UserValue
@@ -29,6 +32,20 @@ class AbstractStore(BundleStore, Generic[Lock]):
         Warning! Since data stores are viewed as part of the internal implementation,
         this interface may change at any time without warning on a minor version change.
     """
+    _decrypted_cache_size: int = 1024
+
+    def __init__(self, decrypted_cache_size: Optional[int] = None) -> None:
+        """ Sets up the caches of symmetric keys and decrypted change lists.
+
+            The caches are guarded by _thread_lock, which stores that may be written from one
+            thread while being read from another (see LmdbStore and AsyncRelay) also hold while
+            applying bundles.  Otherwise a store should only be used from one thread at a time.
+        """
+        if decrypted_cache_size is not None:
+            self._decrypted_cache_size = decrypted_cache_size
+        self._thread_lock = RLock()
+        self._symmetric_key_cache: Dict[int, bytes] = {}
+        self._decrypted_cache: OrderedDict[BundleInfo, Sequence[ChangeBuilder]] = OrderedDict()
 
     def __enter__(self):
         pass
@@ -287,6 +304,50 @@ class AbstractStore(BundleStore, Generic[Lock]):
     def get_symmetric_key(self, key_id: Union[int, Chain, None]) -> Optional[bytes]:
         """ Retrieves a previously stored symmetric key. """
 
+    @abstractmethod
+    def _load_symmetric_key(self, key_id: int, lock: Optional[Lock]=None, /) -> Optional[bytes]:
+        """ Looks up a symmetric key by key_id, returning None if it isn't stored. """
+
+    def _get_cached_symmetric_key(self, key_id: int, lock: Optional[Lock]=None, /) -> bytes:
+        """ Returns the symmetric key for key_id, only going to the underlying storage once per key. """
+        symmetric_key = self._symmetric_key_cache.get(key_id)
+        if symmetric_key is None:
+            symmetric_key = self._load_symmetric_key(key_id, lock)
+            if not symmetric_key:
+                raise KeyError("could not find symmetric key referenced in bundle")
+            self._symmetric_key_cache[key_id] = symmetric_key
+        return symmetric_key
+
+    def get_changes(self, decomposition: Decomposition, lock: Optional[Lock]=None, /) -> Sequence[ChangeBuilder]:
+        """ Returns the changes in a bundle, decrypting them first if the bundle is encrypted.
+
+            Decrypted change lists are kept in a bounded LRU (see _decrypted_cache_size),
+            so looking through the history of an encrypted chain doesn't redo the decryption.
+        """
+        builder = decomposition.get_builder()
+        if not builder.encrypted:
+            return builder.changes
+        info = decomposition.get_info()
+        with self._thread_lock:
+            changes = self._decrypted_cache.get(info)
+            if changes is not None:
+                self._decrypted_cache.move_to_end(info)
+                return changes
+        if builder.changes:
+            raise ValueError("did not expect plain changes when using encryption")
+        if not builder.key_id:
+            raise ValueError("expected to have a key_id when encrypted is present")
+        symmetric_key = self._get_cached_symmetric_key(builder.key_id, lock)
+        decrypted = BundleBuilder()
+        decrypted.ParseFromString(SecretBox(symmetric_key).decrypt(builder.encrypted))
+        changes = decrypted.changes
+        if self._decrypted_cache_size > 0:
+            with self._thread_lock:
+                self._decrypted_cache[info] = changes
+                if len(self._decrypted_cache) > self._decrypted_cache_size:
+                    self._decrypted_cache.popitem(last=False)
+        return changes
+
     @abstractmethod
     def get_billionths(self, accumulator: Muid, *, as_of: MuTimestamp = -1) -> int:
         """ Returns the sum of increments in an accumumlator. """
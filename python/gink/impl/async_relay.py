@@ -0,0 +1,692 @@
+""" Contains the AsyncRelay class, for syncing from inside an existing asyncio application.
+
+    The regular Relay/Database classes expect to be driven by looping.loop, which owns the thread.
+    AsyncRelay speaks the same websocket/SyncMessage protocol (so it can talk to them), but uses
+    asyncio transports and protocols, watches the store with loop.add_reader, and does its
+    LMDB writes on a single background thread so they don't stall the event loop.  Everything
+    else, including the relay's and database's callbacks for the bundles written, runs on the loop.
+"""
+from asyncio import Protocol, Transport, Event, AbstractEventLoop, Future, get_running_loop
+from concurrent.futures import Executor, ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from re import fullmatch, IGNORECASE, DOTALL
+from ssl import SSLContext, create_default_context, Purpose
+from typing import Optional, Union, Set, Dict, Callable, Mapping, List, Any
+
+from wsproto import WSConnection, ConnectionType
+from wsproto.utilities import RemoteProtocolError
+from wsproto.events import (
+    Request,
+    AcceptConnection,
+    CloseConnection,
+    BytesMessage,
+    TextMessage,
+    Ping,
+    RejectConnection,
+)
+
+from .abstract_store import AbstractStore
+from .builders import SyncMessage
+from .bundle_info import BundleInfo
+from .bundle_store import BundleStore
+from .connection import _BackfillPaused, _MessageAssembler, _parse_features, FEATURES_HEADER, PACKED_GREETING
+from .decomposition import Decomposition
+from .has_map import HasMap
+from .lmdb_store import LmdbStore
+from .relay import Relay
+from .server import Server
+from .tuples import Chain
+from .typedefs import AuthFunc, AUTH_NONE, AUTH_FULL, AUTH_RITE, Limit
+from .utilities import encode_to_hex, make_auth_func, dedent, validate_bundle
+
+
+class AsyncConnection(Protocol):
+    """ An asyncio protocol handling one websocket peer of an AsyncRelay.
+
+        Outbound flow control uses the transport's write buffer limits: once the buffer passes
+        high_water the backfill scan stops, and it resumes when the transport drains below low_water.
+        Reading pauses while more than max_pending received bundles are waiting to be written.
+
+        This reimplements the batching, backfill and acks of Connection on top of asyncio rather
+        than sharing its socket handling, and only that much of the protocol: it doesn't resume
+        sync sessions or hold back bundles for in-flight windows, doesn't send or install
+        snapshots, and sends everything in one lane (live bundles wait behind the backfill).
+        Peers using those features fall back to a plain greeting and full backfill with it.
+    """
+    GINK_PROTOCOL = "gink"
+
+    def __init__(
+            self,
+            relay: 'AsyncRelay', *,
+            is_client: bool,
+            host: str = "localhost",
+            path: str = "/",
+            name: Optional[str] = None,
+            auth_func: Optional[AuthFunc] = None,
+            auth_data: Optional[str] = None,
+            max_batch_count: int = 100,
+            max_batch_bytes: int = 2**20,
+            high_water: int = 2**22,
+            low_water: int = 2**20,
+            max_pending: int = 256,
+    ):
+        self._relay = relay
+        self._is_client = is_client
+        self._host = host
+        self._path = path
+        self._name = name
+        self._auth_func = auth_func
+        self._auth_data = auth_data
+        self._perms = AUTH_NONE if auth_func else AUTH_FULL
+        self._max_batch_count = max_batch_count
+        self._max_batch_bytes = max_batch_bytes
+        self._high_water = high_water
+        self._low_water = low_water
+        self._max_pending = max_pending
+        self._logger = getLogger(self.__class__.__name__)
+        self._ws = WSConnection(ConnectionType.CLIENT if is_client else ConnectionType.SERVER)
+        self._transport: Optional[Transport] = None
+        self._loop: Optional[AbstractEventLoop] = None
+        self._request_headers: Optional[Dict[str, str]] = None
+        self._header_buffer = b""
+        self._assembler = _MessageAssembler()
+        self._ws_connected = False
+        self._closed = False
+        self._tracker: Optional[HasMap] = None
+        self._peer_features: Set[int] = set()
+        self._handshake_features: Set[str] = set()
+        self._batch: Optional[SyncMessage] = None
+        self._batch_bytes = 0
+        self._acks: Dict[Chain, BundleInfo] = {}
+        self._flush_scheduled = False
+        self._writing_paused = False
+        self._reading_paused = False
+        self._pending = 0
+        self._initial_bundles_sent = False
+        self._backfill_store: Optional[BundleStore] = None
+        self._backfill_limit_to: Optional[Mapping[Chain, Limit]] = None
+        self._backfill_after: Optional[BundleInfo] = None
+        self.connected = Event()
+        self.handshake: Optional[Future] = None  # for clients, resolved or failed once the server answers
+        self.initial_bundles_received = Event()  # set once the peer's backfill has been applied
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(host={self._host!r}, name={self._name!r})"
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        assert self._request_headers is not None
+        return self._request_headers
+
+    @property
+    def cookies(self) -> dict:
+        if not self._request_headers or "cookie" not in self._request_headers:
+            return {}
+        return dict(
+            pair.strip().split('=', 1)
+            for pair in self._request_headers["cookie"].split(';')
+            if '=' in pair
+        )
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+
+    def get_permissions(self) -> int:
+        return self._perms
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def connection_made(self, transport) -> None:
+        self._transport = transport
+        self._loop = get_running_loop()
+        transport.set_write_buffer_limits(high=self._high_water, low=self._low_water)
+        if self._is_client:
+            self.handshake = self._loop.create_future()
+            subprotocols = [self.GINK_PROTOCOL]
+            if self._auth_data:
+                subprotocols.append(encode_to_hex(self._auth_data))
+            extra_headers = [(FEATURES_HEADER.encode(), PACKED_GREETING.encode())]
+            transport.write(self._ws.send(Request(
+                host=self._host, target=self._path, subprotocols=subprotocols, extra_headers=extra_headers)))
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if exc is not None:
+            self._logger.warning("(%s) connection lost: %s", self._name, exc)
+        self._closed = True
+        self._backfill_store = None
+        self._fail_handshake(exc if isinstance(exc, ConnectionError) else ConnectionError(
+            "connection closed before the websocket handshake"))
+        self._relay._on_connection_lost(self)
+
+    def pause_writing(self) -> None:
+        self._writing_paused = True
+
+    def resume_writing(self) -> None:
+        self._writing_paused = False
+        if self._backfill_store is not None:
+            self._continue_backfill()
+
+    def data_received(self, data: bytes) -> None:
+        if self._request_headers is None and not self._is_client:
+            self._header_buffer += data
+            if not self._receive_header():
+                return
+            data, self._header_buffer = self._header_buffer, b""
+        try:
+            self._ws.receive_data(data)
+        except RemoteProtocolError as rpe:
+            self._logger.warning("rejected a malformed connection attempt")
+            self._abort(self._ws.send(rpe.event_hint or RejectConnection()))
+            return
+        for event in self._ws.events():
+            if self._closed:
+                return
+            if isinstance(event, Request):
+                self._on_request(event)
+            elif isinstance(event, AcceptConnection):
+                self._logger.info("Client connection established!")
+                self._handshake_features = _parse_features(dict(event.extra_headers).get(FEATURES_HEADER.encode()))
+                self._on_established()
+            elif isinstance(event, BytesMessage):
+                if not event.message_finished:
+                    self._assembler.add(event.data)
+                    continue
+                received = self._assembler.finish(event.data)
+                if isinstance(received, bytes):
+                    self._on_bundle_received(Decomposition(received))
+                else:
+                    self._on_sync_message(received)
+            elif isinstance(event, CloseConnection):
+                self._logger.info("got close msg, code=%d, reason=%s", event.code, event.reason)
+                self._abort(self._ws.send(event.response()))
+            elif isinstance(event, TextMessage):
+                self._write(self._ws.send(TextMessage(data=event.data)))
+            elif isinstance(event, Ping):
+                self._write(self._ws.send(event.response()))
+            elif isinstance(event, RejectConnection):
+                self._logger.warning("(%s) connection rejected by peer", self._name)
+                self._fail_handshake(ConnectionRefusedError("connection rejected by peer"))
+                self._abort()
+            else:
+                self._logger.debug("ignoring websocket event %s", event)
+        self._schedule_flush()
+
+    def _receive_header(self) -> bool:
+        """ Parses the request headers (so auth functions can see them) once they've all arrived. """
+        match = fullmatch(rb"(.+?)\r?\n\r?\n.*", self._header_buffer, DOTALL)
+        if not match:
+            return False
+        header_lines = match.group(1).decode("utf-8").splitlines()
+        request_line_match = fullmatch(r"(\S+)\s+(\S+)\s+HTTP/\d+\.\d+", header_lines[0] if header_lines else "")
+        if not request_line_match:
+            self._logger.warning("bad request line: %r", header_lines[:1])
+            self._abort()
+            return False
+        self._path = request_line_match.group(2).split("?", 1)[0]
+        self._request_headers = {}
+        for header_line in header_lines[1:]:
+            key, val = header_line.split(":", 1)
+            self._request_headers[key.strip().lower()] = val.strip()
+        if "websocket" not in self._request_headers.get("upgrade", "").lower():
+            self._abort(dedent(b"""
+                HTTP/1.0 400 Bad Request
+                Content-type: text/plain
+
+                Websocket connections only!"""))
+            return False
+        return True
+
+    def _on_request(self, event: Request) -> None:
+        if self._auth_func:
+            self._perms |= self._auth_func(self)
+        if not self._perms:
+            self._logger.warning("rejected a connection due to insufficient permissions")
+            self._abort(self._ws.send(RejectConnection()))
+            return
+        if self.GINK_PROTOCOL not in event.subprotocols:
+            self._logger.warning("rejected a non-gink connection")
+            self._abort(self._ws.send(RejectConnection()))
+            return
+        self._handshake_features = _parse_features(self.headers.get(FEATURES_HEADER))
+        extra_headers = [(FEATURES_HEADER.encode(), PACKED_GREETING.encode())]
+        self._write(self._ws.send(AcceptConnection(self.GINK_PROTOCOL, extra_headers=extra_headers)))
+        self._logger.info("Server connection established!")
+        self._on_established()
+
+    def _on_established(self) -> None:
+        self._ws_connected = True
+        self.connected.set()
+        if self.handshake is not None and not self.handshake.done():
+            self.handshake.set_result(None)
+        if self._perms & AUTH_RITE:
+            greeting = self._relay._get_greeting(packed=PACKED_GREETING in self._handshake_features)
+            greeting.greeting.features.append(SyncMessage.Feature.BATCHES)  # type: ignore
+            self.send(greeting)
+        elif not self._is_client:
+            sync_message = SyncMessage()
+            sync_message.signal = SyncMessage.Signal.READ_ONLY_CONNECTION  # type: ignore
+            self.send(sync_message)
+
+    def _fail_handshake(self, error: Exception) -> None:
+        if self.handshake is not None and not self.handshake.done():
+            self.handshake.set_exception(error)
+
+    def _on_sync_message(self, sync_message: SyncMessage) -> None:
+        if sync_message.HasField("bundle"):
+            self._on_bundle_received(Decomposition(sync_message.bundle))  # type: ignore
+        elif sync_message.HasField("batch"):
+            batch = sync_message.batch  # type: ignore
+            for bundle_bytes in batch.bundles:
+                self._on_bundle_received(Decomposition(bundle_bytes))
+        elif sync_message.HasField("greeting"):
+            self._peer_features = set(sync_message.greeting.features)  # type: ignore
+            self._tracker = HasMap(sync_message=sync_message)
+            self._logger.debug("(%s) received greeting %s", self._name, self._tracker)
+            self.start_backfill(self._relay.get_bundle_store())
+        elif sync_message.HasField("ack"):
+            pass  # nothing tracks unacked bundles yet (same as Relay)
+        elif sync_message.HasField("signal"):
+            if sync_message.signal == SyncMessage.Signal.INITIAL_BUNDLES_SENT:  # type: ignore
+                self._initial_bundles_sent = True
+                if not self._pending:
+                    self.initial_bundles_received.set()
+            elif sync_message.signal == SyncMessage.Signal.READ_ONLY_CONNECTION:  # type: ignore
+                self._logger.warning("(%s) received read-only connection signal", self._name)
+        else:
+            self._logger.warning("got binary message without ack, bundle, greeting, or signal")
+
+    def _on_bundle_received(self, decomposition: Decomposition) -> None:
+        info = decomposition.get_info()
+        if self._tracker is not None:
+            self._tracker.mark_as_having(info)
+        self._pending += 1
+        if self._pending > self._max_pending and not self._reading_paused and self._transport:
+            self._reading_paused = True
+            self._transport.pause_reading()
+        self._relay._apply(decomposition).add_done_callback(lambda future: self._on_applied(info, future))
+
+    def _on_applied(self, info: BundleInfo, future: Future) -> None:
+        self._pending -= 1
+        if self._initial_bundles_sent and not self._pending:
+            self.initial_bundles_received.set()
+        if self._reading_paused and self._pending <= self._max_pending // 2 and self._transport:
+            self._reading_paused = False
+            self._transport.resume_reading()
+        if self._closed:
+            return
+        exception = future.exception()
+        if exception is not None:
+            self._logger.warning("(%s) could not apply bundle %s: %s", self._name, info, exception)
+            self.close()
+            return
+        self.send_ack(info)
+        self._schedule_flush()
+
+    def batches_enabled(self) -> bool:
+        """ True when bundles and acks to this peer get packed into Batch messages. """
+        return self._max_batch_count > 1 and SyncMessage.Feature.BATCHES in self._peer_features  # type: ignore
+
+    def send(self, sync_message: SyncMessage) -> None:
+        """ Send a SyncMessage to the peer (after anything batched before it). """
+        if self._batch is not None or self._acks:
+            self.flush()
+        self._send_message(sync_message)
+
+    def _send_message(self, sync_message: SyncMessage) -> None:
+        if self._closed or not self._ws_connected:
+            raise ValueError("connection not open")
+        self._write(self._ws.send(BytesMessage(sync_message.SerializeToString())))
+
+    def _write(self, data: bytes) -> None:
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.write(data)
+
+    def _schedule_flush(self) -> None:
+        if not self._flush_scheduled and self._loop is not None and not self._closed:
+            self._flush_scheduled = True
+            self._loop.call_soon(self.flush)
+
+    def flush(self) -> None:
+        """ Sends any bundles and acks being held for a batch. """
+        self._flush_scheduled = False
+        sync_message = self._batch
+        if sync_message is None:
+            if not self._acks:
+                return
+            sync_message = SyncMessage()
+        for info in self._acks.values():
+            ack = sync_message.batch.acks.add()  # type: ignore
+            ack.medallion = info.medallion
+            ack.chain_start = info.chain_start
+            ack.timestamp = info.timestamp
+            ack.previous = info.previous
+        self._batch = None
+        self._batch_bytes = 0
+        self._acks = {}
+        if not self._closed and self._ws_connected:
+            self._send_message(sync_message)
+
+    def send_bundle(self, decomposition: Decomposition) -> None:
+        """ Sends a bundle to the peer unless it's known to already have it. """
+        if self._tracker is None or self._closed:
+            return
+        info = decomposition.get_info()
+        if self._tracker.has(info):
+            return
+        if not self._tracker.is_valid_extension(info):
+            if self._backfill_store is not None:
+                return  # the paused backfill will get to it, after what it depends on
+            raise ValueError("bundle would be an invalid extension!")
+        self._tracker.mark_as_having(info)
+        bundle_bytes = decomposition.get_bytes()
+        if not self.batches_enabled():
+            sync_message = SyncMessage()
+            sync_message.bundle = bundle_bytes  # type: ignore
+            self.send(sync_message)
+            return
+        if self._batch is None:
+            self._batch = SyncMessage()
+        bundles = self._batch.batch.bundles  # type: ignore
+        bundles.append(bundle_bytes)
+        self._batch_bytes += len(bundle_bytes)
+        if len(bundles) >= self._max_batch_count or self._batch_bytes >= self._max_batch_bytes:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def send_ack(self, info: BundleInfo) -> None:
+        """ Acknowledges a bundle, folding it into a cumulative per-chain ack if batching. """
+        if not self.batches_enabled():
+            self.send(info.as_acknowledgement())
+            return
+        prior = self._acks.get(info.get_chain())
+        if prior is None or prior.timestamp < info.timestamp:
+            self._acks[info.get_chain()] = info
+
+    def start_backfill(self, store: BundleStore, *, limit_to: Optional[Mapping[Chain, Limit]] = None) -> None:
+        """ Sends the peer everything it's missing, pausing whenever the transport asks us to. """
+        self._backfill_store = store
+        self._backfill_limit_to = limit_to
+        self._backfill_after = None
+        self._continue_backfill()
+
+    def _continue_backfill(self) -> None:
+        store = self._backfill_store
+        assert store is not None
+
+        def callback(decomposition: Decomposition):
+            self._backfill_after = decomposition.get_info()
+            self.send_bundle(decomposition)
+            if self._writing_paused:
+                raise _BackfillPaused()
+
+        try:
+            store.get_bundles(callback, peer_has=self._tracker, limit_to=self._backfill_limit_to,
+                              start_after=self._backfill_after)
+        except _BackfillPaused:
+            self.flush()
+            return
+        self._backfill_store = None
+        self._backfill_limit_to = None
+        self._backfill_after = None
+        sync_message = SyncMessage()
+        sync_message.signal = SyncMessage.Signal.INITIAL_BUNDLES_SENT  # type: ignore
+        self.send(sync_message)
+
+    def _abort(self, last_words: bytes = b"") -> None:
+        """ Writes anything final and closes the transport without a websocket close handshake. """
+        if self._transport is not None and not self._transport.is_closing():
+            if last_words:
+                self._transport.write(last_words)
+            self._transport.close()
+        self._closed = True
+
+    def close(self) -> None:
+        """ Flushes, sends a websocket close message, and closes the transport. """
+        if self._closed:
+            return
+        if self._ws_connected:
+            try:
+                self.flush()
+                self._write(self._ws.send(CloseConnection(code=1000)))
+            except Exception as exception:
+                self._logger.warning("could not send close message: %s", exception)
+        self._abort()
+
+
+class AsyncRelay:
+    """ Syncs a Relay (or Database) with peers from inside a running asyncio event loop.
+
+        Pass the Database your application commits through, so local changes get sent out and
+        bundles from peers show up in it; a bare store or path gets wrapped in a Relay.
+        When the store is an LmdbStore, bundles from peers are applied on a single worker
+        thread (keeping them in order); other stores aren't thread safe and are written inline.
+        Each peer costs one protocol object and no threads, so thousands of connections are fine.
+
+        Only the store writes happen on the worker thread: callbacks (of the relay, the database
+        and this) for the bundles it stores are called afterwards on the loop, and the store holds
+        its _thread_lock while applying bundles and around its caches (see AbstractStore.__init__),
+        so commits and reads on the loop thread can go on while it writes.
+    """
+
+    def __init__(
+            self,
+            relay: Union[Relay, BundleStore, str, Path, None] = None, *,
+            executor: Optional[Executor] = None,
+            **connection_options: Any):
+        """ connection_options are passed through to each AsyncConnection (batch and buffer limits). """
+        self._created_relay = not isinstance(relay, Relay)
+        self._owns_store = not isinstance(relay, (Relay, BundleStore))
+        if not isinstance(relay, Relay):
+            relay = Relay(store=relay)
+        self._relay = relay
+        self._store = relay.get_bundle_store()
+        self._owns_executor = executor is None and isinstance(self._store, LmdbStore)
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gink-writer")
+        self._executor = executor
+        self._connection_options = connection_options
+        self._logger = getLogger(self.__class__.__name__)
+        self._loop: Optional[AbstractEventLoop] = None
+        self._connections: Set[AsyncConnection] = set()
+        self._servers: List[Any] = []
+        self._callbacks: List[Callable[[Decomposition], None]] = []
+        self._watching = False
+        self._closed = False
+        relay.add_callback(self._on_relay_bundle)
+
+    def get_bundle_store(self) -> BundleStore:
+        return self._store
+
+    def get_relay(self) -> Relay:
+        return self._relay
+
+    def get_connections(self) -> Set[AsyncConnection]:
+        """ Returns the set of currently open connections. """
+        return set(self._connections)
+
+    def add_callback(self, callback: Callable[[Decomposition], None]):
+        """ Add a callback to be called (on the event loop) whenever a bundle is applied. """
+        self._callbacks.append(callback)
+
+    def _attach(self) -> AbstractEventLoop:
+        """ Binds to the running loop, and starts watching the store for changes by other processes. """
+        loop = get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError("AsyncRelay used from more than one event loop")
+        if not self._watching and self._store.is_selectable():
+            loop.add_reader(self._store.fileno(), self._on_store_readable)
+            self._watching = True
+        return loop
+
+    def _run(self, function: Callable, *args) -> Future:
+        """ Runs a store-mutating function on the writer thread, or inline if there isn't one. """
+        assert self._loop is not None
+        if self._executor is not None:
+            return self._loop.run_in_executor(self._executor, function, *args)
+        future = self._loop.create_future()
+        try:
+            future.set_result(function(*args))
+        except Exception as exception:
+            future.set_exception(exception)
+        return future
+
+    def _write(self, function: Callable, *args) -> Future:
+        """ Runs function(*args, callback) via _run, where the store calls callback with each bundle
+            it takes in; the relay then hears about those bundles back on the loop.
+        """
+        applied: List[Decomposition] = []
+        future = self._run(function, *args, applied.append)
+        future.add_done_callback(lambda _: self._notify(applied))
+        return future
+
+    def _notify(self, applied: List[Decomposition]) -> None:
+        if self._closed:
+            return
+        for decomposition in applied:
+            self._relay._on_bundle(decomposition)
+
+    def _receive(self, decomposition: Decomposition, callback: Callable[[Decomposition], None]) -> bool:
+        validate_bundle(decomposition.get_builder())
+        return self._store.apply_bundle(decomposition, callback)
+
+    def _apply(self, decomposition: Decomposition) -> Future:
+        return self._write(self._receive, decomposition)
+
+    async def receive(self, decomposition: Decomposition) -> bool:
+        """ Applies a bundle without blocking the loop, returning True if it was novel. """
+        self._attach()
+        return await self._apply(decomposition)
+
+    def _on_store_readable(self) -> None:
+        """ Another process wrote to the store: pick up its bundles on the writer thread.
+
+            The store's watcher stays readable until the refresh clears it, so it's taken off the
+            loop until then rather than firing on every turn while the job waits for the thread.
+        """
+        assert self._loop is not None
+        self._loop.remove_reader(self._store.fileno())
+        self._write(self._refresh).add_done_callback(self._on_refreshed)
+
+    def _refresh(self, callback: Callable[[Decomposition], None]) -> int:
+        assert isinstance(self._store, AbstractStore)
+        self._store._clear_notifications()  # first, so a write landing during the refresh isn't missed
+        return self._store.refresh(callback)
+
+    def _on_refreshed(self, future: Future) -> None:
+        if future.exception() is not None:
+            self._logger.warning("could not refresh from the store: %s", future.exception())
+        if self._watching and not self._closed and self._loop is not None:
+            self._loop.add_reader(self._store.fileno(), self._on_store_readable)
+
+    def _on_relay_bundle(self, decomposition: Decomposition) -> None:
+        """ Called by the wrapped relay for each new bundle (on the loop, or whatever thread committed it). """
+        if self._loop is None or self._closed:
+            return
+        self._loop.call_soon_threadsafe(self._on_bundle, decomposition)
+
+    def _on_bundle(self, decomposition: Decomposition) -> None:
+        for connection in list(self._connections):
+            if connection.is_closed():
+                self._connections.discard(connection)
+                continue
+            connection.send_bundle(decomposition)
+        for callback in self._callbacks:
+            callback(decomposition)
+
+    def _get_greeting(self, packed: bool = False) -> SyncMessage:
+        return self._store.get_has_map().to_greeting_message(packed=packed)
+
+    def _on_connection_lost(self, connection: AsyncConnection) -> None:
+        self._connections.discard(connection)
+        self._logger.info("connection %s closed", connection)
+
+    def _make_connection(self, **kwargs) -> AsyncConnection:
+        connection = AsyncConnection(self, **kwargs, **self._connection_options)
+        self._connections.add(connection)
+        return connection
+
+    async def start_listening(
+            self,
+            addr: str = "",
+            port: Union[str, int] = "8080",
+            auth: Union[AuthFunc, str, None] = None,
+            certfile: Optional[str] = None,
+            keyfile: Optional[str] = None,
+            reuse_port: bool = False,
+    ):
+        """ Listen for incoming websocket connections; returns the asyncio Server. """
+        loop = self._attach()
+        if bool(certfile) != bool(keyfile):
+            raise ValueError("Need both cert and key files for SSL.")
+        context: Optional[SSLContext] = None
+        if certfile and keyfile:
+            context = create_default_context(Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile, keyfile)
+        auth_func = make_auth_func(auth) if isinstance(auth, str) else auth
+        server = await loop.create_server(
+            lambda: self._make_connection(is_client=False, auth_func=auth_func),
+            host=addr or None, port=int(port), ssl=context, reuse_address=True, reuse_port=reuse_port or None,
+            backlog=1024)
+        security = "secure" if context else "insecure"
+        self._logger.info(f"started {security} async server listening on %r:%r", addr, port)
+        self._servers.append(server)
+        return server
+
+    async def connect_to(
+            self,
+            target: str,
+            auth_data: Optional[str] = None,
+            name: Optional[str] = None,
+    ) -> AsyncConnection:
+        """ Connect to another Gink instance, returning once the websocket is established.
+
+            Raises ConnectionError (ConnectionRefusedError if the server rejected the handshake)
+            if the connection closes before then.
+        """
+        loop = self._attach()
+        match = fullmatch(r"(ws+://)?([a-z0-9.-]+)(?::(\d+))?(?:(/+.*))?$", target, IGNORECASE)
+        if not match:
+            raise ValueError(f"can't connect to: {target}")
+        prefix, host, port, path = match.groups()
+        if prefix and prefix not in ("ws://", "wss://"):
+            raise NotImplementedError("only vanilla and secure websockets currently supported")
+        context = create_default_context() if prefix == "wss://" else None
+        connection = self._make_connection(
+            is_client=True, host=host, path=path or "/", name=name, auth_data=auth_data)
+        try:
+            await loop.create_connection(lambda: connection, host, int(port or "8080"), ssl=context)
+            assert connection.handshake is not None
+            await connection.handshake
+        except Exception:
+            self._connections.discard(connection)
+            raise
+        return connection
+
+    def close(self) -> None:
+        """ Closes the listeners and connections (and the relay, if this created it). """
+        if self._closed:
+            return
+        self._closed = True
+        for server in self._servers:
+            server.close()
+        for connection in list(self._connections):
+            connection.close()
+        if self._watching and self._loop is not None:
+            self._loop.remove_reader(self._store.fileno())
+            self._watching = False
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._owns_store:
+            self._relay.close()
+        elif self._created_relay:
+            Server.close(self._relay)  # leaves the caller's store open
@@ -0,0 +1,261 @@
+""" Contains the Blob value type and the streaming BlobWriter / BlobReader classes.
+
+    Large values are split into fixed size chunks, each stored once as an entry in a
+    well-known directory keyed by the chunk's digest, so identical chunks are only
+    written (and synced to peers) a single time.  The Blob itself only records the
+    digests and total size, and is what actually gets stored in a container.
+"""
+from io import RawIOBase, SEEK_SET, SEEK_CUR, SEEK_END
+from typing import Optional, Iterable, Sequence, Set, List
+from sys import stdout
+
+from .builders import ChangeBuilder, Behavior
+from .muid import Muid
+from .typedefs import GenericTimestamp
+from .utilities import digest
+
+# global container holding chunk digest => chunk bytes
+CHUNKS = Muid(-1, -1, Behavior.BLOB_CHUNKS)
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+class Blob:
+    """ A reference to a large value stored as content-addressed chunks.
+
+        Get one by writing to a BlobWriter, then store it in a container like any other value.
+    """
+    __slots__ = ["digests", "size", "chunk_size"]
+
+    def __init__(self, digests: Sequence[bytes], size: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.digests = tuple(digests)
+        self.size = size
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Blob):
+            return False
+        return (self.digests, self.size) == (other.digests, other.size)
+
+    def __hash__(self):
+        return hash((self.digests, self.size))
+
+    def __repr__(self) -> str:
+        digests = ", ".join(f"bytes.fromhex('{chunk_digest.hex()}')" for chunk_digest in self.digests)
+        return f"Blob([{digests}], size={self.size}, chunk_size={self.chunk_size})"
+
+    def open(self, database=None) -> 'BlobReader':
+        """ Returns a file-like object for reading the contents, one chunk in memory at a time. """
+        return BlobReader(self, database)
+
+    def read(self, database=None) -> bytes:
+        """ Reads the entire contents into memory. """
+        return b"".join(self.iter_chunks(database))
+
+    def iter_chunks(self, database=None) -> Iterable[bytes]:
+        """ Yields the chunks of this blob in order. """
+        store = _get_database(database).get_store()
+        for chunk_digest in self.digests:
+            yield _load_chunk(store, chunk_digest)
+
+
+class BlobWriter(RawIOBase):
+    """ File-like object that stores everything written to it as a Blob.
+
+        Chunks are committed in bundles of chunks_per_bundle as they fill up, so memory use is
+        bounded by the chunk size rather than the size of the value.  Chunks already present
+        in the store aren't written again.  After close(), get_blob() returns the reference.
+    """
+
+    def __init__(
+            self,
+            database=None,
+            *,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            chunks_per_bundle: int = 4,
+            comment: Optional[str] = None):
+        super().__init__()
+        if chunk_size <= 0 or chunks_per_bundle <= 0:
+            raise ValueError("chunk_size and chunks_per_bundle must be positive")
+        self._database = _get_database(database)
+        self._store = self._database.get_store()
+        self._chunk_size = chunk_size
+        self._chunks_per_bundle = chunks_per_bundle
+        self._comment = comment
+        self._buffer = bytearray()
+        self._digests: List[bytes] = []
+        self._pending: Set[bytes] = set()
+        self._bundler = self._database.bundler(comment)
+        self._size = 0
+        self._blob: Optional[Blob] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed BlobWriter")
+        view = memoryview(data).cast("B")
+        self._buffer += view
+        chunk_size = self._chunk_size
+        if len(self._buffer) >= chunk_size:
+            start = 0
+            while len(self._buffer) - start >= chunk_size:
+                self._add_chunk(bytes(self._buffer[start:start + chunk_size]))
+                start += chunk_size
+            del self._buffer[:start]
+        return len(view)
+
+    def _add_chunk(self, chunk: bytes):
+        chunk_digest = digest(chunk)
+        self._digests.append(chunk_digest)
+        self._size += len(chunk)
+        if chunk_digest in self._pending or self._store.get_entry_by_key(CHUNKS, chunk_digest, -1):
+            return
+        self._bundler.add_change(_chunk_change(chunk_digest, chunk))
+        self._pending.add(chunk_digest)
+        if len(self._pending) >= self._chunks_per_bundle:
+            self._bundler.commit()
+            self._bundler = self._database.bundler(self._comment)
+            self._pending = set()
+
+    def close(self):
+        if not self.closed:
+            if self._buffer:
+                self._add_chunk(bytes(self._buffer))
+                self._buffer = bytearray()
+            if self._pending:
+                self._bundler.commit()
+            self._blob = Blob(self._digests, self._size, self._chunk_size)
+        super().close()
+
+    def get_blob(self) -> Blob:
+        """ Returns the reference to what was written; only available once closed. """
+        if self._blob is None:
+            raise ValueError("BlobWriter must be closed before getting the blob")
+        return self._blob
+
+
+class BlobReader(RawIOBase):
+    """ Seekable file-like object over the contents of a Blob. """
+
+    def __init__(self, blob: Blob, database=None):
+        super().__init__()
+        self._blob = blob
+        self._store = _get_database(database).get_store()
+        self._position = 0
+        self._chunk_index = -1
+        self._chunk = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_CUR:
+            offset += self._position
+        elif whence == SEEK_END:
+            offset += self._blob.size
+        elif whence != SEEK_SET:
+            raise ValueError(f"invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def _get_chunk(self, index: int) -> bytes:
+        if index != self._chunk_index:
+            self._chunk = _load_chunk(self._store, self._blob.digests[index])
+            self._chunk_index = index
+        return self._chunk
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self._blob.size:
+            return 0
+        index, offset = divmod(self._position, self._blob.chunk_size)
+        chunk = self._get_chunk(index)
+        view = memoryview(buffer).cast("B")
+        count = min(len(view), len(chunk) - offset)
+        view[:count] = chunk[offset:offset + count]
+        self._position += count
+        return count
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """ Reads up to size bytes (everything remaining if negative), only short at the end. """
+        remaining = self._blob.size - self._position
+        if size is not None and 0 <= size < remaining:
+            remaining = size
+        parts = []
+        while remaining > 0:
+            index, offset = divmod(self._position, self._blob.chunk_size)
+            chunk = self._get_chunk(index)
+            part = chunk[offset:offset + remaining] if offset or remaining < len(chunk) else chunk
+            parts.append(part)
+            self._position += len(part)
+            remaining -= len(part)
+        return b"".join(parts)
+
+    def readall(self) -> bytes:
+        return self.read()
+
+
+def put_chunks(chunks: Iterable[bytes], database=None, comment: Optional[str] = None) -> None:
+    """ Stores chunks (that blobs refer to by digest) not already in the database, in one bundle.
+
+        Database.dump writes the chunks of a database's blobs as a call to this, so that the
+        blobs still have their contents when the dump is loaded.
+    """
+    database = _get_database(database)
+    store = database.get_store()
+    bundler = database.bundler(comment)
+    added: Set[bytes] = set()
+    for chunk in chunks:
+        chunk_digest = digest(chunk)
+        if chunk_digest not in added and not store.get_entry_by_key(CHUNKS, chunk_digest, -1):
+            bundler.add_change(_chunk_change(chunk_digest, chunk))
+            added.add(chunk_digest)
+    if added:
+        bundler.commit()
+
+
+def dump_chunks(database, as_of: GenericTimestamp = None, file=stdout) -> None:
+    """ Writes the chunks in the database as a put_chunks call (nothing if there aren't any). """
+    as_of = database.resolve_timestamp(as_of)
+    started = False
+    for found in database.get_store().get_keyed_entries(CHUNKS, Behavior.BLOB_CHUNKS, as_of):
+        file.write(",\n\t" if started else "put_chunks([\n\t")  # a chunk at a time, not all of them at once
+        file.write(f"bytes.fromhex('{found.builder.value.octets.hex()}')")
+        started = True
+    if started:
+        file.write("])\n\n")
+
+
+def _chunk_change(chunk_digest: bytes, chunk: bytes) -> ChangeBuilder:
+    change_builder = ChangeBuilder()
+    entry_builder = change_builder.entry
+    entry_builder.behavior = Behavior.BLOB_CHUNKS
+    CHUNKS.put_into(entry_builder.container)
+    entry_builder.key.octets = chunk_digest
+    entry_builder.value.octets = chunk
+    return change_builder
+
+
+def _get_database(database):
+    if database is None:
+        from .database import Database
+        database = Database.get_most_recently_created_database()
+    return database
+
+
+def _load_chunk(store, chunk_digest: bytes) -> bytes:
+    found = store.get_entry_by_key(CHUNKS, chunk_digest, -1)
+    if found is None:
+        raise KeyError(f"blob chunk {chunk_digest.hex()} not found in store")
+    return found.builder.value.octets
@@ -26,6 +26,7 @@ class BoundBundler(Bundler):
         self._comment = comment
         self._changes: List[ChangeBuilder] = []
         self._is_open = True
+        self._needs_validation = False
         self._logger = getLogger(self.__class__.__name__)
 
     def __len__(self):
@@ -45,9 +46,18 @@ class BoundBundler(Bundler):
             builder = ChangeBuilder()
             builder.entry.CopyFrom(entry_builder)  # type: ignore # pylint: disable=maybe-no-member
         assert isinstance(builder, ChangeBuilder)
+        if builder.HasField("entry"):
+            self._needs_validation = True
         self._changes.append(builder)
         return muid
 
+    def _add_validated_change(self, builder: ChangeBuilder) -> Muid:
+        if not self._is_open:
+            raise AssertionError("bundle not open")
+        self._count_items += 1
+        self._changes.append(builder)
+        return Muid(offset=self._count_items, bundler=self)
+
     def is_open(self) -> bool:
         return self._is_open
 
@@ -68,18 +78,18 @@ class BoundBundler(Bundler):
             assert seen_to is not None
             timestamp = generate_timestamp()
             assert timestamp > seen_to
-            assert last_link.hex_hash is not None
+            assert last_link.digest is not None
             bundle_bytes = combine(
                 chain=chain,
                 timestamp=timestamp,
                 previous=seen_to,
-                prior_hash=last_link.hex_hash,
+                prior_hash=last_link.digest,
                 signing_key=signing_key,
                 changes=self._changes,
                 comment=self._comment,
             )
             wrap = Decomposition(bundle_bytes)
-            added = self._database.receive(wrap)
+            added = self._database.receive(wrap, validated=not self._needs_validation)
             assert added
             self._decomposition = wrap
 
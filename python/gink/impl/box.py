@@ -8,7 +8,7 @@ from .container import Container
 from .muid import Muid
 from .database import Database
 from .bundler import Bundler
-from .coding import BOX
+from .coding import BOX, value_repr
 
 
 class Box[T: UserValue|Container](Container):
@@ -86,7 +86,7 @@ class Box[T: UserValue|Container](Container):
 
         contents = cast(T, self._get_occupant(found.builder, found.address))
 
-        result = f"""{self.__class__.__name__}({identifier}, contents={repr(contents)})"""
+        result = f"""{self.__class__.__name__}({identifier}, contents={value_repr(contents)})"""
         return result
 
     def size(self, *, as_of: GenericTimestamp = None) -> int:
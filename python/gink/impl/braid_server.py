@@ -6,9 +6,10 @@ from collections import defaultdict
 
 from .builders import SyncMessage
 from .listener import Listener
-from .connection import Connection
+from .connection import Connection, EncodedMessages
+from .wsgi_workers import WsgiWorkers
 from .relay import Relay
-from .typedefs import Request, inf, AUTH_READ, AUTH_RITE, AuthFunc
+from .typedefs import Request, inf, AUTH_READ, AUTH_RITE, AuthFunc, Limit
 from .server import Server
 from .looping import Selectable
 from .braid import Braid
@@ -18,6 +19,7 @@ from .has_map import HasMap
 from .bundle_info import BundleInfo
 from .utilities import experimental
 from .tuples import Chain
+from .muid import Muid
 
 @experimental
 class BraidServer(Server):
@@ -29,6 +31,7 @@ class BraidServer(Server):
             data_relay: Relay,
             braid_func: Callable[[Request], Braid],
             wsgi_func: Optional[Callable] = None,
+            wsgi_threads: int = 0,
     ):
         super().__init__()
         self._connection_braid_map: Dict[Connection, Braid] = dict()
@@ -38,14 +41,20 @@ class BraidServer(Server):
         self._logger = getLogger(self.__class__.__name__)
         self._count_connections = 0
         self._wsgi_func = wsgi_func
+        self._wsgi_workers: Optional[WsgiWorkers] = None
+        if wsgi_func and wsgi_threads:
+            self._wsgi_workers = WsgiWorkers(wsgi_threads)
+            self._add_selectable(self._wsgi_workers)
         self._braid_func = braid_func
-        self._chain_connections_map: Dict[Chain, Set[Connection]] = defaultdict(lambda: set())
+        self._braid_limits: Dict[Braid, Dict[Chain, Limit]] = dict()
+        self._chain_braids_map: Dict[Chain, Set[Braid]] = defaultdict(lambda: set())
+        self._watched_databases: Set[Relay] = set()
+        self._encoded = EncodedMessages()  # shared by the connections a bundle goes out to
         """
-
-
-            Note that the braid returned by the braid_func should not be modified once returned except by this
-            braid server, otherwise, the braid server won't know about chains that have been added and won't
-            send the appropriate updates to it.
+            The limits of each braid in use are kept in memory (in _braid_limits), so sending a
+            bundle on only takes a dict lookup per braid rather than a store read per connection.
+            The table is loaded when the first connection using a braid greets, and reloaded when
+            the braid's database sees a bundle that changes it.
         """
 
     def _get_connections(self) -> Iterable[Connection]:
@@ -61,28 +70,73 @@ class BraidServer(Server):
         info = decomposition.get_info()
         self._logger.debug("received bundle: %s", info)
         chain = info.get_chain()
-        for connection in self._chain_connections_map.get(chain, self.EMPTY):
-            braid = self._connection_braid_map[connection]
-            self._logger.debug("considering connection: %s", connection.name)
-            if braid.get(chain, 0) > info.timestamp:
+        for braid in list(self._chain_braids_map.get(chain, self.EMPTY)):
+            if self._braid_limits[braid].get(chain, 0) <= info.timestamp:
+                continue
+            for connection in list(self._braid_connection_map[braid]):
                 # Note: connection internally keeps track of what peer has and will prevent echo
                 try:
                     self._logger.debug("sending bundle to connection: %s", connection.name)
                     connection.send_bundle(decomposition)
+                    connection.flush()
                 except Exception as e:
                     self._logger.warning(f"could not send bundle to {connection.name}: {e}")
                     self._disconnect(connection)
+        self._encoded.clear()
+
+    def _after_braid_database_receives_bundle(self, decomposition: Decomposition) -> None:
+        """ Reloads the limits of any braid in use that the bundle changes. """
+        if not self._braid_limits:
+            return
+        info = decomposition.get_info()
+        changed: Set[Muid] = set()
+        for change in decomposition.get_builder().changes:
+            if change.HasField("entry"):
+                changed.add(Muid.create(info, change.entry.container))
+            elif change.HasField("clearance"):
+                changed.add(Muid.create(info, change.clearance.container))  # type: ignore
+        for braid in list(self._braid_limits):
+            if braid.get_muid() in changed:
+                self._load_limits(braid)
+
+    def _load_limits(self, braid: Braid) -> Dict[Chain, Limit]:
+        """ (Re)reads the limits of a braid into the in-memory table and chain index. """
+        limits = dict(braid.items())
+        for chain in self._braid_limits.get(braid, self.EMPTY):
+            if chain not in limits:
+                self._unindex(chain, braid)
+        for chain in limits:
+            self._chain_braids_map[chain].add(braid)
+        self._braid_limits[braid] = limits
+        return limits
+
+    def _unindex(self, chain: Chain, braid: Braid) -> None:
+        braids = self._chain_braids_map.get(chain)
+        if braids is not None:
+            braids.discard(braid)
+            if not braids:
+                del self._chain_braids_map[chain]
+
+    def _forget_braid(self, braid: Braid) -> None:
+        for chain in self._braid_limits.pop(braid, self.EMPTY):
+            self._unindex(chain, braid)
+        self._braid_connection_map.pop(braid, None)
 
     def _get_greeting(self, connection: Connection) -> SyncMessage:
         braid = self._braid_func(connection)
         if not isinstance(braid, Braid):
             raise ValueError("braid should be a Braid instance")
+        database = braid._database
+        if database not in self._watched_databases:
+            database.add_callback(self._after_braid_database_receives_bundle)
+            self._watched_databases.add(database)
+        limits = self._braid_limits.get(braid)
+        if limits is None:
+            limits = self._load_limits(braid)
         self._connection_braid_map[connection] = braid
         self._braid_connection_map[braid].add(connection)
-        for chain, _ in braid.items():
-            self._chain_connections_map[chain].add(connection)
-        has_map = self._data_relay.get_bundle_store().get_has_map(limit_to=dict(braid.items()))
-        return has_map.to_greeting_message()
+        has_map = self._data_relay.get_bundle_store().get_has_map(limit_to=limits)
+        return has_map.to_greeting_message(packed=connection.accepts_packed_greeting())
 
     @override
     def _on_listener_ready(self, listener: Listener) -> Iterable[Selectable]:
@@ -92,6 +146,7 @@ class BraidServer(Server):
             If the connection is not accepted, then an empty list is returned.
         """
         (socket, addr) = listener.accept()
+        host, port = addr[:2] if isinstance(addr, tuple) else ("localhost", 0)  # unix sockets have no address
         context = listener.get_context()
         if context:
             try:
@@ -103,16 +158,18 @@ class BraidServer(Server):
         self._count_connections += 1
         connection: Connection = Connection(
             socket=socket,
-            host=addr[0],
-            port=addr[1],
+            host=host,
+            port=port,
             conn_func=self._get_greeting,
             auth_func=listener.get_auth_func(),
-            name="connection #%s from %s" % (self._count_connections, addr[0]),
+            name="connection #%s from %s" % (self._count_connections, host),
             on_ws_act=self._on_websocket_ready,
             wsgi_func=self._wsgi_func,
+            wsgi_workers=self._wsgi_workers,
+            encoded=self._encoded,
         )
         self._add_selectable(connection)
-        self._logger.debug("accepted incoming connection from %s", addr[0])
+        self._logger.debug("accepted incoming connection from %s", host)
         return [connection]
 
     def _on_websocket_ready(self, connection: Connection):
@@ -128,39 +185,41 @@ class BraidServer(Server):
                         raise Finished("don't have braid for this connection")
                     info = thing.get_info()
                     chain = info.get_chain()
-                    if chain not in braid:
+                    if chain not in self._braid_limits[braid]:
                         if info.timestamp != info.chain_start:
                             self._logger.warning("connection tried pushing non-start to a braid")
                             raise Finished()
-                        braid.set(chain, inf)
-                        connected_to_this_braid = self._braid_connection_map[braid]
-                        for conn in list(connected_to_this_braid):
-                            self._chain_connections_map[chain].add(conn)
+                        braid.set(chain, inf)  # the braid database's callback adds it to the table
                     self._data_relay.receive(thing)
-                    connection.send(thing.get_info().as_acknowledgement())
+                    connection.send_ack(thing.get_info())
                 elif isinstance(thing, HasMap):  # greeting message
                     if not connection.get_permissions() & AUTH_READ:
                         self._logger.debug("ignoring greeting from connection without read perms")
                         continue
                     if braid is None:
                         raise Finished("don't have braid for this connection")
-                    self._data_relay.get_bundle_store().get_bundles(
-                        connection.send_bundle, peer_has=thing, limit_to=dict(braid.items()))
-                    sync_message = SyncMessage()
-                    sync_message.signal = SyncMessage.Signal.INITIAL_BUNDLES_SENT
-                    connection.send(sync_message)
+                    limit_to = dict(self._braid_limits[braid])
+                    connection.start_backfill(self._data_relay.get_bundle_store(), limit_to=limit_to)
                 elif isinstance(thing, BundleInfo):  # an ack:
                     pass
                 else:
                     raise Finished(f"unexpected object {thing}")
+            connection.flush()
         except Finished:
             self._disconnect(connection)
             raise
 
+    @override
+    def close(self):
+        if self._wsgi_workers:
+            self._wsgi_workers.close()
+        super().close()
+
     def _disconnect(self, connection: Connection):
         braid = self._connection_braid_map.pop(connection, None)
         if braid:
-            for chain, _ in braid.items():
-                self._chain_connections_map[chain].discard(connection)
-            self._braid_connection_map[braid].discard(connection)
+            connections = self._braid_connection_map[braid]
+            connections.discard(connection)
+            if not connections:
+                self._forget_braid(braid)
         self._remove_selectable(connection)
@@ -126,6 +126,7 @@ if TYPE_CHECKING:
         TABLE = 12
         BRAID = 13
         ACCUMULATOR = 14
+        BLOB_CHUNKS = 15
 
         @staticmethod
         def items() -> Iterator[Tuple[str, int]]:
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 """ Contains the BundleInfo class. """
-from typing import Optional
+from typing import Optional, Union
 from struct import Struct
 
 from .builders import SyncMessage, BundleBuilder
@@ -9,43 +9,116 @@ from .tuples import Chain
 
 
 class BundleInfo:
-    """ Metadata about a particular change set relevant for syncing. """
+    """ Metadata about a particular change set relevant for syncing.
+
+        The hash is kept as the raw 32 byte digest, and the sort key, chain and packed
+        binary form are computed at most once, so instances should be treated as immutable.
+        The from_builder, from_bytes and from_ack constructors skip keyword processing
+        and are what the stores and connections use on their hot paths.
+    """
     _struct = Struct(">QQQQ")
-    __slots__ = ["timestamp", "medallion", "chain_start", "previous", "hex_hash", "comment"]
+    _fields = ("timestamp", "medallion", "chain_start", "previous", "hex_hash", "comment")
+    __slots__ = ["timestamp", "medallion", "chain_start", "previous", "digest", "comment",
+                 "_sort_key", "_chain", "_packed"]
 
     timestamp: MuTimestamp
     medallion: Medallion
     chain_start: MuTimestamp
     previous: MuTimestamp
-    hex_hash: Optional[str]
+    digest: Optional[bytes]
     comment: Optional[str]
-
-    def __init__(self, *, builder: Optional[BundleBuilder] = None, encoded: bytes = b'\x00' * 32, **kwargs):
-
-        if len(encoded) < 32:
-            raise ValueError("need at least 32 bytes to unpack")
-        unpacked = self._struct.unpack(encoded[0:32])
-        (self.timestamp, self.medallion, self.chain_start, self.previous) = unpacked
-        self.hex_hash = encoded[32:64].hex() if len(encoded) > 32 else None
-        self.comment = encoded[64:].decode() if len(encoded) > 64 else None
-
-        if builder:
-            self.medallion = builder.medallion  # type: ignore # pylint: disable=maybe-no-member
-            self.timestamp = builder.timestamp  # type: ignore # pylint: disable=maybe-no-member
-            self.chain_start = builder.chain_start  # type: ignore  # pylint: disable=maybe-no-member
-            self.comment = builder.comment  # type: ignore # pylint: disable=maybe-no-member\
-            self.previous = builder.previous  # type: ignore # pylint: disable=maybe-no-member
-            assert "hex_hash" in kwargs
-
-        if "chain" in kwargs:
-            chain = kwargs["chain"]
+    _sort_key: tuple
+    _chain: Optional[Chain]
+    _packed: Optional[bytes]
+
+    def __init__(
+            self, *,
+            timestamp: MuTimestamp = 0,
+            medallion: Medallion = 0,
+            chain_start: MuTimestamp = 0,
+            previous: MuTimestamp = 0,
+            digest: Optional[bytes] = None,
+            hex_hash: Optional[str] = None,
+            comment: Optional[str] = None,
+            chain: Optional[Chain] = None):
+        if chain is not None:
             assert isinstance(chain, Chain)
-            self.chain_start = chain.chain_start
-            self.medallion = chain.medallion
-        for key in self.__slots__:
-            if key in kwargs:
-                val = kwargs[key]
-                setattr(self, key, val)
+            chain_start = chain.chain_start
+            medallion = chain.medallion
+        if hex_hash is not None:
+            digest = bytes.fromhex(hex_hash)
+        self.timestamp = timestamp
+        self.medallion = medallion
+        self.chain_start = chain_start
+        self.previous = previous
+        self.digest = digest
+        self.comment = comment
+        self._sort_key = (timestamp, medallion, chain_start)
+        self._chain = chain
+        self._packed = None
+
+    @classmethod
+    def _create(
+            cls,
+            timestamp: MuTimestamp,
+            medallion: Medallion,
+            chain_start: MuTimestamp,
+            previous: MuTimestamp,
+            digest: Optional[bytes],
+            comment: Optional[str],
+            packed: Optional[bytes] = None,
+    ) -> 'BundleInfo':
+        """ Positional constructor that bypasses __init__ keyword handling. """
+        self = object.__new__(cls)
+        self.timestamp = timestamp
+        self.medallion = medallion
+        self.chain_start = chain_start
+        self.previous = previous
+        self.digest = digest
+        self.comment = comment
+        self._sort_key = (timestamp, medallion, chain_start)
+        self._chain = None
+        self._packed = packed
+        return self
+
+    @classmethod
+    def from_builder(cls, builder: BundleBuilder, digest: bytes) -> 'BundleInfo':
+        """ Creates an info from a parsed bundle and the digest of its signed bytes. """
+        return cls._create(
+            builder.timestamp,  # type: ignore # pylint: disable=maybe-no-member
+            builder.medallion,  # type: ignore # pylint: disable=maybe-no-member
+            builder.chain_start,  # type: ignore # pylint: disable=maybe-no-member
+            builder.previous,  # type: ignore # pylint: disable=maybe-no-member
+            digest,
+            builder.comment or None,  # type: ignore # pylint: disable=maybe-no-member
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BundleInfo':
+        """ the opposite of __bytes__ """
+        if not (isinstance(data, bytes) and len(data) >= 32):
+            raise ValueError("bad argument to BundleInfo.from_bytes: %r" % data)
+        (timestamp, medallion, chain_start, previous) = cls._struct.unpack_from(data)
+        size = len(data)
+        digest = data[32:64] if size > 32 else None
+        comment = data[64:].decode() if size > 64 else None
+        return cls._create(timestamp, medallion, chain_start, previous, digest, comment,
+                           data if digest is not None else None)
+
+    @classmethod
+    def from_ack(cls, sync_message: Union[SyncMessage, SyncMessage.Ack]) -> 'BundleInfo':  # type: ignore
+        """ reverse of as_acknowledgement (also accepts an Ack from a Batch) """
+        if isinstance(sync_message, SyncMessage):
+            assert sync_message.HasField("ack")
+            ack = sync_message.ack  # type: ignore
+        else:
+            ack = sync_message
+        return cls._create(ack.timestamp, ack.medallion, ack.chain_start, ack.previous, None, None)
+
+    @property
+    def hex_hash(self) -> Optional[str]:
+        """ The digest as a hex string (or None if unknown). """
+        return self.digest.hex() if self.digest is not None else None
 
     def as_acknowledgement(self) -> SyncMessage:
         """ convert to an ack message that can be sent to a peer """
@@ -57,51 +130,41 @@ class BundleInfo:
         ack.previous = self.previous
         return sync_message
 
-    @staticmethod
-    def from_ack(sync_message: SyncMessage):
-        """ reverse of as_ack """
-        assert sync_message.HasField("ack")
-        ack = sync_message.ack  # type: ignore
-        return BundleInfo(
-            chain_start=ack.chain_start,
-            medallion=ack.medallion,
-            timestamp=ack.timestamp,
-            previous=ack.previous,
-        )
-
-    @staticmethod
-    def from_bytes(data: bytes) -> 'BundleInfo':
-        """ the opposite of __bytes__ """
-        if not (isinstance(data, bytes) and len(data) >= 32):
-            raise ValueError("bad argument to BundleInfo.from_bytes: %r" % data)
-        return BundleInfo(encoded=data)
-
     def get_chain(self) -> Chain:
         """Gets a Chain tuple saying which chain this change set came from."""
-        return Chain(chain_start=self.chain_start, medallion=self.medallion)
+        chain = self._chain
+        if chain is None:
+            chain = self._chain = Chain(self.medallion, self.chain_start)
+        return chain
+
+    def get_sort_key(self) -> tuple:
+        """ Returns the (timestamp, medallion, chain_start) tuple used for ordering. """
+        return self._sort_key
 
     def __bytes__(self) -> bytes:
         """ Returns: a binary representation that sorts according to (timestamp, medallion)."""
-        assert self.hex_hash is not None, "hex_hash is None!"
-        num = self._struct.pack(self.timestamp, self.medallion, self.chain_start, self.previous)
-        return num + bytes.fromhex(self.hex_hash) + (self.comment.encode() if self.comment else b"")
-
-    def __lt__(self, other):
-        assert isinstance(other, type(self))
-        return self._essential_tuple() < other._essential_tuple()
+        packed = self._packed
+        if packed is None:
+            assert self.digest is not None, "digest is None!"
+            packed = self._struct.pack(self.timestamp, self.medallion, self.chain_start, self.previous)
+            packed += self.digest
+            if self.comment:
+                packed += self.comment.encode()
+            self._packed = packed
+        return packed
+
+    def __lt__(self, other: 'BundleInfo') -> bool:
+        return self._sort_key < other._sort_key
 
     def __repr__(self) -> str:
-        contents = [f"{x}={repr(getattr(self, x))}" for x in self.__slots__ if getattr(self, x)]
+        contents = [f"{x}={repr(getattr(self, x))}" for x in self._fields if getattr(self, x)]
         joined = ", ".join(contents)
         return self.__class__.__name__ + '(' + joined + ')'
 
-    def _essential_tuple(self) -> tuple:
-        return (self.timestamp, self.medallion, self.chain_start)
-
     def __eq__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, BundleInfo):
             return False
-        return self._essential_tuple() == other._essential_tuple()
+        return self._sort_key == other._sort_key
 
     def __hash__(self):
-        return hash(self._essential_tuple())
+        return hash(self._sort_key)
@@ -7,6 +7,7 @@ from .tuples import Chain
 from .typedefs import Limit, Medallion, MuTimestamp, Selectable
 from .has_map import HasMap
 from .decomposition import Decomposition
+from .bundle_info import BundleInfo
 from .watcher import Watcher
 
 class BundleStore(Selectable):
@@ -30,6 +31,7 @@ class BundleStore(Selectable):
         callback: Callable[[Decomposition], None], *,
         peer_has: Optional[HasMap] = None,
         limit_to: Optional[Mapping[Chain, Limit]] = None,
+        start_after: Optional[BundleInfo] = None,
     ):
         """ Calls `callback` for all bunles stored,  limited to those designed by the `limit_to` (if present).
 
@@ -46,6 +48,8 @@ class BundleStore(Selectable):
 
             The peer_has data can be used to optimize what the store is sending to only what the
             peer needs, but it can be ignored, and it's up to the callback to drop unneeded bundles.
+
+            If start_after is given, the scan resumes after that bundle (as last passed to the callback).
         """
 
     @abstractmethod
@@ -56,6 +60,37 @@ class BundleStore(Selectable):
     def get_has_map(self, limit_to: Optional[Mapping[Chain, Limit]]=None) -> HasMap:
         """Returns a tracker showing what this store has at the time this function is called."""
 
+    def supports_snapshots(self) -> bool:
+        """ True if this kind of store can serve and install snapshots (see get_snapshot). """
+        return False
+
+    def get_snapshot(self, part_bytes: int = 2**20) -> Tuple[HasMap, Iterator[Tuple[str, List[bytes], List[bytes]]]]:
+        """ Returns the chains this store has and a copy of its contents as of one point in time.
+
+            The iterator gives (table, keys, values) parts of roughly part_bytes each, which a
+            new peer can install with begin_snapshot / add_snapshot_part / finish_snapshot rather
+            than replaying every bundle.  Bundles added after the call aren't in the snapshot.
+
+            Raises ValueError if the store's current contents can't be shared this way.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support snapshots")
+
+    def begin_snapshot(self) -> None:
+        """ Prepares an empty store to install a snapshot (raising ValueError if it isn't empty). """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support snapshots")
+
+    def add_snapshot_part(self, table: str, keys: Sequence[bytes], values: Sequence[bytes]) -> None:
+        """ Writes one part of a snapshot from get_snapshot on another store. """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support snapshots")
+
+    def finish_snapshot(self) -> None:
+        """ Marks the snapshot being installed as complete. """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support snapshots")
+
+    def abort_snapshot(self) -> None:
+        """ Throws away a partly installed snapshot, leaving the store empty again. """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support snapshots")
+
     @abstractmethod
     def _get_file_path(self) -> Optional[Path]:
         """ Return the underlying file name, or None if the store isn't file backed.
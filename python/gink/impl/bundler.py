@@ -49,6 +49,13 @@ class Bundler(ABC):
     def add_change(self, builder: Union[ChangeBuilder, EntryBuilder, ContainerBuilder]) -> Muid:
         """ adds a single change (in the form of the proto builder) """
 
+    def _add_validated_change(self, builder: ChangeBuilder) -> Muid:
+        """ Adds a change whose entry (if any) has already been checked by the caller.
+
+            Implementations may use this to skip re-validating locally produced bundles.
+        """
+        return self.add_change(builder)
+
     @abstractmethod
     def commit(self, _skip_if_empty=True):
         """ Finishes the bundle and adds it to the database. """
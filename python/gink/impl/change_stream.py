@@ -0,0 +1,297 @@
+""" Contains ChangeStream, for tailing a database's changes with a blocking or an async iterator. """
+from typing import Any, Deque, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+from asyncio import AbstractEventLoop, Future, get_running_loop
+from collections import deque
+from logging import getLogger
+from threading import Condition, get_ident
+
+from .decomposition import Decomposition
+from .has_map import HasMap
+from .lmdb_store import LmdbStore
+from .bundle_info import BundleInfo
+from .muid import Muid
+from .subscriptions import ContainerChanges, Subscription, split_changes
+
+DROP = "drop"
+BLOCK = "block"
+COALESCE = "coalesce"
+
+
+class Resync(NamedTuple):
+    """ Stands in a change stream for events dropped because the consumer fell behind.
+
+        With the coalesce policy, the stream goes on to replay what was missed from the store
+        (when it keeps bundles), so consumers can treat this as a hint to refresh any caches.
+        One with nothing dropped is sent when a snapshot has replaced the store's contents.
+    """
+    dropped: int
+
+
+class _SliceFull(Exception):
+    pass
+
+
+class ChangeStream:
+    """ Iterates over the changes made to a database (or to some of its containers) as they happen.
+
+        Events are ContainerChanges (as given to Database.subscribe) or Resync markers.  Use it
+        either as a blocking iterator from a thread other than the one running the loop, or with
+        `async for` (on any event loop; with AsyncRelay, on the same one).
+
+        Events wait in a queue of at most max_queued, and what happens when the consumer
+        falls that far behind depends on overflow:
+            "drop": new events are thrown away (see get_dropped)
+            "block": the thread applying bundles waits for room (unless it's the consumer's)
+            "coalesce": the queue is replaced by one Resync marker, after which the stream
+                replays what the consumer hadn't seen from the store, a slice at a time
+        So a slow consumer costs a bounded amount of memory whichever policy is used.
+
+        Pass since (a HasMap, e.g. from get_position of an earlier stream) to start by
+        replaying the bundles in the store that aren't in it.  Replays read the store from the
+        consumer's thread, which LmdbStore supports; other stores should be read from the loop's.
+        With `async for` on an LmdbStore, they're read in the loop's default executor instead,
+        so as not to hold up the loop.
+    """
+
+    def __init__(
+            self,
+            database,
+            since: Optional[HasMap] = None,
+            containers: Optional[Iterable[Any]] = None,
+            max_queued: int = 1024,
+            overflow: str = COALESCE):
+        if overflow not in (DROP, BLOCK, COALESCE):
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        if max_queued < 1:
+            raise ValueError("max_queued must be at least one")
+        self._database = database
+        self._store = database.get_store()
+        self._max_queued = max_queued
+        self._overflow = overflow
+        self._queue: Deque[Union[List[ContainerChanges], Resync]] = deque()  # events by bundle
+        self._condition = Condition()
+        self._waiters: List[Tuple[AbstractEventLoop, Future]] = []
+        self._consumer: Optional[int] = None  # thread ident of the last consumer
+        self._dropped = 0
+        self._closed = False
+        self._logger = getLogger(self.__class__.__name__)
+        self._containers: Optional[Set[Muid]] = None
+        self._threaded_reads = isinstance(self._store, LmdbStore)
+        self._replaying = False
+        self._replay_after: Optional[BundleInfo] = None
+        self._replayed: Deque[List[ContainerChanges]] = deque()
+        self._current: Deque[ContainerChanges] = deque()  # the rest of the bundle being given out
+        self._seen = since.copy() if since is not None else self._store.get_has_map()
+        if since is not None:
+            self._start_replay()
+        self._subscriptions: List[Subscription] = []
+        if containers is None:
+            self._subscriptions.append(database.subscribe(None, self._on_changes, on_replaced=self._on_replaced))
+        else:
+            self._containers = {container.get_muid() for container in containers}
+            for muid in self._containers:
+                on_replaced = None if self._subscriptions else self._on_replaced  # once is enough
+                self._subscriptions.append(database.subscribe(muid, self._on_changes, on_replaced=on_replaced))
+
+    def get_position(self) -> HasMap:
+        """ What the consumer has been given; pass as since to a new stream to carry on from here. """
+        with self._condition:
+            return self._seen.copy()
+
+    def get_dropped(self) -> int:
+        """ How many events have been dropped (or coalesced) because the queue was full. """
+        return self._dropped
+
+    def qsize(self) -> int:
+        """ How many bundles' worth of events are waiting. """
+        return len(self._queue)
+
+    def _on_changes(self, event: ContainerChanges) -> None:
+        """ Called on the loop's thread for each new event. """
+        with self._condition:
+            if self._closed:
+                return
+            last = self._queue[-1] if self._queue else None
+            if isinstance(last, list) and last[0].info == event.info:
+                last.append(event)  # another container changed by the same bundle
+                return
+            if len(self._queue) >= self._max_queued:
+                overflow = self._overflow
+                if overflow == BLOCK and self._consumer == get_ident():
+                    overflow = COALESCE  # waiting for ourselves would never end
+                if overflow == BLOCK:
+                    while len(self._queue) >= self._max_queued and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        return
+                elif overflow == DROP:
+                    self._dropped += 1
+                    return
+                else:
+                    dropped = 1 + sum(item.dropped if isinstance(item, Resync) else 1 for item in self._queue)
+                    self._dropped += 1 + sum(1 for item in self._queue if isinstance(item, list))
+                    self._queue.clear()
+                    self._queue.append(Resync(dropped))
+                    self._wake()
+                    return
+            self._queue.append([event])
+            self._wake()
+
+    def _on_replaced(self) -> None:
+        """ A snapshot replaced the store, so the consumer gets a Resync and then what it hadn't seen. """
+        with self._condition:
+            if not self._closed:
+                self._queue.append(Resync(0))
+                self._wake()
+
+    def _wake(self) -> None:
+        """ Lets waiting consumers know there's something in the queue (with the condition held). """
+        self._condition.notify_all()
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_if_pending, future)
+
+    def _next_or_none(self, read_store: bool = True) -> Union[ContainerChanges, Resync, None]:
+        """ Returns the next event if there's one ready (or raises StopIteration if closed).
+
+            With read_store False, returns None rather than reading a slice of a replay.
+        """
+        self._consumer = get_ident()
+        while True:
+            if self._current:
+                return self._current.popleft()
+            if self._needs_slice():
+                if not read_store:
+                    return None
+                self._replay_slice()
+            with self._condition:
+                if self._replayed:
+                    item: Union[List[ContainerChanges], Resync] = self._replayed.popleft()
+                elif self._replaying and not self._closed:
+                    continue
+                elif self._queue:
+                    item = self._queue.popleft()
+                    self._condition.notify_all()  # there's room for a blocked writer
+                elif self._closed:
+                    raise StopIteration
+                else:
+                    return None
+                if isinstance(item, Resync):
+                    self._start_replay()
+                    return item
+                info = item[0].info
+                if self._seen.has(info):
+                    continue  # already given to the consumer by a replay
+                self._seen.mark_as_having(info)
+                self._current.extend(item[1:])
+                return item[0]
+
+    def _start_replay(self) -> None:
+        """ Sets up replaying what the consumer hasn't seen, scanning from the earliest of it. """
+        earliest = self._seen.get_earliest_missing(self._store.get_has_map())
+        self._replaying = earliest is not None
+        if earliest is not None:
+            self._replay_after = BundleInfo(timestamp=earliest - 1)  # sorts before any bundle at earliest
+
+    def _needs_slice(self) -> bool:
+        return self._replaying and not self._replayed and not self._current and not self._closed
+
+    def _replay_slice(self) -> None:
+        """ Reads the next slice of the bundles the consumer hasn't seen from the store.
+
+            A slice ends after max_queued bundles, whether or not the consumer had seen them.
+        """
+        scanned = [0]
+
+        def callback(decomposition: Decomposition):
+            info = decomposition.get_info()
+            self._replay_after = info
+            scanned[0] += 1
+            if not self._seen.has(info):
+                events = self._to_events(decomposition)
+                if events:
+                    self._replayed.append(events)
+            if scanned[0] >= self._max_queued:
+                raise _SliceFull()
+
+        try:
+            self._store.get_bundles(callback, start_after=self._replay_after)
+        except _SliceFull:
+            return
+        except ValueError as exception:
+            self._logger.warning("can't replay missed changes: %s", exception)
+        self._replaying = False
+
+    def _to_events(self, decomposition: Decomposition) -> List[ContainerChanges]:
+        info = decomposition.get_info()
+        grouped = split_changes(info, self._store.get_changes(decomposition))
+        return [
+            ContainerChanges(container, info, tuple(found)) for container, found in grouped.items()
+            if self._containers is None or container in self._containers]
+
+    def get(self, timeout: Optional[float] = None) -> Union[ContainerChanges, Resync, None]:
+        """ Waits for the next event, returning None after timeout seconds (or if closed). """
+        try:
+            while True:
+                event = self._next_or_none()
+                if event is not None:
+                    return event
+                with self._condition:
+                    if self._queue or self._closed:
+                        continue
+                    if not self._condition.wait(timeout):
+                        return None
+        except StopIteration:
+            return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Union[ContainerChanges, Resync]:
+        event = self.get()
+        if event is None:
+            raise StopIteration
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Union[ContainerChanges, Resync]:
+        while True:
+            if self._needs_slice() and self._threaded_reads:
+                await get_running_loop().run_in_executor(None, self._replay_slice)
+                continue
+            try:
+                event = self._next_or_none(read_store=not self._threaded_reads)
+            except StopIteration:
+                raise StopAsyncIteration
+            if event is not None:
+                return event
+            if self._needs_slice():
+                continue
+            with self._condition:
+                if self._queue or self._closed:
+                    continue
+                loop = get_running_loop()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+
+    def close(self) -> None:
+        """ Stops the stream: iteration ends once what's queued has been taken. """
+        for subscription in self._subscriptions:
+            subscription.cancel()
+        with self._condition:
+            self._closed = True
+            self._wake()
+
+    def __enter__(self) -> "ChangeStream":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def _set_if_pending(future: Future) -> None:
+    if not future.done():
+        future.set_result(None)
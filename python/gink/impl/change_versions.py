@@ -0,0 +1,141 @@
+""" Contains the ChangeVersions class, which gives cheap version tokens for conditional GETs. """
+from typing import Dict, Iterable, List, Optional, Union
+from hashlib import blake2b
+from heapq import heappush, heappop
+from threading import Lock
+
+from .relay import Relay
+from .decomposition import Decomposition
+from .muid import Muid
+from .addressable import Addressable
+from .typedefs import MuTimestamp
+from .utilities import generate_timestamp
+
+_DIGEST_SIZE = 12
+
+
+def _extend(token: bytes, data: bytes) -> bytes:
+    return blake2b(token + data, digest_size=_DIGEST_SIZE).digest()
+
+
+class ChangeVersions:
+    """ Keeps version tokens for a database's contents (and for each container), e.g. for ETags.
+
+        The tokens don't come from reading any container data.  The starting token is a digest of
+        the store's has-map (what it has from each chain), and every bundle applied after that is
+        folded into the database's token and into the token of each container the bundle changes,
+        so a token stays the same exactly as long as no bundle has come in that could change what
+        it covers.  Tokens aren't comparable across restarts (they just change, costing a miss).
+
+        Entries that expire are accounted for if their bundles came in while this was watching;
+        expirations in data from before it started don't change the tokens.  When a snapshot
+        replaces the store's contents, every token changes and they start over from its has-map.
+    """
+
+    def __init__(self, relay: Relay):
+        self._lock = Lock()
+        self._store = relay.get_bundle_store()
+        self._token = self._epoch = b""
+        self._containers: Dict[Muid, bytes] = {}
+        self._expiries: Dict[Optional[Muid], List[MuTimestamp]] = {}
+        self._start_over()
+        relay.add_callback(self._on_bundle)
+        relay.add_replaced_callback(self._start_over)
+
+    def _start_over(self) -> None:
+        """ Takes the starting token from the store's has-map (again, after a snapshot replaced it). """
+        has_map = self._store.get_has_map()
+        token = _extend(self._token, has_map.to_greeting_message(packed=True).SerializeToString())
+        with self._lock:
+            self._token = token
+            self._epoch = token  # what containers without their own token start from
+            self._containers.clear()
+            self._expiries.clear()
+
+    def _on_bundle(self, decomposition: Decomposition) -> None:
+        info = decomposition.get_info()
+        builder = decomposition.get_builder()
+        assert info.digest is not None
+        with self._lock:
+            self._token = _extend(self._token, info.digest)
+            if builder.encrypted:
+                # can't see which containers changed, so start them all over
+                self._epoch = self._token
+                self._containers.clear()
+                self._expiries = {None: self._expiries.get(None, [])}
+                return
+            for change in builder.changes:
+                if change.HasField("entry"):
+                    container = Muid.create(info, change.entry.container)
+                    expiry = change.entry.expiry  # type: ignore
+                    if expiry:
+                        heappush(self._expiries.setdefault(container, []), expiry)
+                        heappush(self._expiries.setdefault(None, []), expiry)
+                elif change.HasField("movement"):
+                    container = Muid.create(info, change.movement.container)
+                elif change.HasField("clearance"):
+                    container = Muid.create(info, change.clearance.container)  # type: ignore
+                else:
+                    continue
+                self._containers[container] = _extend(self._containers.get(container, self._epoch), info.digest)
+
+    def get_version(self, container: Union[Addressable, Muid, None] = None) -> str:
+        """ Returns a token that changes whenever the database (or just the given container) might have. """
+        muid = None if container is None else container.get_muid()
+        with self._lock:
+            token = self._token if muid is None else self._containers.get(muid, self._epoch)
+            expiries = self._expiries.get(muid)
+            now = generate_timestamp() if expiries else 0
+            if expiries and expiries[0] <= now:
+                while expiries and expiries[0] <= now:
+                    token = _extend(token, heappop(expiries).to_bytes(8, "big"))
+                if muid is None:
+                    self._token = token
+                else:
+                    self._containers[muid] = token
+        return token.hex()
+
+    def get_etag(self, *containers: Union[Addressable, Muid]) -> str:
+        """ Returns a (quoted) ETag header value for the given containers, or the whole database. """
+        if len(containers) == 1:
+            return f'"{self.get_version(containers[0])}"'
+        if not containers:
+            return f'"{self.get_version()}"'
+        combined = blake2b(digest_size=_DIGEST_SIZE)
+        for container in containers:
+            combined.update(bytes.fromhex(self.get_version(container)))
+        return f'"{combined.hexdigest()}"'
+
+    def not_modified(
+            self,
+            environ: dict,
+            start_response,
+            *containers: Union[Addressable, Muid]) -> Optional[Iterable[bytes]]:
+        """ Answers a GET or HEAD with 304 Not Modified if If-None-Match has the current ETag.
+
+            Returns the (empty) response body to return from the WSGI app if it did, otherwise None,
+            in which case the app should make the response as usual (including the ETag header).
+        """
+        if environ.get("REQUEST_METHOD") not in ("GET", "HEAD"):
+            return None
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if not if_none_match:
+            return None
+        etag = self.get_etag(*containers)
+        if not _matches(if_none_match, etag):
+            return None
+        start_response("304 Not Modified", [("ETag", etag)])
+        return []
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """ Whether an If-None-Match header value matches an ETag (compared weakly, as RFC 9110 says to). """
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
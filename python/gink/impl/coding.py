@@ -6,15 +6,22 @@
     revision number.
 """
 from typing import Optional, Union, NamedTuple, List, Any, Tuple
+from collections.abc import Buffer
 from struct import Struct
+from sys import byteorder
 from datetime import datetime as DateTime
 from typeguard import typechecked
+try:
+    import numpy  # type: ignore
+except ImportError:
+    numpy = None  # type: ignore
 
 from .builders import EntryBuilder, ChangeBuilder, ValueBuilder, KeyBuilder, Message, Behavior
 from .typedefs import UserKey, MuTimestamp, UserValue, Deletion, Inclusion
 from .muid import Muid
 from .bundle_info import BundleInfo
 from .utilities import is_named_tuple
+from .blob import Blob
 from .timing import *
 
 UNSPECIFIED: int = Behavior.UNSPECIFIED
@@ -31,6 +38,7 @@ PAIR_SET: int = Behavior.PAIR_SET
 PAIR_MAP: int = Behavior.PAIR_MAP
 TABLE: int = Behavior.TABLE
 BRAID: int = Behavior.BRAID
+BLOB_CHUNKS: int = Behavior.BLOB_CHUNKS
 FLOAT_INF = float("inf")
 INT_INF = 0xffffffffffffffff
 ZERO_64: bytes = b"\x00" * 8
@@ -38,10 +46,19 @@ KEY_MAX: int = 2**53 - 1
 deletion = Deletion()
 inclusion = Inclusion()
 
+# numpy-style little-endian type strings for the supported array element types
+# mapped to the struct format used when viewing the data through a memoryview
+ARRAY_FORMATS = {
+    "|b1": "?", "|i1": "b", "|u1": "B", "<i2": "h", "<u2": "H", "<i4": "i", "<u4": "I",
+    "<i8": "q", "<u8": "Q", "<f4": "f", "<f8": "d",
+}
+_ARRAY_KINDS = {"?": "b", "b": "i", "h": "i", "i": "i", "l": "i", "q": "i",
+                "B": "u", "H": "u", "I": "u", "L": "u", "Q": "u", "f": "f", "d": "f"}
+
 
 def new_entries_replace(behavior: int) -> bool:
     """ Determines if the behavior is one that replaces existing entries upon adding a new entry. """
-    return behavior in (BOX, PAIR_MAP, DIRECTORY, KEY_SET, GROUP, PAIR_SET, PROPERTY, TABLE, BRAID)
+    return behavior in (BOX, PAIR_MAP, DIRECTORY, KEY_SET, GROUP, PAIR_SET, PROPERTY, TABLE, BRAID, BLOB_CHUNKS)
 
 
 def normalize_entry_builder(entry_builder: EntryBuilder, entry_muid: Muid):
@@ -166,7 +183,7 @@ class Placement(NamedTuple):
         behavior = getattr(builder, "behavior")
         position = getattr(builder, "effective")
         middle_key: Union[QueueMiddleKey, Muid, UserKey, None, Tuple[Muid, Muid]]
-        if behavior in [DIRECTORY, KEY_SET]:
+        if behavior in [DIRECTORY, KEY_SET, BLOB_CHUNKS]:
             middle_key = decode_key(builder)
         elif behavior in (BOX, VERTEX, ACCUMULATOR):
             middle_key = None
@@ -199,7 +216,7 @@ class Placement(NamedTuple):
         expiry_bytes = data[-8:]
         entry_muid = Muid.from_bytes(entry_muid_bytes)
         middle_key: Union[QueueMiddleKey, MuTimestamp, UserKey, Muid, None, Tuple[Muid, Muid]]
-        if using in [DIRECTORY, KEY_SET]:
+        if using in [DIRECTORY, KEY_SET, BLOB_CHUNKS]:
             middle_key = decode_key(middle_key_bytes)
         elif using in (SEQUENCE, EDGE_TYPE):
             middle_key = QueueMiddleKey.from_bytes(middle_key_bytes)
@@ -368,6 +385,11 @@ def decode_value(value_builder: ValueBuilder) -> UserValue:
         return DateTime.fromtimestamp(value_builder.timestamp * 1e-6)
     if value_builder.HasField("tuple"):
         return tuple([decode_value(x) for x in value_builder.tuple.values])  # type: ignore
+    if value_builder.HasField("array"):
+        return decode_array(value_builder.array)  # type: ignore
+    if value_builder.HasField("blob"):
+        blob = value_builder.blob  # type: ignore
+        return Blob(blob.chunks, blob.size, blob.chunk_size)  # type: ignore
     if value_builder.HasField("document"):
         result = {}
         for i, key in enumerate(value_builder.document.keys):
@@ -443,7 +465,7 @@ def decode_key(from_what: Union[EntryBuilder, KeyBuilder, bytes]) -> Optional[Us
 
 
 @typechecked
-def encode_value(value: UserValue, value_builder: Optional[ValueBuilder] = None) -> ValueBuilder:
+def encode_value(value: Union[UserValue, Blob], value_builder: Optional[ValueBuilder] = None) -> ValueBuilder:
     """ Encodes a python value (number, string, etc.) into a protobuf builder """
     if is_named_tuple(value):
         raise TypeError("named tuples aren't supported as values")
@@ -455,8 +477,8 @@ def encode_value(value: UserValue, value_builder: Optional[ValueBuilder] = None)
             raise ValueError("zoned DateTimes aren't supported yet")
         value_builder.timestamp = int(value.timestamp() * 1e6)
         return value_builder
-    if isinstance(value, bytes):
-        value_builder.octets = value
+    if isinstance(value, (bytes, bytearray)):
+        value_builder.octets = bytes(value)
         return value_builder
     if isinstance(value, str):
         value_builder.characters = value
@@ -492,9 +514,86 @@ def encode_value(value: UserValue, value_builder: Optional[ValueBuilder] = None)
             value_builder.document.keys.append(encode_key(key))
             value_builder.document.values.append(encode_value(val))
         return value_builder
+    if isinstance(value, Buffer):
+        encode_array(value, value_builder.array)  # type: ignore
+        return value_builder
+    if isinstance(value, Blob):
+        value_builder.blob.size = value.size  # type: ignore
+        value_builder.blob.chunk_size = value.chunk_size  # type: ignore
+        value_builder.blob.chunks.extend(value.digests)  # type: ignore
+        return value_builder
     raise ValueError(f"don't know how to encode: {value!r}")
 
 
+def encode_array(value: Buffer, array_builder: ValueBuilder.Array) -> None:  # type: ignore
+    """ Copies a NumPy array (or anything else exposing a typed buffer) into an Array builder.
+
+        The data is stored little-endian in row-major order, so this only touches the raw
+        bytes and never creates a Python object per element.
+    """
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        dtype = value.dtype.newbyteorder("<")
+        type_string = dtype.str
+        shape = value.shape
+        data = numpy.ascontiguousarray(value, dtype=dtype).tobytes()
+    else:
+        view = memoryview(value)
+        kind = _ARRAY_KINDS.get(view.format.lstrip("@=<"))
+        if kind is None or (byteorder != "little" and view.itemsize > 1):
+            raise ValueError(f"don't know how to encode a buffer with format {view.format!r}")
+        type_string = ("|" if view.itemsize == 1 else "<") + kind + str(view.itemsize)
+        shape = view.shape or ()
+        data = view.tobytes()
+    if type_string not in ARRAY_FORMATS:
+        raise ValueError(f"unsupported array element type: {type_string}")
+    array_builder.dtype = type_string
+    array_builder.shape.extend(shape)
+    array_builder.data = data
+
+
+def decode_array(array_builder: ValueBuilder.Array) -> Any:  # type: ignore
+    """ Returns a read-only view over the stored bytes of an Array value (see make_array). """
+    return make_array(array_builder.dtype, tuple(array_builder.shape), array_builder.data)
+
+
+def make_array(dtype: str, shape: Tuple[int, ...], data: bytes) -> Any:
+    """ Makes an array from its element type (one of ARRAY_FORMATS), shape and little-endian bytes.
+
+        Gives a NumPy array when NumPy is installed, and a memoryview cast to the
+        element type and shape otherwise.  Dumps use it to write arrays out (see value_repr).
+    """
+    if dtype not in ARRAY_FORMATS:
+        raise ValueError(f"unsupported array element type: {dtype}")
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype=dtype).reshape(shape)
+    if byteorder != "little" and dtype[0] == "<":
+        raise ValueError("can't view little-endian arrays on this platform without numpy")
+    if 0 in shape:
+        return memoryview(data).cast(ARRAY_FORMATS[dtype])
+    return memoryview(data).cast(ARRAY_FORMATS[dtype], shape)
+
+
+def value_repr(value: Any) -> str:
+    """ Like repr, but giving something that evaluates back to the value for any kind gink stores.
+
+        Used when dumping containers, since the repr of an array is abbreviated (or, for a
+        memoryview, just says where it is), so arrays are written as calls to make_array.
+    """
+    if isinstance(value, tuple):
+        inner = ", ".join(value_repr(item) for item in value)
+        return "(" + inner + ("," if len(value) == 1 else "") + ")"
+    if isinstance(value, list):
+        return "[" + ", ".join(value_repr(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key!r}: {value_repr(item)}" for key, item in value.items()) + "}"
+    if isinstance(value, memoryview) or (numpy is not None and isinstance(value, numpy.ndarray)):
+        array_builder = ValueBuilder().array  # type: ignore
+        encode_array(value, array_builder)
+        shape = tuple(array_builder.shape)
+        return f"make_array({array_builder.dtype!r}, {shape!r}, bytes.fromhex({array_builder.data.hex()!r}))"
+    return repr(value)
+
+
 def wrap_change(builder: EntryBuilder) -> ChangeBuilder:
     """ A simple utility function to create a change and then copy the provided entry into it. """
     change_builder = ChangeBuilder()
@@ -1,14 +1,20 @@
 """ Contains the WsPeer class to manage a connection to a websocket (gink) peer. """
 
 # batteries included python imports
-from typing import Iterable, Optional, Union, List, Callable
+from typing import Iterable, Iterator, Optional, Union, List, Callable, Dict, Set, Mapping, Tuple, cast
 from wsgiref.handlers import format_date_time
-from ssl import create_default_context, SSLSocket
+from ssl import create_default_context, SSLContext, SSLSocket, SSLWantReadError, SSLWantWriteError
 from logging import getLogger
 from io import BytesIO
-from re import fullmatch, DOTALL
-from time import time as get_time
+from collections import deque
+from concurrent.futures import Future
+from re import fullmatch, compile as compile_regex
+from time import time as get_time, monotonic
 from sys import stderr
+from threading import local
+from struct import pack
+from errno import EINPROGRESS, EWOULDBLOCK, ENOTCONN
+from os import strerror
 
 from socket import (
     socket as Socket,
@@ -17,8 +23,14 @@ from socket import (
 from socket import (
     socket as Socket,
     AF_INET,
+    AF_INET6,
     SOCK_STREAM,
+    SOL_SOCKET,
+    SO_ERROR,
+    IPPROTO_TCP,
+    TCP_NODELAY,
 )
+import socket as _socket_module
 
 from wsproto import WSConnection, ConnectionType
 from wsproto.utilities import RemoteProtocolError
@@ -35,14 +47,184 @@ from wsproto.events import (
 
 # gink modules
 from .builders import SyncMessage
-from .looping import Finished
+from .looping import Finished, TimerHandle, call_later
 from .typedefs import (
-    AuthFunc, AUTH_NONE, AUTH_RITE, AUTH_FULL, ConnFunc, Selectable, WsgiFunc, WbscFunc)
+    AuthFunc, AUTH_NONE, AUTH_RITE, AUTH_FULL, ConnFunc, Selectable, WsgiFunc, WbscFunc, Limit)
 from .bundle_info import BundleInfo
 from .decomposition import Decomposition
 from .has_map import HasMap
+from .tuples import Chain
+from .bundle_store import BundleStore
 from .utilities import encode_to_hex, dedent
 from .timing import observing
+from .wsgi_workers import WsgiWorkers
+from .sse_feed import SseFeed
+
+
+AF_UNIX = getattr(_socket_module, "AF_UNIX", None)  # not on all platforms
+
+
+class _BackfillPaused(Exception):
+    """ Raised from inside a get_bundles callback to stop the scan for now (see _continue_backfill). """
+
+
+SESSION_HEADER = "x-gink-session"
+FEATURES_HEADER = "x-gink-features"  # comma separated handshake-level extensions
+PACKED_GREETING = "packed-greeting"
+SNAPSHOT = "snapshot"  # sent by a client with an empty store that would take a snapshot over a replay
+_END_OF_HEADER = compile_regex(rb"\r?\n\r?\n")
+
+
+def _parse_features(value: Union[str, bytes, None]) -> Set[str]:
+    if isinstance(value, bytes):
+        value = value.decode()
+    return {feature.strip() for feature in (value or "").split(",") if feature.strip()}
+
+
+class EncodedMessages:
+    """ Serialized SyncMessages carrying bundles, and their websocket frames, to share between connections.
+
+        When a relay sends the same bundles to many peers the message only gets serialized once,
+        and for server side connections (whose frames aren't masked) framed just once as well.
+        Each entry keeps hold of the bundle bytes it was made from, so that it can be keyed by
+        their identities; relays clear it after each round of sending.
+    """
+    __slots__ = ["_entries"]
+
+    def __init__(self):
+        self._entries: Dict[tuple, list] = {}
+
+    def get_payload(self, bundles: List[bytes], as_batch: bool) -> bytes:
+        """ The serialized message: a Batch of the bundles, or a single bundle by itself. """
+        return self._get_entry(bundles, as_batch)[1]
+
+    def get_frame(self, bundles: List[bytes], as_batch: bool) -> List[bytes]:
+        """ The message as an unmasked websocket frame (in two pieces when large, to avoid copying it). """
+        entry = self._get_entry(bundles, as_batch)
+        if entry[2] is None:
+            payload = entry[1]
+            header = _make_frame_header(len(payload))
+            entry[2] = [header, payload] if len(payload) >= 2**16 else [header + payload]
+        return entry[2]
+
+    def _get_entry(self, bundles: List[bytes], as_batch: bool) -> list:
+        key = (as_batch, *map(id, bundles))
+        entry = self._entries.get(key)
+        if entry is None:
+            sync_message = SyncMessage()
+            if as_batch:
+                sync_message.batch.bundles.extend(bundles)  # type: ignore
+            else:
+                [sync_message.bundle] = bundles  # type: ignore
+            entry = self._entries[key] = [list(bundles), sync_message.SerializeToString(), None]
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _make_frame_header(length: int) -> bytes:
+    """ Header of a final, unmasked, binary websocket frame (RFC 6455 section 5.2). """
+    if length < 126:
+        return pack("!BB", 0x82, length)
+    if length < 2**16:
+        return pack("!BBH", 0x82, 126, length)
+    return pack("!BBQ", 0x82, 127, length)
+
+
+_receive_buffers = local()
+
+
+def _get_receive_buffer(size: int) -> bytearray:
+    """ A buffer to recv_into, shared by the connections serviced from this thread. """
+    receive_buffer = getattr(_receive_buffers, "buffer", None)
+    if receive_buffer is None or len(receive_buffer) != size:
+        receive_buffer = _receive_buffers.buffer = bytearray(size)
+    return receive_buffer
+
+
+class _MessageAssembler:
+    """ Collects the pieces of an incoming websocket message, then copies them out just once.
+
+        wsproto hands over a message's payload as it arrives, in pieces as small as a single recv.
+        A message holding only a bundle (by far the most common) comes out as the bundle's
+        bytes, copied straight from the pieces rather than into a joined message and then out
+        of it again by the protobuf parser; anything else is parsed into a SyncMessage.
+    """
+    __slots__ = ["_pieces", "_size"]
+
+    def __init__(self):
+        self._pieces: List[Union[bytes, bytearray, memoryview]] = []
+        self._size = 0
+
+    def add(self, data: Union[bytes, bytearray]) -> None:
+        if data:
+            self._pieces.append(data)
+            self._size += len(data)
+
+    def finish(self, data: Union[bytes, bytearray]) -> Union[SyncMessage, bytes]:
+        """ Takes the last piece of the message, returning the bundle in it or the parsed message. """
+        self.add(data)
+        pieces, size = self._pieces, self._size
+        self._pieces, self._size = [], 0
+        if not pieces:
+            return SyncMessage()
+        first = pieces[0]
+        start = _get_bundle_start(first, size)
+        if start:
+            if len(pieces) == 1:
+                return bytes(memoryview(first)[start:])
+            pieces[0] = memoryview(first)[start:]
+            return b"".join(pieces)
+        sync_message = SyncMessage()
+        sync_message.ParseFromString(cast(bytes, first) if len(pieces) == 1 else b"".join(pieces))
+        return sync_message
+
+
+def _get_bundle_start(head: Union[bytes, bytearray, memoryview], size: int) -> int:
+    """ Where the bundle starts in a SyncMessage of size bytes that has nothing else, or 0 if it isn't one. """
+    if not head or head[0] != 0x0a:  # field 1 (bundle), length delimited
+        return 0
+    length = shift = 0
+    for position in range(1, min(len(head), 11)):
+        byte = head[position]
+        length |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return position + 1 if position + 1 + length == size else 0
+        shift += 7
+    return 0
+
+
+class SyncSession:
+    """ What one side knows the other has, kept past a disconnect so a reconnect can resume.
+
+        confirmed is what the peer has told us it has: its greeting, the bundles it sent, and
+        everything it has acked (None until its greeting arrives, and only then can the session
+        be resumed).  rescan_from is the earliest bundle timestamp that might hold something
+        the peer hasn't confirmed, or None if there's nothing to send on resuming.
+    """
+    __slots__ = ["token", "confirmed", "features", "rescan_from", "detached_at"]
+
+    def __init__(self, token: str):
+        self.token = token
+        self.confirmed: Optional[HasMap] = None
+        self.features: Set[int] = set()
+        self.rescan_from: Optional[int] = None
+        self.detached_at: Optional[float] = None  # monotonic time, or None while in use
+
+    def is_resumable(self) -> bool:
+        return self.confirmed is not None and self.detached_at is not None
+
+    def note_missed(self, info: BundleInfo) -> None:
+        """ Called for bundles arriving while detached, so that resuming sends them. """
+        if self.detached_at is not None and (self.rescan_from is None or info.timestamp < self.rescan_from):
+            self.rescan_from = info.timestamp
+
+    def __repr__(self) -> str:
+        return f"SyncSession(token={self.token!r}, rescan_from={self.rescan_from})"
 
 
 class Connection(Selectable):
@@ -53,6 +235,10 @@ class Connection(Selectable):
 
     """
     GINK_PROTOCOL = "gink"
+    RECEIVE_BUFFER_SIZE = 2**18
+    MAX_HEADER_BYTES = 2**16
+    MAX_REQUEST_BODY_BYTES = 2**26
+    KEEP_ALIVE_TIMEOUT = 15.0  # seconds an idle keep-alive http connection is kept open
     _path: str
 
     #@observing
@@ -70,10 +256,25 @@ class Connection(Selectable):
             auth_func: Optional[AuthFunc] = None,
             auth_data: Optional[str] = None,
             secure_connection: bool = False,
+            max_batch_count: int = 100,
+            max_batch_bytes: int = 2**20,
+            high_water: int = 2**22,
+            low_water: int = 2**20,
+            session: Optional[SyncSession] = None,
+            session_func: Optional[Callable[[Optional[str]], Tuple[SyncSession, bool]]] = None,
+            max_in_flight_bytes: int = 2**24,
+            request_snapshot: bool = False,
+            encoded: Optional[EncodedMessages] = None,
+            backfill_slice_bytes: int = 2**18,
+            on_close: Optional[Callable[["Connection"], None]] = None,
+            unix_path: Optional[str] = None,
+            wsgi_workers: Optional[WsgiWorkers] = None,
+            sse_feed: Optional[SseFeed] = None,
     ):
         """ Creates a connection (either client or server).
 
-            If a socket is not provided, a new one will be created.
+            If a socket is not provided, a new one will be created.  Any connected stream socket
+            will do, e.g. one end of a socketpair shared with a forked process.
             host: The hostname or IP address to connect to (when client)
             port: The port number to connect to (when client)
             socket: use a pre-created socket (mostly for testing with socket pairs)
@@ -86,16 +287,61 @@ class Connection(Selectable):
             auth_func: a function to call to determine if an incoming connection is allowed
             auth_data: when connecting as a client, the authentication data to send
             secure_connection: whether to use a secure connection (TLS/SSL)
+            max_batch_count: most bundles to pack into one message for peers accepting batches
+            max_batch_bytes: flush a batch once the bundles in it add up to this many bytes
+            high_water: outbound queue size (bytes) at which backfill pauses
+            low_water: outbound queue size (bytes) at which paused backfill resumes
+            session: when client, a detached session from an earlier connection to try resuming
+            session_func: when server, looks up the session for a token (or makes a new one),
+                returning it and whether it can be resumed
+            max_in_flight_bytes: with a session, how many bytes of sent but unacked bundles
+                the backfill lets build up before waiting for acks
+            request_snapshot: when client, ask the peer for a snapshot of its store in place
+                of every bundle (for a peer with an empty store; the peer may not oblige)
+            encoded: messages shared with other connections sending the same bundles
+            backfill_slice_bytes: how much backfill (or snapshot) to queue before giving the
+                loop back to other connections; the rest is sent as the socket takes it
+            on_close: called (once) when the connection is closed, for whatever reason
+            unix_path: when client, connect to the unix domain socket at this path (instead of host:port)
+            wsgi_workers: when serving wsgi_func, a pool to call it on rather than the loop's thread
+            sse_feed: a feed to answer requests for its paths with a stream of the database's changes
+
+            Without a socket, the connection to host:port is made without blocking: it's
+            carried on (TLS handshake included) by on_write_ready / on_ready as the loop finds
+            the socket ready, and the websocket request goes out once it's done.
         """
+        self._connecting = False
+        self._connect_wants_write = False
+        self._tls_context: Optional[SSLContext] = None
+        self._handshaking = False
+        self._connect_error: Optional[str] = None
         if socket is None:
             is_client = True
-            assert host is not None and port is not None
-            socket = Socket(AF_INET, SOCK_STREAM)
+            if unix_path is not None:
+                if AF_UNIX is None:
+                    raise OSError("unix domain sockets aren't supported on this platform")
+                socket = Socket(AF_UNIX, SOCK_STREAM)
+                address: Union[str, Tuple[str, int]] = unix_path
+                in_progress: Tuple[int, ...] = (0, EINPROGRESS)  # EAGAIN here means the backlog is full
+            else:
+                assert host is not None and port is not None
+                socket = Socket(AF_INET, SOCK_STREAM)
+                address = (host, port)
+                in_progress = (0, EINPROGRESS, EWOULDBLOCK)
+            socket.setblocking(False)
+            error = socket.connect_ex(address)
+            if error not in in_progress:
+                socket.close()
+                raise OSError(error, strerror(error))
             if secure_connection:
-                context = create_default_context()
-                socket = context.wrap_socket(socket, server_hostname=host)
-            socket.connect((host, port))
+                self._tls_context = create_default_context()
+            self._connecting = True
+            self._connect_wants_write = True
+        if socket.family in (AF_INET, AF_INET6):
+            # frames are written whole, so waiting to coalesce them only adds latency (40ms with delayed acks)
+            socket.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
         self._socket: Union[Socket, SSLSocket] = socket
+        self._on_close = on_close
         self._host = host
         self._port = port
         self._logger = getLogger(self.__class__.__name__)
@@ -116,15 +362,34 @@ class Connection(Selectable):
             self._path = path or "/"
             if not self._path.startswith("/"):
                 raise AssertionError(self._path)
-            request = Request(host=host, target=self._path, subprotocols=subprotocols)
-            self._socket.send(self._ws.send(request))
+            features = [PACKED_GREETING, SNAPSHOT] if request_snapshot else [PACKED_GREETING]
+            extra_headers = [(FEATURES_HEADER.encode(), ",".join(features).encode())]
+            if session is not None and session.is_resumable():
+                extra_headers.append((SESSION_HEADER.encode(), session.token.encode()))
+            request = Request(host=host, target=self._path, subprotocols=subprotocols,
+                              extra_headers=extra_headers)
+            self._request_bytes = self._ws.send(request)
+            if not self._connecting:
+                self._socket.send(self._request_bytes)
         self._logger.debug("finished setup")
-        self._socket.settimeout(0.2)
+        if not self._connecting:
+            self._socket.settimeout(0.2)
         self._auth_func = auth_func
         self._conn_func = conn_func
         self._perms: int = AUTH_NONE if auth_func else AUTH_FULL
         self._buffer: bytes = b""
-        self._message_buffer: bytes = b""  # New buffer specifically for partial messages
+        self._body = bytearray()
+        self._http_version = "HTTP/1.0"
+        self._keep_alive = False
+        self._chunked = False  # whether the response body is being sent in chunks
+        self._no_body = False  # for HEAD requests, and statuses that don't have a body
+        self._idle_timer: Optional[TimerHandle] = None
+        self._wsgi_workers = wsgi_workers
+        self._wsgi_pending = False  # whether a request is out with one of the wsgi workers
+        self._sse_feed = sse_feed
+        self._event_stream = False  # whether this is a (text/event-stream) response to sse_feed
+        self._event_replay: Optional[Callable[[], bool]] = None
+        self._assembler = _MessageAssembler()
         self._need_header = not is_client
         self._pending = False
         self._is_websocket = is_client
@@ -137,6 +402,45 @@ class Connection(Selectable):
         self._request_method: Optional[str] = None
         self._decoded: Optional[str] = None
         self._query_string: Optional[str] = None
+        self._max_batch_count = max_batch_count
+        self._max_batch_bytes = max_batch_bytes
+        self._peer_features: Set[int] = set()
+        self._is_client = bool(is_client)
+        self._encoded = encoded
+        self._batch: List[bytes] = []  # bundles held to send in a Batch
+        self._batch_bytes = 0
+        self._acks: Dict[Chain, BundleInfo] = {}
+        self._high_water = high_water
+        self._low_water = low_water
+        self._outbox: deque = deque()  # frames (bytes or memoryview) not yet accepted by the socket
+        self._outbox_bytes = 0  # of both _outbox and _backfill_outbox
+        self._backfill_outbox: deque = deque()  # backfill frames, only written while _outbox is empty
+        self._backfill_frame_chains: deque = deque()  # the chain of each bundle in each backfill frame
+        self._backfill_chains: Dict[Chain, int] = {}  # bundles queued in the backfill lane by chain
+        self._writing_backfill = False  # a backfill frame is partly written, so has to be finished first
+        self._mid_frame = False  # some frame is partly written, so nothing else can go out until it's done
+        self._backfill_batch: List[bytes] = []
+        self._backfill_batch_chains: List[Chain] = []
+        self._backfill_batch_bytes = 0
+        self._backfill_slice_bytes = backfill_slice_bytes
+        self._peak_outbox_bytes = 0
+        self._backfill_pauses = 0
+        self._backfill_store: Optional[BundleStore] = None
+        self._backfill_limit_to: Optional[Mapping[Chain, Limit]] = None
+        self._backfill_after: Optional[BundleInfo] = None
+        self._session = session
+        self._session_func = session_func
+        self._handshake_features: Set[str] = set()
+        self._resumed = False
+        self._max_in_flight_bytes = max_in_flight_bytes
+        self._in_flight: Dict[Chain, deque] = {}  # (timestamp, size) of sent, unacked bundles
+        self._in_flight_bytes = 0
+        self._snapshot: Optional[Iterator[Tuple[str, List[bytes], List[bytes]]]] = None  # parts left to send
+        self._snapshot_heads: Optional[HasMap] = None
+        self._snapshot_store: Optional[BundleStore] = None
+        self._snapshot_missed: Optional[int] = None  # earliest bundle timestamp passed over while sending
+        self._receiving_snapshot = False
+        self._requested_snapshot = bool(is_client and request_snapshot)
 
     def __hash__(self) -> int:
         return id(self)
@@ -161,8 +465,16 @@ class Connection(Selectable):
         assert self._path
         return self._path
 
-    #@observing
-    def _handle_wsgi_request(self) -> None:
+    def _handle_wsgi_requests(self) -> None:
+        """ Answers each complete request received (several, if they were pipelined).
+
+            Bodies are accumulated across calls until content-length bytes have arrived.  The
+            connection is kept open for more requests (HTTP/1.1 keep-alive, or HTTP/1.0 with
+            "Connection: keep-alive"), unless the response's length can only be shown by closing.
+        """
+        if self._sse_feed is not None and self._sse_feed.handles(self.path):
+            self._start_event_stream()
+            return
         if not self._wsgi:
             self._socket.sendall(dedent(b"""
                 HTTP/1.0 400 Bad Request
@@ -170,15 +482,112 @@ class Connection(Selectable):
 
                 Websocket connections only!"""))
             raise Finished()
-        assert self._request_headers
-        content_length = self._request_headers.get("content-length")
-        if int(content_length or "0") != len(self._body):
-            # TODO wait for the rest of the body then process the post/put request
-            self._socket.sendall(b"HTTP/1.0 500 Internal Server Error\r\n\r\n")
-            self._logger.warning(
-                "Content-Length mismatch in HTTP request: " +
-                f"content_length={content_length}, actual_body_length={len(self._body)}")
+        while True:
+            assert self._request_headers is not None
+            content_length = int(self._request_headers.get("content-length") or "0")
+            if len(self._body) < content_length:
+                return  # wait for the rest of the body
+            body = bytes(self._body[:content_length])
+            self._buffer = bytes(self._body[content_length:])  # the start of any pipelined request
+            environ = self._make_environ(body)
+            if self._wsgi_workers is not None:
+                self._wsgi_pending = True  # anything more that arrives waits in the buffer
+                self._wsgi_workers.submit(self._wsgi, environ, self._on_wsgi_done)
+                return
+            self._handle_wsgi_request(environ)
+            if not self._next_wsgi_request():
+                return
+
+    def _start_event_stream(self) -> None:
+        """ Answers a request for one of sse_feed's paths, turning the connection over to it. """
+        assert self._sse_feed is not None and self._request_headers is not None
+        if self._request_method != "GET":
+            self._socket.sendall(b"HTTP/1.1 405 Method Not Allowed\r\nAllow: GET\r\nConnection: close\r\n\r\n")
             raise Finished()
+        try:
+            container = self._sse_feed.get_container(self.path)
+        except ValueError:
+            self._socket.sendall(b"HTTP/1.1 404 Not Found\r\nConnection: close\r\n\r\n")
+            raise Finished()
+        self._logger.info("starting an event stream of %s", container or "all changes")
+        self._socket.sendall(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n\r\n")
+        self._socket.setblocking(False)  # events are queued and written as the socket takes them
+        self._event_stream = True
+        self._buffer = b""
+        self._sse_feed.attach(self, container, self._request_headers.get("last-event-id"))
+
+    def send_event(self, data: bytes) -> None:
+        """ Queues an encoded event to go out on an event stream (the same bytes may go to many). """
+        if not self._closed:
+            self._enqueue(data)
+
+    def set_event_replay(self, replay: Optional[Callable[[], bool]]) -> None:
+        """ Gives an event stream something to call for more events as it has room, until it returns True. """
+        self._event_replay = replay
+
+    def _continue_event_replay(self) -> None:
+        if self._event_replay is not None and self._outbox_bytes <= self._low_water:
+            if self._event_replay():
+                self._event_replay = None
+
+    def _next_wsgi_request(self) -> bool:
+        """ After a response, returns True if the next request's header is already in the buffer. """
+        if not self._keep_alive:
+            raise Finished()  # will cause the loop to call close after deregistering
+        self._reset_request()
+        if not self._parse_header():
+            self._idle_timer = call_later(self.KEEP_ALIVE_TIMEOUT, self._on_idle_timeout)
+            return False
+        if self._is_websocket:
+            assert self._on_ws_act
+            self._on_ws_act(self)
+            return False
+        return True
+
+    def _on_wsgi_done(self, future: Future) -> None:
+        """ Called on the loop when a worker has the response to a request from this connection. """
+        if self._closed:
+            return
+        self._wsgi_pending = False
+        try:
+            try:
+                status, headers, chunks = future.result()
+            except Exception as exception:
+                self._send_server_error(exception)
+                raise Finished(exception)
+            self._start_response(status, headers)
+            whole = b"".join(chunks)
+            self._send_response_header(len(whole), whole)
+            if self._next_wsgi_request():
+                self._handle_wsgi_requests()
+        except Finished:
+            call_later(0, self.close)  # closed from a timer, so the loop drops it after timers run
+
+    def _on_idle_timeout(self) -> None:
+        self._idle_timer = None
+        if not self._closed and self._need_header and not self._buffer:
+            self._logger.debug("closing idle keep-alive connection")
+            self.close()
+
+    def _reset_request(self) -> None:
+        self._need_header = True
+        self._request_headers = None
+        self._status = None
+        self._response_headers = None
+        self._response_started = False
+        self._chunked = False
+        self._no_body = False
+        self._body = bytearray()
+
+    def _make_environ(self, body: bytes) -> dict:
+        assert self._request_headers is not None
+        connection_header = self._request_headers.get("connection", "").lower()
+        if self._http_version == "HTTP/1.1":
+            self._keep_alive = "close" not in connection_header
+        else:
+            self._keep_alive = "keep-alive" in connection_header
         if "host" in self._request_headers:
             self._server_name = self._request_headers["host"].split(":")[0]
         assert self._path is not None
@@ -187,14 +596,13 @@ class Connection(Selectable):
             remote_addr = peer_name[0]
         else:
             remote_addr = "unknown"
-        assert self._path is not None
         self._logger.info("received WSGI request from %s for %s %s", remote_addr, self._request_method, self._path)
         env = {
             'wsgi.version': (1, 0),
             'wsgi.url_scheme': 'http',
-            'wsgi.input': BytesIO(self._body),
+            'wsgi.input': BytesIO(body),
             'wsgi.errors': stderr,
-            'wsgi.multithread': False,
+            'wsgi.multithread': self._wsgi_workers is not None,
             'wsgi.multiprocess': False,
             'wsgi.run_once': False,
             'REQUEST_METHOD': self._request_method,
@@ -204,7 +612,7 @@ class Connection(Selectable):
             'SCRIPT_NAME': '',
             'QUERY_STRING': self._query_string or '',
             'REMOTE_ADDR': remote_addr,
-            'SERVER_PROTOCOL': 'HTTP/1.0',
+            'SERVER_PROTOCOL': self._http_version,
         }
         if "content-type" in self._request_headers:
             env['CONTENT_TYPE'] = self._request_headers["content-type"]
@@ -216,20 +624,37 @@ class Connection(Selectable):
             http_key = f"HTTP_{key.upper().replace('-', '_')}"
             if http_key not in env and key not in ("content-type", "content-length"):
                 env[http_key] = value
+        return env
+
+    #@observing
+    def _handle_wsgi_request(self, env: dict) -> None:
         try:
             result: Iterable[bytes] = self._wsgi(env, self._start_response)  # type: ignore
-            for data in result:
-                if data:
-                    self._write(data)
-            if not self._response_started:
-                self._write(b"")
+            try:
+                if isinstance(result, (list, tuple)) and not self._response_started:
+                    whole = b"".join(result)  # the length is known, so no need for chunks
+                    self._send_response_header(len(whole), whole)
+                else:
+                    for data in result:
+                        if data:
+                            self._write(data)
+                    if not self._response_started:
+                        self._send_response_header(0)
+                    elif self._chunked:
+                        self._socket.sendall(b"0\r\n\r\n")
+            finally:
+                if hasattr(result, "close"):
+                    getattr(result, "close")()
         except Exception as exception:
-            if not self._response_started:
-                self._start_response(
-                    "500 Internal Server Error", [("Content-type", "text/plain")])
-                self._write(str(exception).encode("utf-8"))
+            self._send_server_error(exception)
             raise Finished(exception)
-        raise Finished()  # will cause the loop to call close after deregistering
+
+    def _send_server_error(self, exception: Exception) -> None:
+        if not self._response_started:
+            self._start_response(
+                "500 Internal Server Error", [("Content-type", "text/plain")])
+            self._keep_alive = False
+            self._send_response_header(None, str(exception).encode("utf-8"))
 
     #@observing
     def _receive_header(self) -> bool:
@@ -237,30 +662,36 @@ class Connection(Selectable):
         if not data:
             raise Finished()
         self._buffer += data
-        match = fullmatch(rb"(.+)\r?\n\r?\n(.*)", self._buffer, DOTALL)
+        return self._parse_header()
+
+    def _parse_header(self) -> bool:
+        """ Parses the request header at the start of the buffer, returning False if it isn't all there yet. """
+        match = _END_OF_HEADER.search(self._buffer)
         if not match:
+            if len(self._buffer) > self.MAX_HEADER_BYTES:
+                self._socket.sendall(b"HTTP/1.1 431 Request Header Fields Too Large\r\nConnection: close\r\n\r\n")
+                raise Finished()
             return False  # wait until we get more data
         self._need_header = False
-        self._header = match.group(1)
-        self._body = match.group(2)
+        self._header = self._buffer[:match.start()]
+        self._body = bytearray(self._buffer[match.end():])
         assert self._header is not None
         header_lines: List[str] = self._header.decode('utf-8').splitlines()
         if len(header_lines) == 0:
             self._logger.warning("bad request")
             raise Finished()
-        request_line_match = fullmatch(r"(\S+)\s+(\S+)\s+HTTP/\d+\.\d+", header_lines[0])
+        request_line_match = fullmatch(r"(\S+)\s+(\S+)\s+(HTTP/\d+\.\d+)", header_lines.pop(0))
         if not request_line_match:
-            self._logger.warning("bad request line: %r", header_lines[0])
+            self._logger.warning("bad request line: %r", self._header[:100])
             raise Finished()
         self._request_method = request_line_match.group(1)
         requesting = request_line_match.group(2)
+        self._http_version = "HTTP/1.1" if request_line_match.group(3) == "HTTP/1.1" else "HTTP/1.0"
         if "?" in requesting:
             (self._path, self._query_string) = requesting.split("?", 1)
         else:
             self._path = requesting
             self._query_string = ""
-        #  HTTP version is ignored for now, since we only support HTTP/1.0
-        (self._request_method, self._path, _) = header_lines.pop(0).split(maxsplit=3)
         self._request_headers = {}
         for header_line in header_lines:
             key, val = header_line.split(":", 1)
@@ -276,22 +707,103 @@ class Connection(Selectable):
                 raise Finished()
             self._is_websocket = True
             self._pending = True
+            return True
+        if "chunked" in self._request_headers.get("transfer-encoding", "").lower():
+            self._socket.sendall(b"HTTP/1.1 411 Length Required\r\nConnection: close\r\n\r\n")
+            raise Finished()
+        content_length = int(self._request_headers.get("content-length") or "0")
+        if content_length > self.MAX_REQUEST_BODY_BYTES:
+            self._socket.sendall(b"HTTP/1.1 413 Content Too Large\r\nConnection: close\r\n\r\n")
+            raise Finished()
+        if (self._request_headers.get("expect", "").lower() == "100-continue"
+                and len(self._body) < content_length and self._http_version == "HTTP/1.1"):
+            self._socket.sendall(b"HTTP/1.1 100 Continue\r\n\r\n")
         return True
 
+    def is_connecting(self) -> bool:
+        """ True until an outgoing connection (and its TLS handshake) has been established. """
+        return self._connecting
+
+    def get_connect_error(self) -> Optional[str]:
+        """ Why the outgoing connection couldn't be made, if it couldn't. """
+        return self._connect_error
+
+    def _continue_connect(self) -> None:
+        """ Moves a non-blocking connect along, sending the websocket request once it's made. """
+        try:
+            if not self._handshaking:
+                error = self._socket.getsockopt(SOL_SOCKET, SO_ERROR)
+                if error:
+                    raise OSError(error, strerror(error))
+                try:
+                    self._socket.getpeername()
+                except OSError as os_error:
+                    if os_error.errno == ENOTCONN:
+                        return  # not there yet
+                    raise
+                if self._tls_context is not None:
+                    self._socket = self._tls_context.wrap_socket(
+                        self._socket, server_hostname=self._host, do_handshake_on_connect=False)
+                    self._handshaking = True
+            if self._handshaking:
+                try:
+                    self._socket.do_handshake()  # type: ignore
+                except SSLWantReadError:
+                    self._connect_wants_write = False
+                    return
+                except SSLWantWriteError:
+                    self._connect_wants_write = True
+                    return
+                self._handshaking = False
+        except OSError as error:
+            self._connect_error = str(error)
+            self._logger.warning("(%s) could not connect to %s:%s: %s", self._name, self._host, self._port, error)
+            raise Finished()
+        self._connecting = False
+        self._connect_wants_write = False
+        self._logger.debug("(%s) connected to %s:%s", self._name, self._host, self._port)
+        self._socket.settimeout(0.2)
+        self._socket.send(self._request_bytes)
+
     #@observing
     def on_ready(self) -> None:
         """ Called when the connection is ready to be used.
             Handles both websocket requests, and http(s) requests if a WSGI function is provided.
         """
+        if self._connecting:
+            self._continue_connect()
+            return
+        if self._event_stream:  # nothing more is expected from the client but for it to hang up
+            try:
+                data = self._socket.recv(self.RECEIVE_BUFFER_SIZE)
+            except (BlockingIOError, SSLWantReadError):
+                return
+            if not data:
+                raise Finished()
+            return
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._wsgi_pending:  # a worker has the last request; hold on to any more until it's done
+            data = self._socket.recv(self.RECEIVE_BUFFER_SIZE)
+            if not data:
+                raise Finished()
+            self._buffer += data
+            return
         if self._need_header:
             received = self._receive_header()
             if not received:
                 return
+        elif not self._is_websocket:  # more of a request body
+            data = self._socket.recv(self.RECEIVE_BUFFER_SIZE)
+            if not data:
+                raise Finished()
+            self._body += data
         if self._is_websocket:
             assert self._on_ws_act
             self._on_ws_act(self)
         else:
-            self._handle_wsgi_request()
+            self._handle_wsgi_requests()
 
     #@observing
     def _start_response(
@@ -314,14 +826,48 @@ class Connection(Selectable):
         if self._status is None:
             raise ValueError("write before start_response")
         if not self._response_started:
-            response = f'HTTP/1.0 {self._status}\r\n'
-            assert self._response_headers is not None
-            for header in self._response_headers:
-                response += '{0}: {1}\r\n'.format(*header)
-            response += '\r\n'
-            self._socket.sendall(response.encode())
-            self._response_started = True
-        self._socket.sendall(blob)
+            self._send_response_header(None)
+        if self._no_body or not blob:
+            return
+        if self._chunked:
+            self._socket.sendall(b"%x\r\n%b\r\n" % (len(blob), blob))
+        else:
+            self._socket.sendall(blob)
+
+    def _send_response_header(self, content_length: Optional[int], body: bytes = b"") -> None:
+        """ Sends the status line and headers (along with body, if given), picking how the body is delimited.
+
+            With the content length known it's added as a header; otherwise an HTTP/1.1 response
+            is sent in chunks, and an HTTP/1.0 one ends when the connection is closed.
+        """
+        assert self._status is not None and self._response_headers is not None
+        headers = self._response_headers
+        names = {name.lower() for name, _ in headers}
+        status_code = int(self._status.split(maxsplit=1)[0])
+        self._no_body = self._request_method == "HEAD" or status_code in (204, 304) or status_code < 200
+        if "connection" in names and any(
+                name.lower() == "connection" and "close" in value.lower() for name, value in headers):
+            self._keep_alive = False
+        if "content-length" in names or self._no_body:
+            pass
+        elif content_length is not None:
+            headers.append(("Content-Length", str(content_length)))
+        elif self._http_version == "HTTP/1.1":
+            headers.append(("Transfer-Encoding", "chunked"))
+            self._chunked = True
+        else:
+            self._keep_alive = False
+        if "connection" not in names:
+            if not self._keep_alive:
+                headers.append(("Connection", "close"))
+            elif self._http_version == "HTTP/1.0":
+                headers.append(("Connection", "keep-alive"))
+        response = f'{self._http_version} {self._status}\r\n'
+        for header in headers:
+            response += '{0}: {1}\r\n'.format(*header)
+        response += '\r\n'
+        self._response_started = True
+        self._socket.sendall(response.encode() + (b"" if self._no_body else body))
 
     #@observing
     def is_alive(self) -> bool:
@@ -333,13 +879,27 @@ class Connection(Selectable):
     #@observing
     def receive(self) -> Iterable[SyncMessage]:
         """ receive a (possibly empty) series of encoded SyncMessages from a peer. """
+        for received in self._receive_messages():
+            if isinstance(received, bytes):
+                sync_message = SyncMessage()
+                sync_message.bundle = received
+                yield sync_message
+            else:
+                yield received
+
+    def _receive_messages(self) -> Iterable[Union[SyncMessage, bytes]]:
+        """ Like receive, but gives the bytes of messages holding just a bundle without parsing them. """
         if self._closed:
             raise Finished()
         if self._pending:
             self._pending = False  # previously called self._socket.recv
+            data, self._buffer = self._buffer, b""
         else:
+            receive_buffer = _get_receive_buffer(self.RECEIVE_BUFFER_SIZE)
             try:
-                data = self._socket.recv(4096)
+                count = self._socket.recv_into(receive_buffer)
+            except (BlockingIOError, SSLWantReadError):
+                return
             except TimeoutError:
                 self._logger.warning("unexpected socket timeout")
                 raise Finished()
@@ -347,13 +907,12 @@ class Connection(Selectable):
                 self._logger.warning("connection reset by peer")
                 self._ws_closed = True
                 raise Finished()
-            if not data:
+            if not count:
                 self._ws_closed = True
                 raise Finished()
-            self._buffer += data
+            data = cast(bytes, memoryview(receive_buffer)[:count])  # wsproto copies it into its own buffer
         try:
-            self._ws.receive_data(self._buffer)
-            self._buffer = b""
+            self._ws.receive_data(data)
         except RemoteProtocolError as rpe:
             self._logger.warning("rejected a malformed connection attempt")
             self._socket.send(self._ws.send(rpe.event_hint or RejectConnection()))
@@ -375,9 +934,16 @@ class Connection(Selectable):
                     self._logger.warning("rejected a non-gink connection")
                     self._socket.send(self._ws.send(RejectConnection()))
                     raise Finished()
+                extra_headers = [(FEATURES_HEADER.encode(), PACKED_GREETING.encode())]
+                request_headers = dict(event.extra_headers)
+                self._handshake_features = _parse_features(request_headers.get(FEATURES_HEADER.encode()))
+                if self._session_func is not None:
+                    token = request_headers.get(SESSION_HEADER.encode(), b"").decode() or None
+                    self._session, self._resumed = self._session_func(token)
+                    extra_headers.append((SESSION_HEADER.encode(), self._session.token.encode()))
                 greeting = None
                 try:
-                    if self._conn_func is not None:
+                    if self._conn_func is not None and not self._resumed:
                         greeting = self._conn_func(self)
                 except Exception as exception:
                     self._logger.warning(f"could not generate greeting", exc_info=exception)
@@ -385,11 +951,15 @@ class Connection(Selectable):
                     self._ws_closed = True
                     raise Finished()
                 self._logger.debug("got a Request, sending an AcceptConnection")
-                self._socket.send(self._ws.send(AcceptConnection(self.GINK_PROTOCOL)))
+                self._socket.send(self._ws.send(AcceptConnection(self.GINK_PROTOCOL, extra_headers=extra_headers)))
                 self._logger.info("Server connection established!")
                 self._ws_connected = True
-                if greeting and self._perms & AUTH_RITE:
-                    sent = self.send(greeting)
+                self._socket.setblocking(False)
+                if self._resumed:
+                    self._logger.debug("resuming session %s (%s)", self._session, self._name)
+                    yield self._resume_greeting()
+                elif greeting and self._perms & AUTH_RITE:
+                    sent = self._send_greeting(greeting)
                     self._logger.debug("sent greeting of %d bytes (%s)", sent, self._name)
                 else:
                     self._logger.debug("sending read-only flag instead of greeting (%s)", self._name)
@@ -400,39 +970,41 @@ class Connection(Selectable):
             elif isinstance(event, CloseConnection):
                 self._logger.info("got close msg, code=%d, reason=%s", event.code, event.reason)
                 try:
-                    self._socket.send(self._ws.send(event.response()))
-                except BrokenPipeError:
+                    self._enqueue(self._ws.send(event.response()))
+                except OSError:
                     self._logger.warning("could not send websocket close ack")
                 self._ws_closed = True
                 raise Finished()
             elif isinstance(event, TextMessage):
                 self._logger.debug('Text message received: %r, echoing back.', event.data)
-                self._socket.send(self._ws.send(TextMessage(data=event.data)))
+                self._enqueue(self._ws.send(TextMessage(data=event.data)))
             elif isinstance(event, BytesMessage):
-                received = bytes(event.data) if isinstance(event.data, bytearray) else event.data
-                assert isinstance(received, bytes)
                 if not event.message_finished:
-                    self._message_buffer += received
+                    self._assembler.add(event.data)
                 else:
-                    final_message = received
-                    if len(self._message_buffer) > 0:
-                        # Combine with previous partial messages
-                        final_message = self._message_buffer + received
-                        self._message_buffer = b""
-                    sync_message = SyncMessage()
-                    sync_message.ParseFromString(final_message)
-                    yield sync_message
+                    yield self._assembler.finish(event.data)
             elif isinstance(event, Ping):
                 self._logger.debug("received ping")
-                self._socket.send(self._ws.send(event.response()))
+                self._enqueue(self._ws.send(event.response()))
             elif isinstance(event, Pong):
                 self._logger.debug("received pong")
             elif isinstance(event, AcceptConnection):
                 self._logger.info("Client connection established!")
                 self._ws_connected = True
+                self._socket.setblocking(False)
+                accepted_headers = dict(event.extra_headers)
+                self._handshake_features = _parse_features(accepted_headers.get(FEATURES_HEADER.encode()))
+                token = accepted_headers.get(SESSION_HEADER.encode(), b"").decode()
+                if self._session is not None and self._session.is_resumable() and token == self._session.token:
+                    self._resumed = True
+                    self._session.detached_at = None
+                    self._logger.debug("resuming session %s (%s)", self._session, self._name)
+                    yield self._resume_greeting()
+                    continue
+                self._session = SyncSession(token) if token else None
                 if self._conn_func and self._perms & AUTH_RITE:
                     greeting = self._conn_func(self)
-                    sent = self.send(greeting)
+                    sent = self._send_greeting(greeting)
                     self._logger.debug("sent greeting of %d bytes (%s)", sent, self._name)
             elif isinstance(event, RejectConnection):
                 self._ws_closed = True
@@ -440,22 +1012,385 @@ class Connection(Selectable):
             else:
                 self._logger.warning("got an unexpected event type: %s", event)
 
+    def _resume_greeting(self) -> SyncMessage:
+        """ Stands in for the peer's greeting when resuming: what it had confirmed before. """
+        assert self._session is not None and self._session.confirmed is not None
+        greeting = self._session.confirmed.to_greeting_message()
+        greeting.greeting.features.extend(self._session.features)  # type: ignore
+        return greeting
+
+    def accepts_packed_greeting(self) -> bool:
+        """ True if the peer said (in the websocket handshake) it can read packed greeting entries. """
+        return PACKED_GREETING in self._handshake_features
+
+    def wants_snapshot(self) -> bool:
+        """ True if the peer asked (in the websocket handshake) for a snapshot if its store is empty. """
+        return SNAPSHOT in self._handshake_features
+
+    def requested_snapshot(self) -> bool:
+        """ True if this is a client that asked for a snapshot and hasn't been sent all of one yet. """
+        return self._requested_snapshot
+
+    def is_receiving_snapshot(self) -> bool:
+        """ True between the first part of a snapshot from the peer and the last. """
+        return self._receiving_snapshot
+
+    def get_session(self) -> Optional[SyncSession]:
+        """ The session with the peer, if it supports them. """
+        return self._session
+
+    def detach_session(self) -> Optional[SyncSession]:
+        """ Records where to pick up from on resuming, and marks the session as no longer in use. """
+        session = self._session
+        if session is None:
+            return None
+        if self._snapshot is not None or self._receiving_snapshot:
+            session.confirmed = None  # can't resume partway through a snapshot; the peer starts over
+        candidates = [queue[0][0] for queue in self._in_flight.values() if queue]
+        if session.rescan_from is not None:
+            candidates.append(session.rescan_from)
+        if self._backfill_store is not None:
+            candidates.append(self._backfill_after.timestamp if self._backfill_after else 0)
+        session.rescan_from = min(candidates) if candidates else None
+        session.detached_at = monotonic()
+        self._in_flight = {}
+        self._in_flight_bytes = 0
+        return session
+
+    def _on_acked(self, info: BundleInfo) -> None:
+        """ Drops everything the (possibly cumulative) ack covers from the in-flight window. """
+        if self._session is None:
+            return
+        if self._session.confirmed is not None:
+            self._session.confirmed.mark_as_having(info)
+        queue = self._in_flight.get(info.get_chain())
+        while queue and queue[0][0] <= info.timestamp:
+            self._in_flight_bytes -= queue.popleft()[1]
+        self._maybe_resume_backfill()
+
+    def _may_continue_backfill(self) -> bool:
+        if self._outbox_bytes > self._low_water or not self._ws_connected or self._ws_closed:
+            return False
+        if self._snapshot is not None:
+            return True
+        return self._backfill_store is not None and self._in_flight_bytes <= self._max_in_flight_bytes // 2
+
+    def _maybe_resume_backfill(self) -> None:
+        if self._may_continue_backfill():
+            if self._snapshot is not None:
+                self._continue_snapshot()
+            else:
+                self._continue_backfill()
+
+    def _send_greeting(self, greeting: SyncMessage) -> int:
+        """ Sends the greeting, listing the protocol extensions this side can receive. """
+        greeting.greeting.features.append(SyncMessage.Feature.BATCHES)  # type: ignore
+        return self.send(greeting)
+
+    def batches_enabled(self) -> bool:
+        """ True when bundles and acks to this peer get packed into Batch messages. """
+        return self._max_batch_count > 1 and SyncMessage.Feature.BATCHES in self._peer_features  # type: ignore
+
     #@observing
     def send(self, sync_message: SyncMessage) -> int:
-        """ Send an encoded SyncMessage to a peer. """
+        """ Send an encoded SyncMessage to a peer (after anything batched before it). """
+        if self._batch or self._acks:
+            self.flush()
+        return self._send_message(sync_message)
+
+    def flush(self) -> int:
+        """ Sends any bundles and acks being held for a batch; returns the number of bytes sent. """
+        sent = self._flush_live()
+        if self._backfill_batch:
+            sent += self._flush_backfill()
+        return sent
+
+    def _flush_live(self) -> int:
+        bundles, acks = self._batch, self._acks
+        if not bundles and not acks:
+            return 0
+        self._batch = []
+        self._batch_bytes = 0
+        self._acks = {}
+        if self._closed or self._ws_closed:
+            return 0
+        if not acks and self._shares_encoding():
+            return self._send_encoded(bundles, as_batch=True)
+        sync_message = SyncMessage()
+        sync_message.batch.bundles.extend(bundles)  # type: ignore
+        for info in acks.values():
+            ack = sync_message.batch.acks.add()  # type: ignore
+            ack.medallion = info.medallion
+            ack.chain_start = info.chain_start
+            ack.timestamp = info.timestamp
+            ack.previous = info.previous
+        return self._send_message(sync_message)
+
+    def _send_message(self, sync_message: SyncMessage) -> int:
+        self._check_sendable()
+        return self._send_data([self._ws.send(BytesMessage(sync_message.SerializeToString()))])
+
+    def _flush_backfill(self) -> int:
+        bundles, chains = self._backfill_batch, self._backfill_batch_chains
+        self._backfill_batch = []
+        self._backfill_batch_chains = []
+        self._backfill_batch_bytes = 0
+        sync_message = SyncMessage()
+        sync_message.batch.bundles.extend(bundles)  # type: ignore
+        return self._send_backfill(sync_message, chains)
+
+    def _send_backfill(self, sync_message: SyncMessage, chains: List[Chain]) -> int:
+        """ Queues a message in the backfill lane, which only gets written while the live lane is empty.
+
+            chains lists the chain of each bundle in the message; until the message is written,
+            later bundles on those chains have to go in this lane too, to stay behind it.
+        """
+        self._check_sendable()
+        self._flush_live()  # what the backfill builds on mustn't be left waiting behind it
+        frame = self._ws.send(BytesMessage(sync_message.SerializeToString()))
+        self._backfill_outbox.append(frame)
+        self._backfill_frame_chains.append(chains)
+        self._outbox_bytes += len(frame)
+        if self._outbox_bytes > self._peak_outbox_bytes:
+            self._peak_outbox_bytes = self._outbox_bytes
+        if not self._outbox and len(self._backfill_outbox) == 1:
+            try:
+                self._drain()
+            except OSError as e:
+                self._logger.error("Error sending data: %s", e)
+                self._ws_closed = True
+                self.close()
+                return 0
+        return len(frame)
+
+    def _send_encoded(self, bundles: List[bytes], as_batch: bool) -> int:
+        """ Sends bundles using the message (or frame) shared with other connections. """
+        self._check_sendable()
+        assert self._encoded is not None
+        if self._is_client:  # every frame from a client gets its own mask
+            return self._send_data([self._ws.send(BytesMessage(self._encoded.get_payload(bundles, as_batch)))])
+        return self._send_data(self._encoded.get_frame(bundles, as_batch))
+
+    def _shares_encoding(self) -> bool:
+        """ Whether live bundles go through the shared messages (backfill never does). """
+        return self._encoded is not None
+
+    def _check_sendable(self) -> None:
         if self._closed:
             raise ValueError("connection already closed!")
         if self._ws_closed:
             raise ValueError("websocket shut down")
         if not self._ws_connected:
             raise ValueError("connection not ready!")
-        data = self._ws.send(BytesMessage(sync_message.SerializeToString()))
+
+    def _send_data(self, pieces: List[bytes]) -> int:
         try:
-            return self._socket.send(data)
-        except Exception as e:
+            for data in pieces:
+                self._enqueue(data)
+        except OSError as e:
             self._logger.error("Error sending data: %s", e)
+            self._ws_closed = True
             self.close()
             return 0
+        return sum(map(len, pieces))
+
+    def _enqueue(self, data: bytes) -> None:
+        """ Queues a websocket frame, writing it right away if nothing is waiting ahead of it. """
+        self._outbox.append(data)
+        self._outbox_bytes += len(data)
+        if self._outbox_bytes > self._peak_outbox_bytes:
+            self._peak_outbox_bytes = self._outbox_bytes
+        if len(self._outbox) == 1:
+            self._drain()
+
+    def _drain(self) -> bool:
+        """ Writes queued frames until the socket would block; returns True if the queues emptied.
+
+            Live frames go ahead of backfill frames, except that a backfill frame already
+            partly written has to be finished first.
+        """
+        while True:
+            backfill = self._writing_backfill or not self._outbox
+            outbox = self._backfill_outbox if backfill else self._outbox
+            if not outbox:
+                return True
+            data = outbox[0]
+            try:
+                sent = self._socket.send(data)
+            except (BlockingIOError, InterruptedError, SSLWantWriteError, SSLWantReadError, TimeoutError):
+                return False
+            self._outbox_bytes -= sent
+            if sent < len(data):
+                outbox[0] = memoryview(data)[sent:]
+                self._writing_backfill = backfill
+                self._mid_frame = True
+                return False
+            outbox.popleft()
+            self._mid_frame = False
+            if backfill:
+                self._writing_backfill = False
+                for chain in self._backfill_frame_chains.popleft():
+                    remaining = self._backfill_chains[chain] - 1
+                    if remaining:
+                        self._backfill_chains[chain] = remaining
+                    else:
+                        del self._backfill_chains[chain]
+
+    def wants_write(self) -> bool:
+        """ True when there are queued frames, or another slice of backfill ready to go. """
+        if self._closed:
+            return False
+        if self._connecting:
+            return self._connect_wants_write
+        if self._event_replay is not None and self._outbox_bytes <= self._low_water:
+            return True
+        return bool(self._outbox or self._backfill_outbox) or self._may_continue_backfill()
+
+    def on_write_ready(self) -> None:
+        """ Called by the loop when the socket can take more data. """
+        if self._connecting:
+            self._continue_connect()
+            return
+        try:
+            self._drain()
+        except OSError as error:
+            self._logger.warning("(%s) error writing to peer: %s", self._name, error)
+            self._ws_closed = True
+            raise Finished()
+        self._maybe_resume_backfill()
+        self._continue_event_replay()
+
+    def get_stats(self) -> dict:
+        """ Outbound queue metrics for this connection. """
+        return {
+            "queued_bytes": self._outbox_bytes,
+            "queued_frames": len(self._outbox) + len(self._backfill_outbox),
+            "queued_backfill_frames": len(self._backfill_outbox),
+            "peak_queued_bytes": self._peak_outbox_bytes,
+            "backfill_pauses": self._backfill_pauses,
+            "backfilling": self._backfill_store is not None,
+            "snapshotting": self._snapshot is not None,
+            "in_flight_bytes": self._in_flight_bytes,
+            "resumed": self._resumed,
+            "connecting": self._connecting,
+        }
+
+    def start_backfill(self, store: BundleStore, *, limit_to: Optional[Mapping[Chain, Limit]] = None) -> None:
+        """ Sends the peer everything it's missing from the store, then INITIAL_BUNDLES_SENT.
+
+            The backfill goes in its own lane behind live bundles (other than those extending
+            chains it has queued), and it's sent a slice (backfill_slice_bytes) at a time, each
+            picked up from on_write_ready, so a big catch-up doesn't hold up the loop or the
+            bundles everyone else is waiting on.
+
+            Whenever the outbound queue passes the high watermark the scan stops, and
+            it's picked back up from on_write_ready once the queue is under the low watermark,
+            so a slow peer doesn't hold an unbounded amount of data in memory.  With a session,
+            it also waits for acks whenever max_in_flight_bytes are unacknowledged, and a
+            resumed session only scans from the earliest point the peer might be missing.
+
+            A peer that greeted with nothing and asked for a snapshot gets one instead (if the
+            store can give one), followed by whatever came in while it was being sent.
+        """
+        self._backfill_store = store
+        self._backfill_limit_to = limit_to
+        self._backfill_after = None
+        if self._resumed and self._session is not None:
+            rescan_from, self._session.rescan_from = self._session.rescan_from, None
+            self._backfill_from(rescan_from)
+            return
+        if (limit_to is None and self.wants_snapshot() and self._tracker is not None
+                and not self._tracker and store.supports_snapshots() and self._start_snapshot(store)):
+            return
+        self._continue_backfill()
+
+    def _backfill_from(self, rescan_from: Optional[int]) -> None:
+        """ Sends what the peer is missing among bundles with timestamps from rescan_from on. """
+        if rescan_from is None:
+            self._finish_backfill()
+            return
+        if rescan_from > 0:
+            self._backfill_after = BundleInfo(
+                timestamp=rescan_from - 1, medallion=2**64 - 1, chain_start=2**64 - 1)
+        self._continue_backfill()
+
+    def _start_snapshot(self, store: BundleStore) -> bool:
+        try:
+            self._snapshot_heads, self._snapshot = store.get_snapshot()
+        except ValueError as error:
+            self._logger.info("(%s) sending bundles instead of a snapshot: %s", self._name, error)
+            return False
+        self._backfill_store = None
+        self._snapshot_store = store
+        self._snapshot_missed = None
+        self._logger.debug("(%s) sending a snapshot of %d chains", self._name, len(self._snapshot_heads))
+        self._continue_snapshot()
+        return True
+
+    def _continue_snapshot(self) -> None:
+        assert self._snapshot is not None
+        sliced = 0
+        for table, keys, values in self._snapshot:
+            sync_message = SyncMessage()
+            part = sync_message.snapshot  # type: ignore
+            part.table = table
+            part.keys.extend(keys)
+            part.values.extend(values)
+            sliced += self._send_backfill(sync_message, [])
+            if self._outbox_bytes >= self._high_water:
+                self._backfill_pauses += 1
+                return
+            if sliced >= self._backfill_slice_bytes:
+                return
+        sync_message = SyncMessage()
+        sync_message.snapshot.complete = True  # type: ignore
+        self._send_backfill(sync_message, [])
+        heads, store = self._snapshot_heads, self._snapshot_store
+        assert heads is not None and store is not None
+        self._snapshot = self._snapshot_heads = self._snapshot_store = None
+        self._tracker = heads
+        if self._session is not None:
+            self._session.confirmed = heads.copy()
+        self._backfill_store = store
+        self._backfill_from(self._snapshot_missed)
+
+    def _continue_backfill(self) -> None:
+        """ Sends the next slice of the backfill (stopping early if the peer's falling behind). """
+        store = self._backfill_store
+        assert store is not None
+        sliced = 0
+
+        def callback(decomposition: Decomposition):
+            nonlocal sliced
+            self._backfill_after = decomposition.get_info()
+            sliced += self._send_bundle(decomposition, backfill=True)
+            if (self._outbox_bytes + self._backfill_batch_bytes >= self._high_water
+                    or self._in_flight_bytes >= self._max_in_flight_bytes):
+                self._backfill_pauses += 1
+                raise _BackfillPaused()
+            if sliced >= self._backfill_slice_bytes:
+                raise _BackfillPaused()
+
+        try:
+            store.get_bundles(callback, peer_has=self._tracker, limit_to=self._backfill_limit_to,
+                              start_after=self._backfill_after)
+        except _BackfillPaused:
+            if self._backfill_batch:
+                self._flush_backfill()
+            self._logger.debug("(%s) backfill paused with %d bytes queued", self._name, self._outbox_bytes)
+            return
+        self._finish_backfill()
+
+    def _finish_backfill(self) -> None:
+        self._backfill_store = None
+        self._backfill_limit_to = None
+        self._backfill_after = None
+        self._logger.debug("sending initial sync completed flag (%s)", self._name)
+        if self._backfill_batch:
+            self._flush_backfill()
+        sync_message = SyncMessage()
+        sync_message.signal = SyncMessage.Signal.INITIAL_BUNDLES_SENT  # type: ignore
+        self._send_backfill(sync_message, [])
 
     #@observing
     def close(self, reason=None):
@@ -464,9 +1399,32 @@ class Connection(Selectable):
         code = 1000
         if reason is not None:
             raise NotImplementedError()
+        if self._snapshot is not None:
+            self._snapshot.close()  # lets go of the store's read transaction
+            self._snapshot = None
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._event_stream:
+            assert self._sse_feed is not None
+            self._sse_feed.detach(self)
+            self._event_replay = None
         try:
             if self._ws_connected and not self._ws_closed:
-                self._socket.send(self._ws.send(CloseConnection(code=code)))
+                # whatever the socket won't take now is dropped rather than waited for, so closing
+                # a peer that has fallen behind doesn't hold up the loop (and every other peer)
+                self._socket.setblocking(False)
+                self.flush()
+                if self._outbox_bytes:
+                    self._logger.debug("(%s) dropping %d queued bytes on close", self._name, self._outbox_bytes)
+                self._outbox.clear()
+                self._backfill_outbox.clear()
+                self._outbox_bytes = 0
+                if not self._mid_frame:  # otherwise the peer would take the close message as part of the frame
+                    try:
+                        self._socket.send(self._ws.send(CloseConnection(code=code)))
+                    except (BlockingIOError, InterruptedError, SSLWantWriteError, SSLWantReadError):
+                        pass  # no room for it; the peer will see the connection end anyway
                 self._socket.shutdown(SHUT_WR)
                 self._ws_closed = True
             """
@@ -484,48 +1442,135 @@ class Connection(Selectable):
                         break
                     self._logger.warning("got something unexpected waiting for close: %s", event)
             """
-        except BrokenPipeError as bpe:
-            self._logger.warning("could not send close message: %s", bpe)
+        except OSError as error:
+            self._logger.warning("could not send close message: %s", error)
         finally:
             self._socket.close()
             self._closed = True
+            if self._on_close is not None:
+                self._on_close(self)
 
     #@observing
     def send_bundle(self, decomposition: Decomposition) -> None:
+        """ Sends a (live) bundle, ahead of any backfill not on the same chain. """
+        self._send_bundle(decomposition, backfill=False)
+
+    def _send_bundle(self, decomposition: Decomposition, backfill: bool) -> int:
+        """ Returns the size of the bundle if it's going to the peer, or 0 if it isn't. """
         info = decomposition.get_info()
         self._logger.debug("(%s) send_bundle %s", self._name, info)
         if self._tracker is None:  # haven't received greeting
             self._logger.debug("_tracker is None")
-            return
-
+            return 0
+        if self._snapshot is not None:
+            if self._snapshot_missed is None or info.timestamp < self._snapshot_missed:
+                self._snapshot_missed = info.timestamp  # goes out after the snapshot
+            return 0
         if self._tracker.has(info):
             self._logger.debug("(%s) peer already has %s", self._name, info)
-            return
+            return 0
         if not self._tracker.is_valid_extension(info):
+            if self._backfill_store is not None:
+                return 0  # the paused backfill will get to it, after what it depends on
             raise ValueError("bundle would be an invalid extension!")
-        sync_message = SyncMessage()
-        sync_message.bundle = decomposition.get_bytes()
-        self.send(sync_message)
+        bundle_bytes = decomposition.get_bytes()
+        chain = info.get_chain()
+        if self._session is not None:
+            self._in_flight.setdefault(chain, deque()).append((info.timestamp, len(bundle_bytes)))
+            self._in_flight_bytes += len(bundle_bytes)
+        if backfill or chain in self._backfill_chains:
+            self._tracker.mark_as_having(info)
+            self._backfill_chains[chain] = self._backfill_chains.get(chain, 0) + 1
+            if not self.batches_enabled():
+                sync_message = SyncMessage()
+                sync_message.bundle = bundle_bytes
+                self._send_backfill(sync_message, [chain])
+                return len(bundle_bytes)
+            self._backfill_batch.append(bundle_bytes)
+            self._backfill_batch_chains.append(chain)
+            self._backfill_batch_bytes += len(bundle_bytes)
+            if (len(self._backfill_batch) >= self._max_batch_count
+                    or self._backfill_batch_bytes >= self._max_batch_bytes):
+                self._flush_backfill()
+            return len(bundle_bytes)
+        if self.batches_enabled():
+            self._batch.append(bundle_bytes)
+            self._batch_bytes += len(bundle_bytes)
+            self._tracker.mark_as_having(info)
+            if len(self._batch) >= self._max_batch_count or self._batch_bytes >= self._max_batch_bytes:
+                self._flush_live()
+            return len(bundle_bytes)
+        if self._shares_encoding():
+            if self._batch or self._acks:
+                self._flush_live()
+            self._send_encoded([bundle_bytes], as_batch=False)
+        else:
+            sync_message = SyncMessage()
+            sync_message.bundle = bundle_bytes
+            self.send(sync_message)
         self._tracker.mark_as_having(info)
+        return len(bundle_bytes)
+
+    def send_ack(self, info: BundleInfo) -> None:
+        """ Acknowledges a bundle, folding it into a cumulative per-chain ack if batching. """
+        if not self.batches_enabled():
+            self.send(info.as_acknowledgement())
+            return
+        chain = info.get_chain()
+        prior = self._acks.get(chain)
+        if prior is None or prior.timestamp < info.timestamp:
+            self._acks[chain] = info
 
-    def receive_objects(self) -> Iterable[Union[BundleInfo, Decomposition, HasMap]]:
-        """ Receive BundleWrappers, BundleInfos, and/or HasMaps from a peer. """
-        for sync_message in self.receive():
-            if sync_message.HasField("bundle"):
-                bundle_bytes = sync_message.bundle
+    def receive_objects(
+            self) -> Iterable[Union[BundleInfo, Decomposition, HasMap, SyncMessage.Snapshot]]:  # type: ignore
+        """ Receive BundleWrappers, BundleInfos, HasMaps and/or snapshot parts from a peer. """
+        for sync_message in self._receive_messages():
+            if isinstance(sync_message, bytes) or sync_message.HasField("bundle"):
+                bundle_bytes = sync_message if isinstance(sync_message, bytes) else sync_message.bundle
                 wrap = Decomposition(bundle_bytes)
                 info = wrap.get_info()
                 if self._tracker is not None:
                     self._tracker.mark_as_having(info)
+                self._mark_confirmed(info)
                 self._logger.debug("(%s) received bundle %s", self._name, info)
                 yield wrap
+            elif sync_message.HasField("batch"):
+                batch = sync_message.batch  # type: ignore
+                self._logger.debug("(%s) received batch of %d bundles and %d acks",
+                                   self._name, len(batch.bundles), len(batch.acks))
+                for bundle_bytes in batch.bundles:
+                    wrap = Decomposition(bundle_bytes)
+                    if self._tracker is not None:
+                        self._tracker.mark_as_having(wrap.get_info())
+                    self._mark_confirmed(wrap.get_info())
+                    yield wrap
+                for ack in batch.acks:
+                    info = BundleInfo.from_ack(ack)
+                    self._on_acked(info)
+                    yield info
             elif sync_message.HasField("greeting"):
+                self._peer_features = set(sync_message.greeting.features)  # type: ignore
                 self._tracker = HasMap(sync_message=sync_message)
+                if self._session is not None and not self._resumed:
+                    self._session.confirmed = HasMap(sync_message=sync_message)
+                    self._session.features = set(self._peer_features)
                 self._logger.debug("(%s) received greeting %s", self._name, self._tracker)
                 yield self._tracker
+            elif sync_message.HasField("snapshot"):
+                if not self._requested_snapshot:
+                    self._logger.warning("(%s) was sent a snapshot it didn't ask for", self._name)
+                    raise Finished()
+                part = sync_message.snapshot  # type: ignore
+                self._receiving_snapshot = not part.complete
+                self._requested_snapshot = not part.complete  # just the one
+                self._logger.debug("(%s) received %d pairs of snapshot table %r",
+                                   self._name, len(part.keys), part.table)
+                yield part
             elif sync_message.HasField("ack"):
                 self._logger.debug("(%s) received ack %s", self._name, sync_message)
-                yield BundleInfo.from_ack(sync_message)
+                info = BundleInfo.from_ack(sync_message)
+                self._on_acked(info)
+                yield info
             elif sync_message.HasField("signal"):
                 self._logger.debug("(%s) received signal %s", self._name, sync_message.signal)
                 if sync_message.signal == SyncMessage.Signal.READ_ONLY_CONNECTION:
@@ -537,6 +1582,10 @@ class Connection(Selectable):
             else:
                 self._logger.warning("got binary message without ack, bundle, greeting, or signal")
 
+    def _mark_confirmed(self, info: BundleInfo) -> None:
+        if self._session is not None and self._session.confirmed is not None:
+            self._session.confirmed.mark_as_having(info)
+
     @property
     def name(self) -> Optional[str]:
         return self._name
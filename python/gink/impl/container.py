@@ -4,6 +4,7 @@ from typeguard import typechecked
 from abc import ABC, abstractmethod
 from sys import stdout
 from datetime import datetime
+from collections.abc import Buffer
 
 from .builders import ChangeBuilder, EntryBuilder
 
@@ -13,8 +14,9 @@ from .database import Database
 from .typedefs import GenericTimestamp, EPOCH, UserKey, MuTimestamp, UserValue, Deletion, Inclusion
 from .coding import encode_key, encode_value, decode_value, deletion, inclusion
 from .addressable import Addressable
+from .blob import Blob
 from .tuples import Chain
-from .utilities import generate_timestamp, normalize_pair, experimental
+from .utilities import generate_timestamp, normalize_pair, experimental, validate_entry
 from .builders import Behavior
 from .timing import *
 
@@ -47,7 +49,10 @@ class Container(Addressable, ABC):
         file.flush()
 
     @typechecked
-    def _get_occupant(self, builder: EntryBuilder, address: Optional[Muid] = None) -> Union[UserValue, 'Container']:
+    def _get_occupant(
+            self,
+            builder: EntryBuilder,
+            address: Optional[Muid] = None) -> Union[UserValue, Blob, 'Container']:
         """ Figures out what the container is containing.
 
             Returns either a Container or a UserValue
@@ -115,7 +120,7 @@ class Container(Addressable, ABC):
 
     @typechecked
     def _add_entry(self, *,
-                   value: Union[UserValue, Deletion, Inclusion, 'Container', Muid],
+                   value: Union[UserValue, Blob, Deletion, Inclusion, 'Container', Muid],
                    key: Union[Muid, str, int, bytes, None, Chain,
                                 Tuple[Union['Container', Muid], Union['Container', Muid]],
                                 'Container'] = None,
@@ -173,7 +178,7 @@ class Container(Addressable, ABC):
             entry_builder.pointee.medallion = value.get_medallion_or_zero()
             entry_builder.pointee.timestamp = value.get_timestamp_or_zero()
             entry_builder.pointee.offset = value.offset
-        elif isinstance(value, (str, int, float, dict, tuple, list, bool, bytes, type(None), datetime)):
+        elif isinstance(value, (str, int, float, dict, tuple, list, bool, bytes, type(None), datetime, Buffer, Blob)):
             encode_value(value, entry_builder.value)  # type: ignore # pylint: disable=maybe-no-member
         elif value == deletion:
             entry_builder.deletion = True  # type: ignore # pylint: disable=maybe-no-member
@@ -181,7 +186,8 @@ class Container(Addressable, ABC):
             pass
         else:
             raise ValueError(f"don't know how to add this value to gink: {value}")
-        muid = bundler.add_change(change_builder)
+        validate_entry(entry_builder)
+        muid = bundler._add_validated_change(change_builder)
         if immediate:
             bundler.commit()
         return muid
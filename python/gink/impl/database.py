@@ -2,7 +2,7 @@
 """ contains the Database class """
 
 # standard python modules
-from typing import Optional, Union, Iterable, List, Tuple
+from typing import TYPE_CHECKING, Optional, Union, Iterable, List, Tuple, Callable
 from sys import stdout
 from logging import getLogger
 from re import fullmatch
@@ -30,6 +30,11 @@ from .utilities import (
     summarize,
 )
 from .relay import Relay
+from .subscriptions import Subscriptions, Subscription, ContainerChanges
+from .change_stream import ChangeStream
+from .has_map import HasMap
+if TYPE_CHECKING:
+    from .addressable import Addressable
 from .timing import *
 
 
@@ -63,6 +68,7 @@ class Database(Relay):
         self._symmetric_key = None
         self._allow_new_chains = allow_new_chains
         self._require_symmetric_key = require_symmetric_key
+        self._subscriptions = Subscriptions(self)
 
     def get_root(self):
         from .directory import Directory
@@ -120,6 +126,45 @@ class Database(Relay):
         if self._last_link and info.get_chain() == self._last_link.get_chain():
             self._last_link = info
         super()._on_bundle(bundle_wrapper)
+        if self._subscriptions:
+            self._subscriptions.on_bundle(bundle_wrapper)
+
+    def _on_store_replaced(self) -> None:
+        self._last_link = None
+        self._subscriptions.on_replaced()
+        super()._on_store_replaced()
+
+    def subscribe(
+            self,
+            container_or_muid: Union["Addressable", Muid, None],
+            callback: Callable[[ContainerChanges], None],
+            include_descendants: bool = False,
+            on_replaced: Optional[Callable[[], None]] = None) -> Subscription:
+        """ Calls callback with the changes each new bundle makes to the given container.
+
+            The callback gets one ContainerChanges per bundle (and container) with the entries,
+            movements and clearances in it.  With include_descendants it also gets those for the
+            containers nested inside (e.g. directories in a directory), with the container set
+            to the nested one.  With None in place of a container, it gets the changes to every
+            container.  Call cancel() on the returned Subscription to stop.
+
+            Installing a snapshot (see connect_to's bootstrap) replaces the store's contents
+            without any bundles going by, so on_replaced (if given) is called then instead.
+        """
+        return self._subscriptions.subscribe(container_or_muid, callback, include_descendants, on_replaced)
+
+    def changes(
+            self,
+            since: Optional[HasMap] = None,
+            containers: Optional[Iterable[Union["Addressable", Muid]]] = None, *,
+            max_queued: int = 1024,
+            overflow: str = "coalesce") -> ChangeStream:
+        """ Returns a ChangeStream of the changes to this database (or just to containers).
+
+            Iterate over it from another thread, or with `async for`; see ChangeStream for the
+            overflow policies ("drop", "block" or "coalesce") and resuming from since.
+        """
+        return ChangeStream(self, since, containers, max_queued, overflow)
 
     def get_store(self) -> AbstractStore:
         """ Returns the store managed by this database """
@@ -204,7 +249,9 @@ class Database(Relay):
         """ writes the contents of the database to file """
         from .container import Container
         from .get_container import get_container, container_classes
+        from .blob import dump_chunks
         file.write("\n")
+        dump_chunks(self, as_of=as_of, file=file)
         for cls in container_classes.values():
             container = cls(muid=Muid(-1,-1,cls.get_behavior()), database=self)
             assert isinstance(container, Container)
@@ -224,7 +271,9 @@ class Database(Relay):
         comment = self._abstract_store.get_comment(medallion=medallion, timestamp=timestamp) or None
         if comment is None:
             decomposition = self._abstract_store.get_one_bundle(timestamp=timestamp, medallion=medallion)
-            comment = summarize(decomposition) if decomposition else None
+            comment = None
+            if decomposition:
+                comment = summarize(decomposition, self._abstract_store.get_changes(decomposition))
         chain = self._abstract_store.find_chain(medallion=medallion, timestamp=timestamp)
         identity = self._abstract_store.get_identity(chain)
         return Attribution(
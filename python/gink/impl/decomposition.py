@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, cast
 
 from .builders import BundleBuilder
 from .bundle_info import BundleInfo
@@ -9,7 +9,6 @@ from nacl.encoding import RawEncoder
 class Decomposition:
     def __init__(self, bundle_bytes: bytes, bundle_info: Optional[BundleInfo] = None):
         self._bundle_bytes = bundle_bytes
-        self._body_bytes = self._bundle_bytes[64:]
         self._bundle_builder: Optional[BundleBuilder] = None
         self._bundle_info: Optional[BundleInfo] = bundle_info
 
@@ -19,13 +18,14 @@ class Decomposition:
     def get_builder(self) -> BundleBuilder:
         if self._bundle_builder is None:
             self._bundle_builder = BundleBuilder()
-            self._bundle_builder.ParseFromString(self._body_bytes)
+            signed = memoryview(self._bundle_bytes)[64:]  # skips the signature
+            self._bundle_builder.ParseFromString(cast(bytes, signed))
         return self._bundle_builder
 
     def get_info(self) -> BundleInfo:
         if self._bundle_info is None:
-            hex_hash = blake2b(self._bundle_bytes, digest_size=32, encoder=RawEncoder).hex()
-            self._bundle_info = BundleInfo(builder=self.get_builder(), hex_hash=hex_hash)
+            digest = blake2b(self._bundle_bytes, digest_size=32, encoder=RawEncoder)
+            self._bundle_info = BundleInfo.from_builder(self.get_builder(), digest)
         return self._bundle_info
 
     def __len__(self) -> int:
@@ -8,9 +8,10 @@ from logging import getLogger
 from .muid import Muid
 from .database import Database
 from .container import Container
-from .coding import decode_key, DIRECTORY, deletion
+from .coding import decode_key, DIRECTORY, deletion, value_repr
 from .bundler import Bundler
 from .typedefs import UserKey, GenericTimestamp, UserValue
+from .blob import Blob
 from .attribution import Attribution
 from .utilities import generate_timestamp
 from .timing import *
@@ -85,7 +86,7 @@ class Directory[K: UserKey, V: UserValue|Container](Container):
             identifier = f"muid={self._muid!r}"
         result = f"""{self.__class__.__name__}({identifier}, contents="""
         result += "{"
-        stuffing = [f"{key!r}: {val!r}" for key, val in self.items(as_of=as_of)]
+        stuffing = [f"{key!r}: {value_repr(val)}" for key, val in self.items(as_of=as_of)]
         as_one_line = result + ", ".join(stuffing) + "})"
         if len(as_one_line) < 80:
             return as_one_line
@@ -133,7 +134,7 @@ class Directory[K: UserKey, V: UserValue|Container](Container):
         """
         resolved = self._database.resolve_timestamp(as_of)
         keys = key_or_keys if isinstance(key_or_keys, (tuple, list)) else (key_or_keys,)
-        current: Union[UserValue, Container] = self
+        current: Union[UserValue, Blob, Container] = self
         store = self._database.get_store()
         for key in keys:
             assert isinstance(key, (str, bytes, int)), f"key must be a string, bytes, or int, got {type(key)}"
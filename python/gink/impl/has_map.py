@@ -1,11 +1,11 @@
 """ Defines the HasMap class.
 """
-from typing import Union, Optional, Iterable
+from typing import Union, Optional, Iterable, Tuple, List
 
 from sortedcontainers import SortedDict  # type: ignore
 
 from .builders import SyncMessage
-from .typedefs import Medallion
+from .typedefs import Medallion, MuTimestamp
 from .muid import Muid
 from .tuples import Chain
 from .bundle_info import BundleInfo
@@ -28,6 +28,17 @@ class HasMap:
                     medallion=greeting_entry.medallion,
                     chain_start=greeting_entry.chain_start)
                 self._data[chain] = greeting_entry.seen_through
+            if greeting.packed_entries:
+                self._data.update(_unpack_entries(greeting.packed_entries))
+
+    def copy(self) -> 'HasMap':
+        """ Returns an independent HasMap with the same contents. """
+        result = HasMap()
+        result._data = self._data.copy()
+        return result
+
+    def __len__(self) -> int:
+        return len(self._data)
 
     def get_subset(self, chains: Iterable[Chain]) -> 'HasMap':
         """ Returns a subset of this HasMap with the chains in the given iterable. """
@@ -71,11 +82,29 @@ class HasMap:
         else:
             raise ValueError("'what' must be a BundleInfo or Muid")
 
-    def to_greeting_message(self) -> SyncMessage:
+    def get_earliest_missing(self, other: 'HasMap') -> Optional[MuTimestamp]:
+        """ The earliest timestamp of a bundle that other has and this doesn't (or None if there are none). """
+        earliest: Optional[MuTimestamp] = None
+        for chain, other_has in other._data.items():
+            have = self._data.get(chain)
+            if have is not None and have >= other_has:
+                continue
+            missing_from = chain.chain_start if have is None else have + 1
+            if earliest is None or missing_from < earliest:
+                earliest = missing_from
+        return earliest
+
+    def to_greeting_message(self, packed: bool = False) -> SyncMessage:
         """ Constructs a SyncMessage containing a Greeting with the tracked data.
             The entries will be sorted in [medallion, chain_start] order.
+
+            With packed, the entries are delta/varint encoded into packed_entries instead,
+            which is a fraction of the size; only send those to peers that accept them.
         """
         sync_message = SyncMessage()
+        if packed:
+            sync_message.greeting.packed_entries = _pack_entries(self._data.items())  # type: ignore
+            return sync_message
         # pylint: disable=maybe-no-member
         sync_message.greeting.entries.append(SyncMessage.Greeting.GreetingEntry())  # type: ignore
         del sync_message.greeting.entries[0]  # type: ignore
@@ -89,3 +118,41 @@ class HasMap:
             entry.seen_through = seen_through
             greeting.entries.append(entry)  # pylint: disable=maybe-no-member # type: ignore
         return sync_message
+
+
+def _pack_entries(items: Iterable[Tuple[Chain, int]]) -> bytes:
+    packed = bytearray()
+    last_medallion = 0
+    last_chain_start = 0
+    for chain, seen_through in items:
+        delta = chain.chain_start - last_chain_start
+        for number in (chain.medallion - last_medallion,
+                       (delta << 1) if delta >= 0 else ((-delta << 1) - 1),
+                       seen_through - chain.chain_start):
+            while number > 0x7f:
+                packed.append((number & 0x7f) | 0x80)
+                number >>= 7
+            packed.append(number)
+        last_medallion = chain.medallion
+        last_chain_start = chain.chain_start
+    return bytes(packed)
+
+
+def _unpack_entries(packed: bytes) -> Iterable[Tuple[Chain, int]]:
+    numbers: List[int] = []
+    number = shift = 0
+    for byte in packed:
+        number |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        numbers.append(number)
+        number = shift = 0
+    if shift or len(numbers) % 3:
+        raise ValueError("truncated packed greeting entries")
+    medallion = chain_start = 0
+    for i in range(0, len(numbers), 3):
+        medallion += numbers[i]
+        zigzag = numbers[i + 1]
+        chain_start += (zigzag >> 1) if not zigzag & 1 else -((zigzag + 1) >> 1)
+        yield Chain(medallion=Medallion(medallion), chain_start=chain_start), chain_start + numbers[i + 2]
@@ -7,6 +7,11 @@ from socket import (
     SOL_SOCKET,
     SO_REUSEADDR,
 )
+import socket as _socket_module
+from os import unlink
+from errno import EADDRINUSE
+from pathlib import Path
+from stat import S_ISSOCK
 from ssl import SSLContext, create_default_context, Purpose
 
 from .typedefs import AuthFunc, Selectable
@@ -15,7 +20,7 @@ from .utilities import make_auth_func
 
 
 class Listener(Socket, Selectable):
-    """ Listens on a port for incoming connections. """
+    """ Listens on a port (or unix domain socket) for incoming connections. """
 
     def __init__(
             self,
@@ -25,19 +30,49 @@ class Listener(Socket, Selectable):
             certfile: Optional[str] = None,
             keyfile: Optional[str] = None,
             on_ready: Optional[Callable] = None,
+            reuse_port: bool = False,
+            unix_path: Union[str, Path, None] = None,
             ):
+        """ With reuse_port, several processes can listen on the same port and the kernel
+            spreads incoming connections between them (see SO_REUSEPORT).
+
+            With unix_path, listens on a unix domain socket at that path (for peers on the same
+            host) instead of addr and port; a stale socket file left there is replaced, and the
+            file is removed again on close.
+        """
         if bool(certfile) != bool(keyfile):
             raise ValueError("Need both cert and key files for SSL.")
         self._context = None
         if certfile and keyfile:
             self._context = create_default_context(Purpose.CLIENT_AUTH)
             self._context.load_cert_chain(certfile, keyfile)
-        Socket.__init__(self, AF_INET, SOCK_STREAM)
-        self.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        self.bind((addr, int(port)))
-        self.listen(128)
         self._auth_func = make_auth_func(auth) if isinstance(auth, str) else auth
         self._on_ready = on_ready
+        self._unix_path: Optional[Path] = None
+        if unix_path is not None:
+            if not hasattr(_socket_module, "AF_UNIX"):
+                raise ValueError("unix domain sockets aren't supported on this platform")
+            unix_path = Path(unix_path)
+            if unix_path.exists():
+                if not S_ISSOCK(unix_path.stat().st_mode):
+                    raise ValueError(f"{unix_path} exists and isn't a socket")
+                with Socket(getattr(_socket_module, "AF_UNIX"), SOCK_STREAM) as probe:
+                    if probe.connect_ex(str(unix_path)) == 0:
+                        raise OSError(EADDRINUSE, f"something is already listening on {unix_path}")
+                unlink(unix_path)  # left behind by a process that's gone
+            Socket.__init__(self, getattr(_socket_module, "AF_UNIX"), SOCK_STREAM)
+            self.bind(str(unix_path))
+            self._unix_path = unix_path
+        else:
+            Socket.__init__(self, AF_INET, SOCK_STREAM)
+            self.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+            if reuse_port:
+                if not hasattr(_socket_module, "SO_REUSEPORT"):
+                    self.close()
+                    raise ValueError("SO_REUSEPORT isn't supported on this platform")
+                self.setsockopt(SOL_SOCKET, getattr(_socket_module, "SO_REUSEPORT"), 1)
+            self.bind((addr, int(port)))
+        self.listen(128)
 
     def on_ready(self) -> Iterable[Selectable]:
         """ Called when this listener is ready to accept a connection.
@@ -53,5 +88,18 @@ class Listener(Socket, Selectable):
         """ Returns the SSL context for this listener. """
         return self._context
 
+    def get_unix_path(self) -> Optional[Path]:
+        """ The path of the unix domain socket this listens on, if it's one. """
+        return self._unix_path
+
+    def close(self):
+        unix_path, self._unix_path = self._unix_path, None
+        super().close()
+        if unix_path is not None:
+            try:
+                unlink(unix_path)
+            except FileNotFoundError:
+                pass
+
     def is_closed(self) -> bool:
         return self.fileno() == -1
@@ -4,12 +4,11 @@
 from os.path import exists
 from logging import getLogger
 import uuid
-from typing import Tuple, Iterable, Optional, Set, Union, Mapping, Callable, cast
+from typing import Tuple, Iterable, Iterator, Optional, Set, Union, Mapping, Callable, List, Sequence, cast
 from struct import pack
 from pathlib import Path
 from lmdb import Environment, Transaction as Trxn, Cursor, BadValsizeError  # type: ignore
 from nacl.signing import SigningKey, VerifyKey
-from nacl.secret import SecretBox
 
 # Gink Implementation
 from .builders import (BundleBuilder, ChangeBuilder, EntryBuilder, MovementBuilder,
@@ -30,6 +29,8 @@ from .coding import (encode_key, create_deleting_entry, PlacementBuilderPair, de
                      LocationKey, PROPERTY, BOX, GROUP, decode_value, EDGE_TYPE, PAIR_MAP, PAIR_SET, KEY_SET,
                      normalize_entry_builder, VERTEX, new_entries_replace, RemovalKey)
 
+_INSTALLING_SNAPSHOT = b"installing_snapshot"  # retentions key present while a snapshot is partly installed
+
 
 @experimental
 class LmdbStore(AbstractStore):
@@ -43,7 +44,8 @@ class LmdbStore(AbstractStore):
             retain_bundles=True,
             retain_entries=True,
             apply_changes=True,
-            map_size: int=2**30) -> None:
+            map_size: int=2**30,
+            decrypted_cache_size: Optional[int]=None) -> None:
         """ Opens a gink.lmdb file for use as a Store.
 
             file_path: where find or place the data file
@@ -52,10 +54,12 @@ class LmdbStore(AbstractStore):
             retain_entries: if not already set in this file, will specify entry retention
             map_size: Maximum size in bits the database may grow to. Defaults to 1TB
             since there is no penalty for making this number large on 64 bit systems.
+            decrypted_cache_size: how many decrypted change lists to keep in memory (0 disables)
         """
         self._logger = getLogger(self.__class__.__name__)
         self._temporary = False
         self._apply_changes = apply_changes
+        AbstractStore.__init__(self, decrypted_cache_size)
         if file_path is None:
             prefix = "/tmp/temp."
             if exists("/dev/shm"):
@@ -93,7 +97,29 @@ class LmdbStore(AbstractStore):
         self._symmetric_keys = self._handle.open_db(b"symmetric_keys") # key_id -> symmetric_key
         self._totals = self._handle.open_db(b"totals")
         self._by_value = self._handle.open_db(b"by_value") # property_muid + encoded_value + placement_muid -> container
-
+        # tables copied by get_snapshot; claims and keys are particular to this file and never leave it
+        self._snapshot_tables = {
+            "retentions": self._retentions,
+            "bundles": self._bundles,
+            "bundle_infos": self._bundle_infos,
+            "identities": self._identities,
+            "verify_keys": self._verify_keys,
+            "containers": self._containers,
+            "entries": self._entries,
+            "removals": self._removals,
+            "_removals_by_time": self._removals_by_time,
+            "locations": self._locations,
+            "clearances": self._clearances,
+            "properties": self._properties,
+            "placements": self._placements,
+            "by_describing": self._by_describing,
+            "by_pointee": self._by_pointee,
+            "by_name": self._by_name,
+            "by_side": self._by_side,
+            "totals": self._totals,
+            "by_value": self._by_value,
+            "chains": self._chains,
+        }
 
         if reset:
             with self._handle.begin(write=True) as txn:
@@ -132,6 +158,13 @@ class LmdbStore(AbstractStore):
             # TODO: add purge method to remove particular data even when retention is on
             # TODO: add expiries table to keep track of when things need to be removed
         self._seen_through: MuTimestamp = 0
+        self._has_map: Optional[HasMap] = None  # what the chains table held as of LMDB txn _has_map_txn
+        self._has_map_txn = -1
+        with self._handle.begin() as txn:
+            interrupted = txn.get(_INSTALLING_SNAPSHOT, db=self._retentions) is not None
+        if interrupted:
+            self._logger.warning("discarding a snapshot that was only partly installed into %s", file_path)
+            self.abort_snapshot()
 
     def get_one_bundle(self, timestamp: MuTimestamp, medallion: Medallion, *_) -> Optional[Decomposition]:
         with self._handle.begin() as trxn:
@@ -198,6 +231,12 @@ class LmdbStore(AbstractStore):
             assert len(found) == 32, "I thought we were only storing 32 byte symmetric keys!"
             return cast(bytes, found)
 
+    def _load_symmetric_key(self, key_id: int, trxn: Optional[Trxn]=None, /) -> Optional[bytes]:
+        if trxn is None:
+            with self._handle.begin() as trxn:
+                return self._load_symmetric_key(key_id, trxn)
+        return cast(Optional[bytes], trxn.get(encode_muts(key_id), db=self._symmetric_keys))
+
     def drop_history(self, as_of: Optional[MuTimestamp] = None):
         if as_of is None:
             as_of = generate_timestamp()
@@ -465,7 +504,7 @@ class LmdbStore(AbstractStore):
                         yield change
                     cursor_placed = containers_cursor.next()
                 for name, behavior in Behavior.items():
-                    if name not in ('UNSPECIFIED', 'TABLE', 'BRAID'):
+                    if name not in ('UNSPECIFIED', 'TABLE', 'BRAID', 'BLOB_CHUNKS'):  # chunks are never reset
                         muid = Muid(-1,-1,behavior)
                         for change in self._container_reset_changes(to_time, muid, seen, txn):
                             yield change
@@ -895,7 +934,7 @@ class LmdbStore(AbstractStore):
                 ckey = to_last_with_prefix(cursor, container_prefix, ckey[16:-24])
 
     def refresh(self, callback: Optional[Callable[[Decomposition], None]]=None) -> int:
-        with self._handle.begin(write=False) as trxn:
+        with self._thread_lock, self._handle.begin(write=False) as trxn:
             count = self._refresh_helper(trxn=trxn, callback=callback)
         if count:
             self._clear_notifications()
@@ -919,6 +958,16 @@ class LmdbStore(AbstractStore):
             callback: Optional[Callable[[Decomposition], None]]=None,
             claim_chain: bool=False
             ) -> bool:
+        # holds _thread_lock so bundles applied from several threads don't race on _seen_through and _has_map
+        with self._thread_lock:
+            return self._apply_bundle(bundle, callback, claim_chain)
+
+    def _apply_bundle(
+            self,
+            bundle: Union[Decomposition, bytes],
+            callback: Optional[Callable[[Decomposition], None]],
+            claim_chain: bool,
+            ) -> bool:
 
         decomposition: Decomposition = Decomposition(bundle) if not isinstance(bundle, Decomposition) else bundle
         builder = decomposition.get_builder()
@@ -926,9 +975,10 @@ class LmdbStore(AbstractStore):
         chain_key = bytes(new_info.get_chain())
         # Note: LMDB supports only one write transaction, so we don't need to explicitly lock.
         with self._handle.begin(write=True) as trxn:
+            write_txn = trxn.id()
             self._refresh_helper(trxn=trxn, callback=callback)
             chain_value_old = cast(bytes, trxn.get(chain_key, db=self._chains))
-            old_info = BundleInfo(encoded=chain_value_old) if chain_value_old else None
+            old_info = BundleInfo.from_bytes(chain_value_old) if chain_value_old else None
             needed = is_needed(new_info, old_info)
             if needed:
                 if claim_chain:
@@ -950,24 +1000,12 @@ class LmdbStore(AbstractStore):
                     trxn.put(bytes(chain_key), bytes(verify_key), db=self._verify_keys)
                 else:
                     verify_key = self.get_verify_key(new_info.get_chain(), trxn)
-                    assert old_info is not None and old_info.hex_hash is not None
-                    prior_hash = builder.prior_hash
-                    if prior_hash != bytes.fromhex(old_info.hex_hash):
+                    assert old_info is not None and old_info.digest is not None
+                    if builder.prior_hash != old_info.digest:
                         raise ValueError("prior_hash doesn't match hash of prior bundle")
                 verify_key.verify(decomposition.get_bytes())
-                if builder.encrypted:
-                    if builder.changes:
-                        raise ValueError("did not expect plain changes when using encryption")
-                    if not builder.key_id:
-                        raise ValueError("expected to have a key_id when encrypted is present")
-                    symmetric_key = cast(bytes, trxn.get(encode_muts(builder.key_id), db=self._symmetric_keys))
-                    if not symmetric_key:
-                        raise KeyError("could not find symmetric key referenced in bundle")
-                    secret_box = SecretBox(symmetric_key)
-                    decrypted = secret_box.decrypt(builder.encrypted)
-                    builder = BundleBuilder()
-                    builder.ParseFromString(decrypted)
-                change_items: Iterable[Tuple[int, ChangeBuilder]] = enumerate(builder.changes, start=1)
+                change_items: Iterable[Tuple[int, ChangeBuilder]] = enumerate(
+                    self.get_changes(decomposition, trxn), start=1)
                 for offset, change in change_items:
                     if not self._apply_changes:
                         break
@@ -993,6 +1031,13 @@ class LmdbStore(AbstractStore):
                         self._apply_clearance(new_info, trxn, offset, change.clearance)
                         continue
                     raise ValueError(f"Can't process change: {new_info} {offset} {change}")
+        if needed and self._has_map is not None:
+            # only extend the cached map if no other transaction has committed since it was built
+            if self._has_map_txn == write_txn - 1:
+                self._has_map.mark_as_having(new_info)
+                self._has_map_txn = write_txn
+            else:
+                self._has_map = None
         self._clear_notifications()
         if needed and callback is not None:
             callback(decomposition)
@@ -1269,6 +1314,7 @@ class LmdbStore(AbstractStore):
         self,
         callback: Callable[[Decomposition], None], *,
         limit_to: Optional[Mapping[Chain, Limit]] = None,
+        start_after: Optional[BundleInfo] = None,
         **_
     ):
         with self._handle.begin() as txn:
@@ -1278,10 +1324,15 @@ class LmdbStore(AbstractStore):
                 # minimum lookback time necessary to service the request.
                 raise ValueError("don't have full bundle retention")
             bundle_infos_cursor = txn.cursor(self._bundle_infos)
-            start_scan_at_time: MuTimestamp = 0  # would need to put the minimum lookback time here
-            data_remaining = bundle_infos_cursor.set_range(encode_muts(start_scan_at_time))
+            if start_after is None:
+                start_scan_at_time: MuTimestamp = 0  # would need to put the minimum lookback time here
+                data_remaining = bundle_infos_cursor.set_range(encode_muts(start_scan_at_time))
+            else:
+                data_remaining = bundle_infos_cursor.set_range(pack(">QQQ", *start_after.get_sort_key()))
+                if data_remaining and BundleInfo.from_bytes(bundle_infos_cursor.key()) == start_after:
+                    data_remaining = bundle_infos_cursor.next()
             while data_remaining:
-                bundle_info = BundleInfo(encoded=bundle_infos_cursor.key())
+                bundle_info = BundleInfo.from_bytes(bundle_infos_cursor.key())
                 if limit_to is None or bundle_info.timestamp <= limit_to.get(bundle_info.get_chain(), 0):
                     bundle_bytes = cast(bytes, txn.get(bundle_infos_cursor.value(), db=self._bundles))
                     bundle_wrapper = Decomposition(bundle_bytes=bundle_bytes, bundle_info=bundle_info)
@@ -1289,18 +1340,107 @@ class LmdbStore(AbstractStore):
                 data_remaining = bundle_infos_cursor.next()
 
     def get_has_map(self, limit_to: Optional[Mapping[Chain, Limit]]=None) -> HasMap:
-        has_map = HasMap()
-        with self._handle.begin() as txn:
-            infos_cursor = txn.cursor(self._chains)
-            data_remaining = infos_cursor.first()
-            while data_remaining:
-                info_bytes = infos_cursor.value()
-                bundle_info = BundleInfo(encoded=info_bytes)
-                has_map.mark_as_having(bundle_info)
-                data_remaining = infos_cursor.next()
-        if limit_to is not None:
-            has_map = has_map.get_subset(limit_to.keys())
-        return has_map
+        """ Served from a cached HasMap, which is extended as this store applies bundles.
+
+            The chains table is only rescanned when some other transaction (e.g. another
+            process sharing the file) has committed since the cache was last brought up to date.
+        """
+        with self._thread_lock, self._handle.begin() as txn:
+            if self._has_map is None or self._has_map_txn != txn.id():
+                has_map = HasMap()
+                infos_cursor = txn.cursor(self._chains)
+                data_remaining = infos_cursor.first()
+                while data_remaining:
+                    has_map.mark_as_having(BundleInfo.from_bytes(infos_cursor.value()))
+                    data_remaining = infos_cursor.next()
+                self._has_map = has_map
+                self._has_map_txn = txn.id()
+            if limit_to is not None:
+                return self._has_map.get_subset(limit_to.keys())
+            return self._has_map.copy()
+
+    def supports_snapshots(self) -> bool:
+        return True
+
+    def get_snapshot(self, part_bytes: int = 2**20) -> Tuple[HasMap, Iterator[Tuple[str, List[bytes], List[bytes]]]]:
+        """ The snapshot is read from a single LMDB read transaction, held until the iterator is done.
+
+            Stores holding symmetric keys are refused, since the materialized tables have the
+            decrypted contents of encrypted bundles, which a peer replaying them couldn't read.
+        """
+        txn = self._handle.begin()
+        try:
+            if txn.stat(db=self._symmetric_keys)["entries"]:
+                raise ValueError("won't snapshot a store holding decrypted data")
+            if txn.get(_INSTALLING_SNAPSHOT, db=self._retentions) is not None:
+                raise ValueError("store is in the middle of installing a snapshot")
+            has_map = HasMap()
+            for value in txn.cursor(self._chains).iternext(keys=False, values=True):
+                has_map.mark_as_having(BundleInfo.from_bytes(value))
+        except:
+            txn.abort()
+            raise
+        return has_map, self._iter_snapshot(txn, part_bytes)
+
+    def _iter_snapshot(self, txn: Trxn, part_bytes: int) -> Iterator[Tuple[str, List[bytes], List[bytes]]]:
+        try:
+            for table, db in self._snapshot_tables.items():
+                keys: List[bytes] = []
+                values: List[bytes] = []
+                size = 0
+                for key, value in txn.cursor(db):
+                    if db is self._retentions and key == _INSTALLING_SNAPSHOT:
+                        continue
+                    keys.append(key)
+                    values.append(value)
+                    size += len(key) + len(value)
+                    if size >= part_bytes:
+                        yield table, keys, values
+                        keys, values, size = [], [], 0
+                if keys:
+                    yield table, keys, values
+        finally:
+            txn.abort()
+
+    def begin_snapshot(self) -> None:
+        with self._handle.begin(write=True) as txn:
+            if txn.get(_INSTALLING_SNAPSHOT, db=self._retentions) is None and txn.stat(db=self._chains)["entries"]:
+                raise ValueError("can only install a snapshot into an empty store")
+            self._drop_snapshot_tables(txn)
+            txn.put(_INSTALLING_SNAPSHOT, b"\x01", db=self._retentions)
+
+    def add_snapshot_part(self, table: str, keys: Sequence[bytes], values: Sequence[bytes]) -> None:
+        db = self._snapshot_tables.get(table)
+        if db is None or len(keys) != len(values):
+            raise ValueError(f"bad snapshot part for table {table!r}")
+        with self._handle.begin(write=True) as txn:
+            if txn.get(_INSTALLING_SNAPSHOT, db=self._retentions) is None:
+                raise ValueError("no snapshot being installed")
+            cursor = txn.cursor(db)
+            cursor.putmulti(zip(keys, values))
+        if db is self._bundles and keys:
+            # bundles that came in the snapshot shouldn't look new to refresh()
+            self._seen_through = max(self._seen_through, decode_muts(max(keys)) or 0)
+
+    def finish_snapshot(self) -> None:
+        with self._handle.begin(write=True) as txn:
+            if not txn.delete(_INSTALLING_SNAPSHOT, db=self._retentions):
+                raise ValueError("no snapshot being installed")
+        self._has_map = None
+        self._seen_containers.clear()
+
+    def abort_snapshot(self) -> None:
+        with self._handle.begin(write=True) as txn:
+            self._drop_snapshot_tables(txn)
+            txn.delete(_INSTALLING_SNAPSHOT, db=self._retentions)
+        self._has_map = None
+        self._seen_containers.clear()
+
+    def _drop_snapshot_tables(self, txn: Trxn) -> None:
+        """ Empties everything a snapshot would fill in, except the retention settings. """
+        for db in self._snapshot_tables.values():
+            if db is not self._retentions:
+                txn.drop(db, delete=False)
 
     def get_by_describing(self, desc: Muid, as_of: MuTimestamp = -1) -> Iterable[FoundEntry]:
         prefix = bytes(desc)
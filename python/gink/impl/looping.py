@@ -1,28 +1,147 @@
-from typing import Optional, Iterable, Set, ContextManager, cast
-from selectors import DefaultSelector, BaseSelector, EVENT_READ
+from typing import Optional, Iterable, Set, ContextManager, Callable, List, Tuple, cast
+from selectors import DefaultSelector, BaseSelector, EVENT_READ, EVENT_WRITE
 from contextlib import nullcontext
 from logging import getLogger
+from heapq import heappush, heappop
+from itertools import count
+from time import monotonic
 
 from .utilities import GenericTimestamp, resolve_timestamp, generate_timestamp
 from .typedefs import Selectable, Finished
 
+# how long the loop waits after activity before giving on_timeout handlers (e.g. the console) a turn
+IDLE_DELAY = 0.01
+
+
+class TimerHandle:
+    """ Returned by the scheduling functions; call cancel() to prevent the callback from running. """
+    __slots__ = ["when", "callback", "interval", "cancelled"]
+
+    def __init__(self, when: float, callback: Callable[[], None], interval: Optional[float] = None):
+        self.when = when
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def __repr__(self) -> str:
+        return f"TimerHandle(when={self.when}, interval={self.interval}, cancelled={self.cancelled})"
+
+
+class Scheduler:
+    """ A heap of timers run by the loop between select calls.
+
+        Times are in seconds on the time.monotonic() clock.  Callbacks run on the loop's thread,
+        so this isn't thread safe: schedule things from the loop (or before it starts).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, TimerHandle]] = []
+        self._counter = count()
+
+    def _push(self, handle: TimerHandle) -> TimerHandle:
+        heappush(self._heap, (handle.when, next(self._counter), handle))
+        return handle
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> TimerHandle:
+        """ Run callback once the monotonic clock reaches when. """
+        return self._push(TimerHandle(when, callback))
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        """ Run callback after delay seconds. """
+        return self._push(TimerHandle(monotonic() + delay, callback))
+
+    def call_every(self, interval: float, callback: Callable[[], None]) -> TimerHandle:
+        """ Run callback every interval seconds (first after one interval) until cancelled. """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        return self._push(TimerHandle(monotonic() + interval, callback, interval))
+
+    def get_timeout(self) -> Optional[float]:
+        """ Seconds until the next live timer is due, or None if nothing is scheduled. """
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heappop(heap)
+        if not heap:
+            return None
+        return max(0.0, heap[0][0] - monotonic())
+
+    def run_due(self) -> int:
+        """ Runs the callbacks of all timers that are due, returning how many ran. """
+        heap = self._heap
+        now = monotonic()
+        ran = 0
+        while heap and heap[0][0] <= now:
+            _, _, handle = heappop(heap)
+            if handle.cancelled:
+                continue
+            if handle.interval is not None:
+                # schedule from the intended time so periodic timers don't drift
+                handle.when = max(handle.when + handle.interval, now)
+                self._push(handle)
+            handle.callback()
+            ran += 1
+        return ran
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, handle in self._heap if not handle.cancelled)
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    """ Returns the scheduler that loop uses by default. """
+    return _scheduler
+
+
+def call_at(when: float, callback: Callable[[], None]) -> TimerHandle:
+    """ Schedule callback on the default scheduler at time.monotonic() time when. """
+    return _scheduler.call_at(when, callback)
+
+
+def call_later(delay: float, callback: Callable[[], None]) -> TimerHandle:
+    """ Schedule callback on the default scheduler to run after delay seconds. """
+    return _scheduler.call_later(delay, callback)
+
+
+def call_every(interval: float, callback: Callable[[], None]) -> TimerHandle:
+    """ Schedule callback on the default scheduler to run every interval seconds. """
+    return _scheduler.call_every(interval, callback)
+
+
 def loop(
         *selectables: Optional[Selectable],
         context_manager: Optional[ContextManager] = None,
         selector: Optional[BaseSelector] = None,
         until: GenericTimestamp = None,
+        scheduler: Optional[Scheduler] = None,
         _logger = getLogger(__name__),
         ) -> None:
     """ Select loop for handling multiple Selectables. A Selectable is an object that has a fileno method and
         can be registered with a selector. For example, a websocket connection or a Console. The loop will call
         the on_ready method of the Selectable when it is ready to be read from. The loop will continue until the
         until timestamp is reached, or until the program is exited.
+
+        Selectables that have wants_write and on_write_ready methods (e.g. connections with queued
+        outbound data) are also watched for write readiness whenever wants_write() returns True.
+
+        Rather than polling, select blocks until a file descriptor is ready, the next timer on the
+        scheduler (the module default unless one is passed) is due, or until is reached.  Selectables
+        with an on_timeout method get it called once things have gone quiet after some activity.
+        Timer callbacks may close selectables (e.g. a connect that's taking too long); those are
+        dropped from the selector after the timers have run.
     """
     selector = selector or DefaultSelector()
     assert isinstance(selector, BaseSelector)
     registered: Set[Selectable] = set()
+    writers: Set[Selectable] = set()
     fd_mappings: dict[int, Selectable] = {}
     until_muts = None if until is None else resolve_timestamp(until)
+    scheduler = scheduler or _scheduler
+    idle_handlers: List[Callable[[], None]] = []
 
     def add(_selectables: Iterable[Optional[Selectable]]):
         """ Add selectables to the selector """
@@ -37,40 +156,86 @@ def loop(
                     if currently_registered is selectable_:
                         raise RuntimeError("unexpected not in registered: %s", selectable_)
                     registered.discard(currently_registered)
+                    writers.discard(currently_registered)
                     selector.unregister(currently_registered)
                     # maybe we should close currently_registered? It might close reused fd.
                 selector.register(selectable_, EVENT_READ)
                 registered.add(selectable_)
+                if hasattr(selectable_, "wants_write"):
+                    writers.add(selectable_)
+                if hasattr(selectable_, "on_timeout"):
+                    idle_handlers.append(getattr(selectable_, "on_timeout"))
                 fd_mappings[selectable_.fileno()] = selectable_
                 if hasattr(selectable_, "get_selectables"):
                     add(getattr(selectable_, "get_selectables")())
 
+    def remove(selectable_: Selectable):
+        """ Unregister and close a selectable that has finished """
+        assert isinstance(selector, BaseSelector)
+        selector.unregister(selectable_)
+        assert selectable_.fileno() in fd_mappings, "missing fileno in fd_mappings"
+        fd_mappings.pop(selectable_.fileno(), None)
+        selectable_.close()
+        registered.remove(selectable_)
+        writers.discard(selectable_)
+        if hasattr(selectable_, "on_timeout"):
+            idle_handlers.remove(getattr(selectable_, "on_timeout"))
+
+    def discard_closed():
+        """ Unregisters selectables that were closed from outside the loop (without closing them again). """
+        assert isinstance(selector, BaseSelector)
+        for selectable_ in [item for item in registered if hasattr(item, "is_closed") and item.is_closed()]:
+            key = selector.unregister(selectable_)
+            if fd_mappings.get(key.fd) is selectable_:
+                del fd_mappings[key.fd]
+            registered.remove(selectable_)
+            writers.discard(selectable_)
+            if hasattr(selectable_, "on_timeout"):
+                idle_handlers.remove(getattr(selectable_, "on_timeout"))
+
     add(selectables)
     context_manager = context_manager or nullcontext()
+    active = True  # whether anything has happened since the idle handlers last ran
     with context_manager:
         while until_muts is None or generate_timestamp() < until_muts:
+            if scheduler.run_due():
+                active = True
+                discard_closed()
+            timeout = scheduler.get_timeout()
+            if until_muts is not None:
+                remaining = max(0.0, (until_muts - generate_timestamp()) / 1e6)
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            if active and idle_handlers:
+                timeout = IDLE_DELAY if timeout is None else min(timeout, IDLE_DELAY)
+            for writer in writers:
+                events = EVENT_READ | EVENT_WRITE if getattr(writer, "wants_write")() else EVENT_READ
+                if selector.get_key(writer).events != events:
+                    selector.modify(writer, events)
             try:
-                selected = selector.select(0.01)
+                selected = selector.select(timeout)
             except KeyboardInterrupt:
                 break
-            for selector_key, _ in selected:
+            if selected:
+                active = True
+            for selector_key, events in selected:
                 selectable = cast(Selectable, selector_key.fileobj)
+                if selectable not in registered:
+                    continue  # removed while handling an earlier event this round
                 try:
-                    results = selectable.on_ready()
-                    if results:
-                        add(results)
+                    if events & EVENT_WRITE:
+                        getattr(selectable, "on_write_ready")()
+                    if events & EVENT_READ:
+                        results = selectable.on_ready()
+                        if results:
+                            add(results)
                 except Finished as finished:
                     _logger.debug("removing connection %s", finished)
-                    selector.unregister(selectable)
-                    assert selectable.fileno() in fd_mappings, "missing fileno in fd_mappings"
-                    fd_mappings.pop(selectable.fileno(), None)
-                    selectable.close()
-                    registered.remove(selectable)
+                    remove(selectable)
                     if selectable is context_manager:
                         until_muts = 0
-            else:
-                for selectable in registered:
-                    if hasattr(selectable, "on_timeout"):
-                        getattr(selectable, "on_timeout")()
+            if not selected and active:
+                active = False
+                for idle_handler in list(idle_handlers):
+                    idle_handler()
         for selectable in registered:
             selector.unregister(selectable)
@@ -6,7 +6,6 @@ from typing import Tuple, Callable, Optional, Iterable, Union, Dict, Mapping, Se
 from sortedcontainers import SortedDict  # type: ignore
 from pathlib import Path
 from nacl.signing import SigningKey, VerifyKey
-from nacl.secret import SecretBox
 
 # gink modules
 from .builders import (BundleBuilder, EntryBuilder, MovementBuilder, ClearanceBuilder,
@@ -50,10 +49,11 @@ class MemoryStore(AbstractStore):
     _symmetric_keys: Dict[int, bytes]
     _totals: Dict[bytes, int]  # (muid as bytes plus key to total)
 
-    def __init__(self, retain_entries = True) -> None:
+    def __init__(self, retain_entries = True, decrypted_cache_size: Optional[int] = None) -> None:
         # TODO: add a "no retention" capability for bundles?
         self._bundles = SortedDict()
         self._chain_infos = SortedDict()
+        self._has_map = HasMap()  # kept up to date with _chain_infos, for greetings
         self._claims = SortedDict()
         self._entries = {}
         self._identities = SortedDict()
@@ -67,6 +67,7 @@ class MemoryStore(AbstractStore):
         self._signing_keys = dict()
         self._verify_keys = dict()
         self._symmetric_keys = dict()
+        AbstractStore.__init__(self, decrypted_cache_size)
         self._logger = getLogger(self.__class__.__name__)
         self._retaining_entries = retain_entries
         self._totals = dict()
@@ -137,6 +138,9 @@ class MemoryStore(AbstractStore):
                 return None
         return self._symmetric_keys[key_id]
 
+    def _load_symmetric_key(self, key_id: int, _: Optional[bool]=None, /) -> Optional[bytes]:
+        return self._symmetric_keys.get(key_id)
+
     def save_signing_key(self, signing_key: SigningKey):
         self._signing_keys[signing_key.verify_key] = signing_key
 
@@ -372,26 +376,14 @@ class MemoryStore(AbstractStore):
                 self._verify_keys[chain_key] = verify_key
             else:
                 verify_key = self._verify_keys[chain_key]
-                assert old_info is not None and old_info.hex_hash is not None
-                prior_hash = bundle_builder.prior_hash
-                if prior_hash != bytes.fromhex(old_info.hex_hash):
+                assert old_info is not None and old_info.digest is not None
+                if bundle_builder.prior_hash != old_info.digest:
                     raise ValueError("prior_hash doesn't match hash of prior bundle")
             verify_key.verify(bundle.get_bytes())
             self._bundles[new_info] = bundle
             self._chain_infos[chain_key] = new_info
-            if bundle_builder.encrypted:
-                if bundle_builder.changes:
-                    raise ValueError("did not expect plain changes when using encryption")
-                if not bundle_builder.key_id:
-                    raise ValueError("expected to have a key_id when encrypted is present")
-                symmetric_key = self._symmetric_keys[bundle_builder.key_id]
-                if not symmetric_key:
-                    raise KeyError("could not find symmetric key referenced in bundle")
-                secret_box = SecretBox(symmetric_key)
-                decrypted = secret_box.decrypt(bundle_builder.encrypted)
-                bundle_builder = BundleBuilder()
-                bundle_builder.ParseFromString(decrypted)
-            change_items: Iterable[Tuple[int, ChangeBuilder]] = enumerate(bundle_builder.changes, start=1)
+            self._has_map.mark_as_having(new_info)
+            change_items: Iterable[Tuple[int, ChangeBuilder]] = enumerate(self.get_changes(bundle), start=1)
             for offset, change in change_items:
                 if change.HasField("container"):
                     container_muid = Muid.create(
@@ -569,24 +561,25 @@ class MemoryStore(AbstractStore):
         self,
         callback: Callable[[Decomposition], None], *,
         limit_to: Optional[Mapping[Chain, Limit]] = None,
+        start_after: Optional[BundleInfo] = None,
         **_
     ):
         self._maybe_refresh()
-        start_scan_at: MuTimestamp = 0
-        for bundle_info in self._bundles.irange(minimum=BundleInfo(timestamp=start_scan_at)):
+        if start_after is None:
+            start_scan_at: MuTimestamp = 0
+            infos = self._bundles.irange(minimum=BundleInfo(timestamp=start_scan_at))
+        else:
+            infos = self._bundles.irange(minimum=start_after, inclusive=(False, True))
+        for bundle_info in infos:
             if limit_to is None or bundle_info.timestamp <= limit_to.get(bundle_info.get_chain(), 0):
                 bundle_wrapper = self._bundles[bundle_info]
                 callback(bundle_wrapper)
 
     def get_has_map(self, limit_to: Optional[Mapping[Chain, Limit]]=None) -> HasMap:
         self._maybe_refresh()
-        has_map = HasMap()
-        for bundle_info in self._chain_infos.values():
-            assert isinstance(bundle_info, BundleInfo)
-            has_map.mark_as_having(bundle_info)
         if limit_to is not None:
-            has_map = has_map.get_subset(list(limit_to.keys()))
-        return has_map
+            return self._has_map.get_subset(limit_to.keys())
+        return self._has_map.copy()
 
     def get_last(self, chain: Chain) -> BundleInfo:
         self._maybe_refresh()
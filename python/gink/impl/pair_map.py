@@ -5,9 +5,10 @@ from typeguard import typechecked
 from .database import Database
 from .muid import Muid
 from .container import Container
-from .coding import PAIR_MAP, deletion, decode_entry_occupant
+from .coding import PAIR_MAP, deletion, decode_entry_occupant, value_repr
 from .bundler import Bundler
 from .typedefs import GenericTimestamp, UserValue
+from .blob import Blob
 from .utilities import normalize_pair, experimental
 from .graph import Vertex, Pair
 
@@ -91,7 +92,7 @@ class PairMap(Container):
         return found is not None and not found.builder.deletion  # type: ignore
 
     @typechecked
-    def items(self, *, as_of=None) -> Iterable[Tuple[Tuple[Vertex, Vertex], Union[UserValue, Container]]]:
+    def items(self, *, as_of=None) -> Iterable[Tuple[Tuple[Vertex, Vertex], Union[UserValue, Blob, Container]]]:
         """ Returns an iterable of key,value pairs, as of the effective time (or now) """
         as_of = self._database.resolve_timestamp(as_of)
         iterable = self._database.get_store().get_keyed_entries(container=self._muid, as_of=as_of, behavior=PAIR_MAP)
@@ -110,7 +111,7 @@ class PairMap(Container):
         vertex: Vertex, *,
         left: bool = False,
         rite: bool = False,
-        as_of=None) -> Iterable[Tuple[Tuple[Vertex, Vertex], Union[UserValue, Container]]]:
+        as_of=None) -> Iterable[Tuple[Tuple[Vertex, Vertex], Union[UserValue, Blob, Container]]]:
         # TODO: Make this suck less (https://github.com/x5e/gink/issues/468)
         as_of = self._database.resolve_timestamp(as_of)
         iterable = self._database.get_store().get_keyed_entries(container=self._muid, as_of=as_of, behavior=PAIR_MAP)
@@ -161,7 +162,7 @@ class PairMap(Container):
                 value = decode_entry_occupant(self._muid, entry_pair.builder)
                 stuffing += f"""\n\t(Muid{(left.timestamp, left.medallion, left.offset)},
                 Muid{(rite.timestamp, rite.medallion, rite.offset)}):
-                {value if not isinstance(value, bytes) else value!r},"""
+                {value_repr(value)},"""
 
         as_one_line = result + ", ".join(stuffing) + "})"
         if len(as_one_line) < 80:
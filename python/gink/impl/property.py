@@ -5,7 +5,7 @@ from typeguard import typechecked
 from .typedefs import UserValue, GenericTimestamp
 from .container import Container
 from .addressable import Addressable
-from .coding import PROPERTY, deletion
+from .coding import PROPERTY, deletion, value_repr
 from .muid import Muid
 from .database import Database
 from .bundler import Bundler
@@ -62,7 +62,7 @@ class Property[V: UserValue|Container](Container):
         identifier = f"muid={self._muid!r}"
         result = f"""{self.__class__.__name__}({identifier}, contents="""
         result += "{"
-        stuffing = [f"{k!r}:{v!r}" for k, v in self.items(as_of=as_of)]
+        stuffing = [f"{k!r}:{value_repr(v)}" for k, v in self.items(as_of=as_of)]
         as_one_line = result + ",".join(stuffing) + "})"
         if len(as_one_line) < 80:
             return as_one_line
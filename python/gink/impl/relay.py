@@ -1,20 +1,24 @@
 """ Contains the Relay class  """
 # standard python modules
-from typing import Set, Union, Iterable, List, Callable, Optional
+from typing import Set, Union, Iterable, List, Callable, Optional, Dict, Tuple
 from logging import getLogger
 from re import fullmatch, IGNORECASE
 from ssl import SSLError
 from pathlib import Path
+from secrets import token_hex
+from time import monotonic
+from random import uniform
+from socket import socket as Socket
 
 # gink modules
 from .bundle_info import BundleInfo
-from .connection import Connection
+from .connection import Connection, SyncSession, EncodedMessages
 from .listener import Listener
 from .has_map import HasMap
 from .lmdb_store import LmdbStore
 from .memory_store import MemoryStore
 from .decomposition import Decomposition
-from .looping import Selectable, Finished
+from .looping import Selectable, Finished, TimerHandle, call_later
 from .bundle_store import BundleStore
 from .server import Server
 from .builders import SyncMessage
@@ -22,13 +26,72 @@ from .utilities import validate_bundle
 from .log_backed_store import LogBackedStore
 
 
+def _parse_target(target: str) -> Tuple[bool, Optional[str], int, str, Optional[str]]:
+    """ Splits a connect_to target into (secure, host, port, path, unix_path). """
+    if target.startswith("unix://"):
+        unix_path = target[len("unix://"):]
+        if not unix_path:
+            raise ValueError(f"can't connect to: {target}")
+        return False, None, 0, "/", unix_path
+    match = fullmatch(r"(ws+://)?([a-z0-9.-]+)(?::(\d+))?(?:(/+.*))?$", target, IGNORECASE)
+    if not match:
+        raise ValueError(f"can't connect to: {target}")
+    prefix, host, port, path = match.groups()
+    if prefix and prefix not in ("ws://", "wss://"):
+        raise NotImplementedError("only vanilla and secure websockets (and unix sockets) currently supported")
+    return prefix == "wss://", host, int(port or "8080"), path or "/", None
+
+
+class OutboundPeer:
+    """ A peer dialed with Relay.connect_to, and how connecting to it is going.
+
+        state is "connecting" (the socket or websocket handshake isn't done yet), "connected"
+        (the peer has greeted), "waiting" (to reconnect after a failure or a drop), or "closed"
+        (not being retried).  failures counts failed attempts since it was last connected.
+    """
+    __slots__ = ["target", "auth_data", "name", "bootstrap", "reconnect", "state", "connection",
+                 "attempts", "failures", "last_error", "connected_at", "retry_at", "timer"]
+
+    def __init__(self, target: str, auth_data: Optional[str], name: Optional[str], bootstrap: bool, reconnect: bool):
+        self.target = target
+        self.auth_data = auth_data
+        self.name = name
+        self.bootstrap = bootstrap
+        self.reconnect = reconnect
+        self.state = "connecting"
+        self.connection: Optional[Connection] = None
+        self.attempts = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None  # monotonic time
+        self.retry_at: Optional[float] = None  # monotonic time
+        self.timer: Optional[TimerHandle] = None
+
+    def get_stats(self) -> dict:
+        return {
+            "state": self.state,
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "connected_for": None if self.connected_at is None else monotonic() - self.connected_at,
+            "retry_in": None if self.retry_at is None else max(0.0, self.retry_at - monotonic()),
+        }
+
+    def __repr__(self) -> str:
+        return f"OutboundPeer(target={self.target!r}, state={self.state!r})"
+
+
 class Relay(Server):
     """ An extension of the Server class that handles
         creating connections and receiving bundles .
     """
 
     _store: BundleStore
-    _not_acked: Set[BundleInfo]
+    session_timeout = 300.0  # seconds a disconnected peer's session is kept for resuming
+    max_sessions = 1024
+    connect_timeout = 10.0  # seconds to wait for an outgoing connection before giving up on it
+    reconnect_delay = 0.5  # seconds before the first retry; doubles with each failure after that
+    max_reconnect_delay = 60.0
 
     def __init__(self, store: Union[BundleStore, str, Path, None] = None):
         super().__init__()
@@ -44,8 +107,16 @@ class Relay(Server):
         self._store = store
         self._logger = getLogger(self.__class__.__name__)
         self._callbacks: List[Callable[[Decomposition], None]] = list()
+        self._replaced_callbacks: List[Callable[[], None]] = list()
         self._connections: Set[Connection] = set()
-        self._not_acked = set()
+        self._sessions: Dict[str, SyncSession] = {}  # sessions peers connected to us with, by token
+        self._client_sessions: Dict[str, SyncSession] = {}  # sessions from connect_to, by target
+        self._targets: Dict[Connection, str] = {}
+        self._peers: Dict[str, OutboundPeer] = {}  # from connect_to, by target
+        self._installing: Optional[Connection] = None  # the connection a snapshot is coming in from
+        self._deferred: List[Tuple[Connection, Decomposition]] = []  # from other peers while installing
+        self._batching = False
+        self._encoded = EncodedMessages()  # so bundles going to every peer are only serialized once
         if self._store.is_selectable():
             self._store.assign_on_ready(self._on_store_ready)
             self._add_selectable(self._store)
@@ -57,6 +128,14 @@ class Relay(Server):
         """ Add a callback to be called when a bundle is received. """
         self._callbacks.append(callback)
 
+    def add_replaced_callback(self, callback: Callable[[], None]):
+        """ Add a callback to be called when a snapshot has replaced the store's contents.
+
+            The bundles that came in the snapshot don't go to the add_callback callbacks, so
+            anything kept up to date from those (caches, version tokens) should start over.
+        """
+        self._replaced_callbacks.append(callback)
+
     def get_connections(self) -> Iterable[Connection]:
         """ Returns an iterable of all active connections. """
         for connection in self._connections:
@@ -65,40 +144,164 @@ class Relay(Server):
     def connect_to(self, target: str,
                    auth_data: Optional[str] = None,
                    name: Optional[str] = None,
+                   bootstrap: bool = False,
+                   reconnect: bool = False,
                    ):
-        """ Initiate a connection to another Gink instance. """
-        self._logger.info("initating connection to %s", target)
-        match = fullmatch(r"(ws+://)?([a-z0-9.-]+)(?::(\d+))?(?:(/+.*))?$", target, IGNORECASE)
-        assert match, f"can't connect to: {target}"
-        prefix, host, port, path = match.groups()
-        secure_connection = False
-        if prefix == "wss://":
-            secure_connection = True
-        elif prefix and prefix != "ws://":
-            raise NotImplementedError("only vanilla and secure websockets currently supported")
-
-        port = port or "8080"
-        path = path or "/"
+        """ Initiate a connection to another Gink instance.
+
+            This doesn't wait for the connection: it's made by the loop (so several peers are
+            connected to in parallel), and a peer that can't be reached is only logged.
+
+            With bootstrap, if the store is empty it asks the peer for a snapshot of its store to
+            install, rather than replaying every bundle (the peer's store contents are trusted as is).
+
+            With reconnect, the peer is dialed again whenever the connection fails or drops,
+            after a delay starting at reconnect_delay and doubling (up to max_reconnect_delay)
+            with each failure in a row, with random jitter so a restarted server isn't hit by
+            all its peers at once.  get_peer_stats() shows how it's going.
+
+            Besides ws:// and wss:// targets, a peer on the same host can be reached through
+            the unix domain socket it listens on (see start_listening) as unix:///path/to/socket.
+        """
+        _parse_target(target)  # so a malformed target fails here, not in the loop
+        previous = self._peers.get(target)
+        if previous is not None and previous.timer is not None:
+            previous.timer.cancel()
+        peer = OutboundPeer(target, auth_data, name, bootstrap, reconnect)
+        self._peers[target] = peer
+        self._dial(peer)
+
+    def add_socket(self, socket: Socket, *, is_client: bool, name: Optional[str] = None) -> Connection:
+        """ Syncs with a peer over a socket that's already connected to it.
+
+            Intended for peers in the same host, e.g. one end of a socketpair made before forking
+            a worker, with the other end given to the worker's relay.  One side has to be the
+            client (it sends the websocket request) and the other not.
+        """
         connection = Connection(
-            host=host,
-            port=int(port),
-            path=path,
+            socket=socket,
+            is_client=is_client,
             name=name,
             conn_func=self._conn_func,
-            auth_data=auth_data,
-            secure_connection=secure_connection,
             on_ws_act=self._on_connection_ready,
+            session_func=None if is_client else self._get_session,
+            encoded=self._encoded,
         )
         self._connections.add(connection)
+        self._add_selectable(connection)
+        return connection
+
+    def get_peer_stats(self) -> Dict[str, dict]:
+        """ The state of each peer dialed with connect_to, by target. """
+        return {target: peer.get_stats() for target, peer in self._peers.items()}
+
+    def _dial(self, peer: OutboundPeer) -> None:
+        """ Starts a (non-blocking) connection attempt to the peer. """
+        peer.timer = None
+        peer.retry_at = None
+        if self._closed or self._peers.get(peer.target) is not peer:
+            return
+        self._logger.info("initating connection to %s", peer.target)
+        secure, host, port, path, unix_path = _parse_target(peer.target)
+        session = self._client_sessions.pop(peer.target, None)
+        if session is not None and self._is_expired(session):
+            session = None
+        peer.state = "connecting"
+        peer.attempts += 1
+        try:
+            connection = Connection(
+                host=host,
+                port=port,
+                path=path,
+                unix_path=unix_path,
+                name=peer.name,
+                conn_func=self._conn_func,
+                auth_data=peer.auth_data,
+                secure_connection=secure,
+                on_ws_act=self._on_connection_ready,
+                session=session,
+                encoded=self._encoded,
+                request_snapshot=(peer.bootstrap and self._store.supports_snapshots()
+                                  and not self._store.get_has_map()),
+                on_close=self._on_connection_closed,
+            )
+        except OSError as error:
+            self._logger.warning("could not connect to %s: %s", peer.target, error)
+            if session is not None:
+                self._client_sessions[peer.target] = session
+            peer.last_error = str(error)
+            self._after_failure(peer)
+            return
+        peer.connection = connection
+        self._connections.add(connection)
+        self._targets[connection] = peer.target
         self._logger.debug("connection added")
         self._add_selectable(connection)
+        peer.timer = call_later(self.connect_timeout, lambda: self._on_connect_timeout(peer, connection))
+
+    def _on_connect_timeout(self, peer: OutboundPeer, connection: Connection) -> None:
+        peer.timer = None
+        if peer.connection is connection and peer.state == "connecting" and not connection.is_closed():
+            self._logger.warning("timed out connecting to %s", peer.target)
+            peer.last_error = "timed out"
+            connection.close()
+
+    def _on_connection_closed(self, connection: Connection) -> None:
+        """ Called when any connection from connect_to closes; schedules a retry if wanted. """
+        if connection in self._connections:  # closed by the loop rather than _on_connection_ready
+            self._connections.discard(connection)
+            self._remove_selectable(connection)
+            self._detach(connection)
+        target = self._targets.pop(connection, None)
+        peer = self._peers.get(target) if target is not None else None
+        if peer is None or peer.connection is not connection:
+            return
+        peer.connection = None
+        if peer.timer is not None:
+            peer.timer.cancel()
+            peer.timer = None
+        if peer.state == "connected":
+            self._logger.info("connection to %s dropped", peer.target)
+            peer.connected_at = None
+            peer.failures = 0
+        else:
+            peer.last_error = connection.get_connect_error() or peer.last_error or "closed while connecting"
+        self._after_failure(peer)
+
+    def _after_failure(self, peer: OutboundPeer) -> None:
+        if self._closed or not peer.reconnect:
+            peer.state = "closed"
+            return
+        delay = min(self.max_reconnect_delay, self.reconnect_delay * 2 ** peer.failures)
+        delay *= uniform(0.5, 1.0)
+        peer.failures += 1
+        peer.state = "waiting"
+        peer.retry_at = monotonic() + delay
+        self._logger.info("reconnecting to %s in %.1f seconds", peer.target, delay)
+        peer.timer = call_later(delay, lambda: self._dial(peer))
 
     def _on_store_ready(self):
         """ Called when the store is detects a new bundle. """
-        self._store.refresh(self._on_bundle)
+        self._batching = True
+        try:
+            self._store.refresh(self._on_bundle)
+        finally:
+            self._batching = False
+            self._flush_connections()
+
+    def _flush_connections(self):
+        """ Sends out anything the connections are holding to put into batches. """
+        for connection in self._connections:
+            connection.flush()
+        self._encoded.clear()
 
     def close(self):
         """ Close the store and the underlying server. """
+        for peer in self._peers.values():
+            if peer.timer is not None:
+                peer.timer.cancel()
+                peer.timer = None
+            peer.reconnect = False
         self._store.close()
         super().close()
 
@@ -108,17 +311,32 @@ class Relay(Server):
             Should only be called when a bundle has been successfully added to the local store.
         """
         self._logger.debug("_on_bundle for %s", bundle_wrapper.get_info())
-        for peer in self._connections:
+        for peer in list(self._connections):
+            if peer.is_closed():
+                self._connections.discard(peer)
+                self._detach(peer)
+                continue
             peer.send_bundle(bundle_wrapper)
+        if self._sessions or self._client_sessions:
+            info = bundle_wrapper.get_info()
+            for sessions in (self._sessions, self._client_sessions):
+                for session in sessions.values():
+                    session.note_missed(info)
+        if not self._batching:
+            self._flush_connections()
         for callback in self._callbacks:
             callback(bundle_wrapper)
 
-    def receive(self, bundle_wrapper: Decomposition) -> bool:
+    def receive(self, bundle_wrapper: Decomposition, *, validated: bool = False) -> bool:
         """ Receive a bundle, either created locally or from a peer.
 
+            Pass validated=True only for bundles built in this process whose entries
+            have already been checked (e.g. via Container._add_entry).
+
             Returns true if the bundle is novel.
         """
-        validate_bundle(bundle_wrapper.get_builder())
+        if not validated:
+            validate_bundle(bundle_wrapper.get_builder())
         return self._store.apply_bundle(bundle_wrapper, self._on_bundle)
 
     def _on_connection_ready(self, connection: Connection) -> None:
@@ -131,34 +349,132 @@ class Relay(Server):
 
         """
         if connection in self._connections:
+            self._batching = True
             try:
                 for thing in connection.receive_objects():
                     if isinstance(thing, Decomposition):  # some data
+                        if self._installing is not None:
+                            self._deferred.append((connection, thing))
+                            continue
                         self.receive(thing)
-                        connection.send(thing.get_info().as_acknowledgement())
+                        connection.send_ack(thing.get_info())
                     elif isinstance(thing, HasMap):  # greeting message
-                        self._store.get_bundles(connection.send_bundle, peer_has=thing)
-                        self._logger.debug("sending initial sync completed flag (%s)", connection._name)
-                        sync_message = SyncMessage()
-                        sync_message.signal = SyncMessage.Signal.INITIAL_BUNDLES_SENT
-                        sent = connection.send(sync_message)
-                        self._logger.debug("sent initial sync completed flag of %d bytes (%s)", sent, connection._name)
+                        self._on_greeted(connection)
+                        connection.start_backfill(self._store)
                     elif isinstance(thing, BundleInfo):  # an ack:
-                        if thing not in self._not_acked:
-                            # self._logger.warning(f"ack {thing} not in not_acked")
-                            pass # TODO: properly track not acked bundles
-                        self._not_acked.discard(thing)
+                        pass  # already applied to the connection's in-flight window
+                    elif isinstance(thing, SyncMessage.Snapshot):  # type: ignore
+                        self._install_snapshot_part(connection, thing)
                     else:
                         raise AssertionError(f"unexpected object {thing}")
             except Finished:
                 self._connections.remove(connection)
                 self._remove_selectable(connection)
+                self._detach(connection)
+                if self._installing is connection:
+                    self._logger.warning("connection closed partway through a snapshot, discarding it")
+                    self._store.abort_snapshot()
+                    self._end_install()
                 self._logger.info(f"Connection (fileno {connection.fileno()}) disconnected.")
                 raise
+            finally:
+                self._batching = False
+                self._flush_connections()
+
+    def _on_greeted(self, connection: Connection) -> None:
+        target = self._targets.get(connection)
+        peer = self._peers.get(target) if target is not None else None
+        if peer is not None and peer.connection is connection:
+            if peer.timer is not None:
+                peer.timer.cancel()
+                peer.timer = None
+            peer.state = "connected"
+            peer.connected_at = monotonic()
+            peer.failures = 0
+            peer.last_error = None
 
-    def _conn_func(self, *_) -> SyncMessage:
+    def _install_snapshot_part(self, connection: Connection, part: SyncMessage.Snapshot) -> None:  # type: ignore
+        """ Writes a part of a snapshot the peer is sending in place of its bundles.
+
+            Snapshot parts aren't signed, so they're only taken from the connection to a peer
+            this relay was told to bootstrap from, when it asked that peer for a snapshot.
+        """
+        if self._installing is not connection:
+            target = self._targets.get(connection)
+            peer = self._peers.get(target) if target is not None else None
+            if peer is None or not peer.bootstrap or peer.connection is not connection:
+                self._logger.warning("closing %s, which sent a snapshot that wasn't asked for", connection.name)
+                raise Finished()
+            try:
+                if self._installing is not None:
+                    raise ValueError("already installing a snapshot from another peer")
+                self._store.begin_snapshot()
+            except ValueError as error:
+                # the peer's tracker would think we had everything in it, so start over instead
+                self._logger.warning("can't install a snapshot from %s: %s", connection.name, error)
+                raise Finished()
+            self._installing = connection
+        if not part.complete:
+            self._store.add_snapshot_part(part.table, part.keys, part.values)
+            return
+        self._store.finish_snapshot()
+        self._logger.info("installed a snapshot with %d chains", len(self._store.get_has_map()))
+        self._on_store_replaced()
+        self._end_install()
+
+    def _on_store_replaced(self) -> None:
+        """ Called once a snapshot has been installed in place of the store's contents. """
+        for callback in self._replaced_callbacks:
+            callback()
+
+    def _end_install(self) -> None:
+        """ Applies what came from other peers while a snapshot was being installed. """
+        self._installing = None
+        deferred, self._deferred = self._deferred, []
+        for connection, decomposition in deferred:
+            self.receive(decomposition)
+            if not connection.is_closed():
+                connection.send_ack(decomposition.get_info())
+
+    def _is_expired(self, session: SyncSession) -> bool:
+        return session.detached_at is not None and monotonic() - session.detached_at > self.session_timeout
+
+    def _detach(self, connection: Connection) -> None:
+        """ Keeps the session of a closed connection around so the peer can resume it. """
+        target = self._targets.get(connection)
+        session = connection.detach_session()
+        if session is None:
+            return
+        if target is not None:
+            self._client_sessions[target] = session
+        self._prune_sessions()
+
+    def _prune_sessions(self) -> None:
+        """ Drops expired sessions, then the longest detached past max_sessions (never ones in use). """
+        for sessions in (self._sessions, self._client_sessions):
+            for key in [key for key, value in sessions.items() if self._is_expired(value)]:
+                del sessions[key]
+            excess = len(sessions) - self.max_sessions
+            if excess > 0:
+                detached = sorted((value.detached_at, key) for key, value in sessions.items()
+                                  if value.detached_at is not None)
+                for _, key in detached[:excess]:
+                    del sessions[key]
+
+    def _get_session(self, token: Optional[str]) -> Tuple[SyncSession, bool]:
+        """ Finds the detached session a connecting peer wants to resume, or starts a new one. """
+        session = self._sessions.get(token) if token else None
+        if session is not None and session.is_resumable() and not self._is_expired(session):
+            session.detached_at = None
+            return session, True
+        session = SyncSession(token_hex(16))
+        self._sessions[session.token] = session
+        self._prune_sessions()
+        return session, False
+
+    def _conn_func(self, connection: Connection) -> SyncMessage:
         """ Returns the greeting (SyncMessage) for the underlying store's chain tracker. """
-        return self._store.get_has_map().to_greeting_message()
+        return self._store.get_has_map().to_greeting_message(packed=connection.accepts_packed_greeting())
 
     def _on_listener_ready(self, listener: Listener) -> Iterable[Selectable]:
         """ Called when a listener is ready to accept a connection.
@@ -166,6 +482,7 @@ class Relay(Server):
             new socket in an SSL context, rejecting the connection upon failure.
         """
         (socket, addr) = listener.accept()
+        host, port = addr[:2] if isinstance(addr, tuple) else ("localhost", 0)  # unix sockets have no address
         context = listener.get_context()
         if context:
             try:
@@ -182,13 +499,15 @@ class Relay(Server):
 
         connection = Connection(
             socket=socket,
-            host=addr[0],
-            port=addr[1],
+            host=host,
+            port=port,
             conn_func=self._conn_func,
             auth_func=listener.get_auth_func(),
             on_ws_act=self._on_connection_ready,
+            session_func=self._get_session,
+            encoded=self._encoded,
         )
         self._connections.add(connection)
         self._add_selectable(connection)
-        self._logger.info("accepted incoming connection from %s", addr)
+        self._logger.info("accepted incoming connection from %s", addr or listener.get_unix_path())
         return [connection]
@@ -9,7 +9,7 @@ from .container import Container
 from .muid import Muid
 from .database import Database
 from .bundler import Bundler
-from .coding import SEQUENCE
+from .coding import SEQUENCE, value_repr
 from .tuples import PositionedEntry, SequenceKey
 from .utilities import generate_timestamp
 
@@ -61,7 +61,7 @@ class Sequence[T: UserValue|Container](Container):
     def dumps(self, as_of: GenericTimestamp = None) -> str:
         identifier = f"muid={self._muid!r}"
         result = f"""{self.__class__.__name__}({identifier}, contents=["""
-        stuffing = [repr(val) for val in self.values(as_of=as_of)]
+        stuffing = [value_repr(val) for val in self.values(as_of=as_of)]
         as_one_line = result + ", ".join(stuffing) + "])"
         if len(as_one_line) < 80:
             return as_one_line
@@ -2,6 +2,7 @@ from typing import Union, Set, Iterable, Optional
 from logging import getLogger
 from socket import socketpair
 from abc import ABC, abstractmethod
+from pathlib import Path
 
 from .listener import Listener
 from .looping import Selectable
@@ -69,8 +70,13 @@ class Server(Selectable):
         auth: Union[AuthFunc, str, None] = None,
         certfile: Optional[str] = None,
         keyfile: Optional[str] = None,
+        reuse_port: bool = False,
+        unix_path: Union[str, Path, None] = None,
     ) -> None:
-        """Listen for incoming connections on the given port."""
+        """Listen for incoming connections on the given port (shareable between processes with reuse_port).
+
+        With unix_path, listen on a unix domain socket at that path instead of addr and port.
+        """
         port = int(port)
         listener = Listener(
             addr=addr,
@@ -79,9 +85,14 @@ class Server(Selectable):
             certfile=certfile,
             keyfile=keyfile,
             on_ready=self._on_listener_ready,
+            reuse_port=reuse_port,
+            unix_path=unix_path,
         )
         security = "secure" if listener.get_context() else "insecure"
-        self._logger.info(f"starting {security} server listening on %r:%r", addr, port)
+        if unix_path is not None:
+            self._logger.info(f"starting {security} server listening on %s", unix_path)
+        else:
+            self._logger.info(f"starting {security} server listening on %r:%r", addr, port)
         self._listeners.add(listener)
         self._add_selectable(listener)
 
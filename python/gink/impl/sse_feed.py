@@ -0,0 +1,255 @@
+""" Contains SseFeed, which streams a database's changes to http clients as Server-Sent Events. """
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Tuple
+from datetime import datetime as DateTime
+from json import dumps
+from logging import getLogger
+
+from .builders import ChangeBuilder
+from .bundle_info import BundleInfo
+from .coding import decode_key, decode_entry_occupant, deletion, inclusion
+from .decomposition import Decomposition
+from .muid import Muid
+from .looping import call_later
+from .subscriptions import ContainerChanges, Subscription, split_changes
+if TYPE_CHECKING:
+    from .connection import Connection
+
+
+class _SliceFull(Exception):
+    pass
+
+
+def format_event_id(info: BundleInfo, offset: int) -> str:
+    """ The SSE id of an event, which browsers send back as Last-Event-ID.
+
+        A bundle changing several containers makes an event for each, so the id has the
+        offset of the event's first change in the bundle as well as the bundle's.
+    """
+    return f"{info.timestamp:x}-{info.medallion:x}-{info.chain_start:x}-{offset:x}"
+
+
+def parse_event_id(event_id: str) -> Tuple[BundleInfo, int]:
+    """ The inverse of format_event_id; raises ValueError for anything it didn't make. """
+    timestamp, medallion, chain_start, offset = (int(part, 16) for part in event_id.strip().split("-"))
+    return BundleInfo(timestamp=timestamp, medallion=medallion, chain_start=chain_start), offset
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, Muid):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, DateTime):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return list(value)
+    return str(value)
+
+
+def _describe_change(info: BundleInfo, muid: Muid, change: ChangeBuilder) -> dict:
+    described: Dict[str, Any] = {"muid": str(muid)}
+    if change.HasField("entry"):
+        entry = change.entry
+        if entry.HasField("describing"):
+            described["describing"] = str(Muid.create(info, entry.describing))
+        elif entry.HasField("pair"):
+            described["pair"] = [str(Muid.create(info, entry.pair.left)), str(Muid.create(info, entry.pair.rite))]
+        elif entry.HasField("key"):
+            described["key"] = decode_key(entry)
+        if entry.effective:
+            described["effective"] = entry.effective
+        try:
+            occupant = decode_entry_occupant(muid, entry)
+        except ValueError:
+            occupant = inclusion  # e.g. a vertex's, which says nothing but that it's there
+        if occupant is deletion:
+            described["deleted"] = True
+        elif occupant is inclusion:
+            described["included"] = True
+        elif isinstance(occupant, Muid):
+            described["pointee"] = str(occupant)
+        elif not entry.HasField("pair") or entry.HasField("value"):
+            described["value"] = occupant
+        if entry.expiry:  # type: ignore
+            described["expiry"] = entry.expiry  # type: ignore
+    elif change.HasField("movement"):
+        movement = change.movement
+        described["movement"] = {"entry": str(Muid.create(info, movement.entry)), "dest": movement.dest}
+    elif change.HasField("clearance"):
+        described["clearance"] = {"purge": change.clearance.purge}  # type: ignore
+    return described
+
+
+def encode_event(event: ContainerChanges) -> bytes:
+    """ Serializes the changes a bundle makes to a container as one text/event-stream message. """
+    info = event.info
+    payload = {
+        "container": str(event.container),
+        "timestamp": info.timestamp,
+        "medallion": info.medallion,
+        "comment": info.comment,
+        "changes": [_describe_change(info, muid, change) for muid, change in event.changes],
+    }
+    data = dumps(payload, default=_to_json, separators=(",", ":"))
+    return f"id: {format_event_id(info, event.changes[0][0].offset)}\nevent: change\ndata: {data}\n\n".encode()
+
+
+class SseFeed:
+    """ Serves the changes made to a database as text/event-stream, for http clients to follow.
+
+        Meant for read-only consumers (dashboards and the like) that would otherwise need to be
+        websocket peers holding their own stores.  Requests for path get the changes to every
+        container and those for path/<muid> the changes to that container, each event being the
+        JSON of a bundle's changes to one container (see encode_event).  Give it to a
+        WsgiListener (or a Connection) as sse_feed to answer those paths.
+
+        Each event is serialized once however many clients it goes to, and the same bytes are
+        queued on each of their connections; a client whose queue gets past max_queued_bytes
+        is disconnected rather than buffered for, and can reconnect with Last-Event-ID (as
+        browsers' EventSource does by itself) to pick up where it left off.  That replays the
+        rest of the bundle named and the bundles after it from the store, in order, a slice at
+        a time as the client takes them.  Bundles are ordered by timestamp, so ones from peers that show up later
+        with earlier timestamps than what a client has seen won't be replayed to it.
+    """
+
+    def __init__(
+            self,
+            database,
+            path: str = "/changes",
+            *,
+            max_queued_bytes: int = 2**22,
+            replay_slice_bytes: int = 2**18):
+        self._database = database
+        self._path = "/" + path.strip("/")
+        self._max_queued_bytes = max_queued_bytes
+        self._replay_slice_bytes = replay_slice_bytes
+        self._logger = getLogger(self.__class__.__name__)
+        self._by_container: Dict[Optional[Muid], Set["Connection"]] = {}
+        self._watching: Dict["Connection", Optional[Muid]] = {}
+        self._replaying: Set["Connection"] = set()
+        self._subscription: Optional[Subscription] = None
+        self._events_encoded = 0
+        self._events_sent = 0
+
+    def handles(self, path: str) -> bool:
+        """ True if path is one the feed answers (whether or not it names a container). """
+        return path == self._path or path.startswith(self._path + "/")
+
+    def get_container(self, path: str) -> Optional[Muid]:
+        """ The container a request for path wants changes to (None for all); ValueError if it's not one. """
+        rest = path[len(self._path):].strip("/")
+        if not rest:
+            return None
+        if rest.count("-") != 2:
+            raise ValueError(f"not a muid: {rest!r}")
+        return Muid.from_str(rest)
+
+    def get_stats(self) -> dict:
+        return {
+            "clients": len(self._watching),
+            "replaying": len(self._replaying),
+            "events_encoded": self._events_encoded,
+            "events_sent": self._events_sent,
+        }
+
+    def attach(self, connection: "Connection", container: Optional[Muid], last_event_id: Optional[str] = None) -> None:
+        """ Starts sending the changes to container (or all) to a connection that's sent the stream's header. """
+        self._watching[connection] = container
+        self._by_container.setdefault(container, set()).add(connection)
+        if self._subscription is None:
+            self._subscription = self._database.subscribe(None, self._on_changes)
+        if last_event_id:
+            try:
+                after, offset = parse_event_id(last_event_id)
+            except ValueError:
+                self._logger.warning("ignoring a malformed Last-Event-ID: %r", last_event_id[:100])
+                return
+            self._replaying.add(connection)
+            connection.set_event_replay(self._make_replay(connection, container, after, offset))
+
+    def detach(self, connection: "Connection") -> None:
+        """ Stops sending to the connection (called when it closes). """
+        if connection not in self._watching:
+            return
+        container = self._watching.pop(connection)
+        self._replaying.discard(connection)
+        connections = self._by_container.get(container)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._by_container[container]
+        if not self._watching and self._subscription is not None:
+            self._subscription.cancel()
+            self._subscription = None
+
+    def _on_changes(self, event: ContainerChanges) -> None:
+        connections = self._by_container.get(event.container, set()) | self._by_container.get(None, set())
+        connections -= self._replaying  # they'll get it from the store
+        if not connections:
+            return
+        data = encode_event(event)
+        self._events_encoded += 1
+        for connection in connections:
+            self._send(connection, data)
+
+    def _send(self, connection: "Connection", data: bytes) -> bool:
+        """ Queues data to go to connection, dropping it if it has fallen too far behind. """
+        try:
+            connection.send_event(data)
+        except OSError as error:
+            self._logger.warning("could not send to an event stream client: %s", error)
+            self._drop(connection)
+            return False
+        self._events_sent += 1
+        if connection.get_stats()["queued_bytes"] > self._max_queued_bytes:
+            self._logger.warning("disconnecting an event stream client that has fallen behind")
+            self._drop(connection)
+            return False
+        return True
+
+    def _drop(self, connection: "Connection") -> None:
+        self.detach(connection)
+        call_later(0, connection.close)  # so the loop deregisters it after running timers
+
+    def _make_replay(self, connection: "Connection", container: Optional[Muid], after: BundleInfo, offset: int):
+        """ Makes what the connection calls (as it has room) to send its next slice of the replay.
+
+            The replay starts with the events of bundle after past offset, which the client
+            may not have got if it was dropped partway through the bundle.
+        """
+        store = self._database.get_store()
+        position = [BundleInfo(timestamp=after.timestamp - 1)]  # sorts before after
+
+        def replay_slice() -> bool:
+            """ Returns True once the replay has caught up with the store. """
+            queued = [0]
+
+            def callback(decomposition: Decomposition):
+                info = decomposition.get_info()
+                if info < after:
+                    return  # shares a timestamp with after, but was sent before it
+                position[0] = info
+                grouped = split_changes(info, store.get_changes(decomposition))
+                for muid, found in grouped.items():
+                    if info == after and found[0][0].offset <= offset:
+                        continue
+                    if container is None or muid == container:
+                        data = encode_event(ContainerChanges(muid, info, tuple(found)))
+                        if not self._send(connection, data):
+                            raise _SliceFull()
+                        queued[0] += len(data)
+                if queued[0] >= self._replay_slice_bytes:
+                    raise _SliceFull()
+
+            if connection not in self._watching:
+                return True
+            try:
+                store.get_bundles(callback, start_after=position[0])
+            except _SliceFull:
+                return connection not in self._watching
+            except ValueError as exception:
+                self._logger.warning("can't replay missed changes: %s", exception)
+            self._replaying.discard(connection)
+            return True
+
+        return replay_slice
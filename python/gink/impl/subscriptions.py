@@ -0,0 +1,196 @@
+""" Contains the Subscriptions index behind Database.subscribe, and the events it delivers. """
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .builders import ChangeBuilder
+from .bundle_info import BundleInfo
+from .decomposition import Decomposition
+from .muid import Muid
+if TYPE_CHECKING:
+    from .addressable import Addressable
+
+
+class ContainerChanges(NamedTuple):
+    """ The changes (entries, movements and clearances) one bundle makes to one container. """
+    container: Muid
+    info: BundleInfo
+    changes: Tuple[Tuple[Muid, ChangeBuilder], ...]  # (address of the change, change) in bundle order
+
+
+def split_changes(info: BundleInfo, changes: Iterable[ChangeBuilder]) -> Dict[Muid, List[Tuple[Muid, ChangeBuilder]]]:
+    """ Groups the entries, movements and clearances in a bundle by the container they change. """
+    grouped: Dict[Muid, List[Tuple[Muid, ChangeBuilder]]] = {}
+    for offset, change in enumerate(changes, start=1):
+        if change.HasField("entry"):
+            container = Muid.create(info, change.entry.container)
+        elif change.HasField("movement"):
+            container = Muid.create(info, change.movement.container)
+        elif change.HasField("clearance"):
+            container = Muid.create(info, change.clearance.container)  # type: ignore
+        else:
+            continue
+        grouped.setdefault(container, []).append((Muid(info.timestamp, info.medallion, offset), change))
+    return grouped
+
+
+class Subscription:
+    """ Returned by Database.subscribe; call cancel() to stop getting events. """
+    __slots__ = ["container", "callback", "include_descendants", "on_replaced", "cancelled", "_subscriptions"]
+
+    def __init__(
+            self,
+            container: Optional[Muid],
+            callback: Callable[[ContainerChanges], None],
+            include_descendants: bool,
+            subscriptions: "Subscriptions",
+            on_replaced: Optional[Callable[[], None]] = None):
+        self.container = container
+        self.callback = callback
+        self.include_descendants = include_descendants
+        self.on_replaced = on_replaced
+        self.cancelled = False
+        self._subscriptions = subscriptions
+
+    def cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self._subscriptions.remove(self)
+
+    def __repr__(self) -> str:
+        return f"Subscription({self.container!r}, include_descendants={self.include_descendants})"
+
+
+class Subscriptions:
+    """ Routes the changes in each bundle to the subscribers of the containers they change.
+
+        Subscribers are indexed by container muid, so a bundle costs a dict lookup per change
+        however many subscriptions there are.  For subscriptions that include descendants,
+        the containers nested in the subscribed one (as values in directories, sequences,
+        pair maps and boxes) are found when subscribing, and containers put into the tree
+        afterwards are added as their entries come in.  A container stays counted as a
+        descendant once seen, even if it's later removed from the tree.
+    """
+
+    def __init__(self, database):
+        self._database = database
+        self._by_container: Dict[Optional[Muid], List[Subscription]] = {}
+        self._roots_of: Dict[Muid, Set[Muid]] = {}  # descendant -> subscribed containers it's under
+
+    def __len__(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._by_container.values())
+
+    def subscribe(
+            self,
+            container: Union["Addressable", Muid, None],
+            callback: Callable[[ContainerChanges], None],
+            include_descendants: bool = False,
+            on_replaced: Optional[Callable[[], None]] = None) -> Subscription:
+        """ With container None, the subscription gets the changes to every container. """
+        muid = None if container is None else container.get_muid()
+        subscription = Subscription(muid, callback, include_descendants, self, on_replaced)
+        already_root = self._is_root(muid)
+        self._by_container.setdefault(muid, []).append(subscription)
+        if include_descendants and muid is not None and not already_root:
+            self._adopt(muid, {muid})
+        return subscription
+
+    def remove(self, subscription: Subscription) -> None:
+        muid = subscription.container
+        subscriptions = self._by_container.get(muid, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if not subscriptions:
+            self._by_container.pop(muid, None)
+        if subscription.include_descendants and muid is not None and not self._is_root(muid):
+            for descendant, roots in list(self._roots_of.items()):
+                roots.discard(muid)
+                if not roots:
+                    del self._roots_of[descendant]
+
+    def _is_root(self, muid: Optional[Muid]) -> bool:
+        return any(subscription.include_descendants for subscription in self._by_container.get(muid, ()))
+
+    def _get_roots(self, muid: Muid) -> Set[Muid]:
+        """ The subscribed-with-descendants containers that muid is in (or is). """
+        roots = set(self._roots_of.get(muid, ()))
+        if self._is_root(muid):
+            roots.add(muid)
+        return roots
+
+    def _mark(self, child: Muid, roots: Set[Muid]) -> Set[Muid]:
+        """ Records child as under roots, returning the ones it wasn't already known to be under. """
+        known = self._roots_of.setdefault(child, set())
+        novel = roots - known - {child}
+        known.update(novel)
+        if not known:
+            del self._roots_of[child]
+        return novel
+
+    def _adopt(self, muid: Muid, roots: Set[Muid]) -> None:
+        """ Notes that what's currently nested in muid is under each of roots. """
+        pending = [(muid, roots)]
+        while pending:
+            parent, parent_roots = pending.pop()
+            for child in self._get_child_muids(parent):
+                novel = self._mark(child, parent_roots)
+                if novel:
+                    pending.append((child, novel))
+
+    def _get_child_muids(self, muid: Muid) -> Iterable[Muid]:
+        from .get_container import get_container
+        from .container import Container
+        from .directory import Directory
+        from .sequence import Sequence
+        from .pair_map import PairMap
+        from .box import Box
+        try:
+            container = get_container(muid=muid, database=self._database)
+        except ValueError:
+            return ()  # not defined (yet)
+        values: Iterable
+        if isinstance(container, (Directory, Sequence)):
+            values = container.values()
+        elif isinstance(container, PairMap):
+            values = (value for _, value in container.items())
+        elif isinstance(container, Box):
+            values = (container.get(),)
+        else:
+            return ()
+        return [value.get_muid() for value in values if isinstance(value, Container)]
+
+    def on_replaced(self) -> None:
+        """ Finds the descendants again and tells the subscribers, after a snapshot replaced the store. """
+        self._roots_of.clear()
+        subscriptions = [subscription for listed in self._by_container.values() for subscription in listed]
+        for muid in {subscription.container for subscription in subscriptions if subscription.include_descendants}:
+            if muid is not None:
+                self._adopt(muid, {muid})
+        for subscription in subscriptions:
+            if subscription.on_replaced is not None and not subscription.cancelled:
+                subscription.on_replaced()
+
+    def on_bundle(self, decomposition: Decomposition) -> None:
+        """ Groups the bundle's changes by container (once) and hands them to the subscribers. """
+        info = decomposition.get_info()
+        grouped = split_changes(info, self._database.get_store().get_changes(decomposition))
+        adopted = [
+            (container, Muid.create(info, change.entry.pointee))
+            for container, found in grouped.items()
+            for _, change in found if change.HasField("entry") and change.entry.HasField("pointee")]
+        for parent, child in adopted:
+            roots = self._get_roots(parent)
+            novel = self._mark(child, roots) if roots else None
+            if novel:
+                self._adopt(child, novel)
+        everything = self._by_container.get(None, ())
+        for container, found in grouped.items():
+            event: Optional[ContainerChanges] = None
+            for subscription in list(self._by_container.get(container, ())) + list(everything):
+                if subscription.cancelled:
+                    continue
+                event = event or ContainerChanges(container, info, tuple(found))
+                subscription.callback(event)
+            for root in list(self._roots_of.get(container, ())):
+                for subscription in list(self._by_container.get(root, ())):
+                    if subscription.include_descendants and not subscription.cancelled:
+                        event = event or ContainerChanges(container, info, tuple(found))
+                        subscription.callback(event)
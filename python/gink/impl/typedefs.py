@@ -13,7 +13,7 @@ from typing import (
     Any,
     Type,
 )
-from collections.abc import Mapping
+from collections.abc import Mapping, Buffer
 from datetime import datetime, timedelta, date
 from abc import ABC, abstractmethod
 
@@ -26,7 +26,7 @@ Offset = NewType('Offset', int)
 GenericTimestamp = Union[datetime, timedelta, date, int, float, str, None]
 Destination = GenericTimestamp
 UserKey = Union[str, int, bytes]
-UserValue = Union[str, int, float, datetime, bytes, bool, None, dict, tuple, list]
+UserValue = Union[str, int, float, datetime, bytes, bool, None, dict, tuple, list, Buffer]  # Buffer: numeric arrays
 EPOCH = 0
 Limit = Union[MuTimestamp, float]
 T = TypeVar('T')
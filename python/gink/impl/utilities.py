@@ -220,106 +220,78 @@ def dedent(val: bytes) -> bytes:
 
 
 user_key_fields = ["number", "octets", "characters"]
-user_value_fields = ["integer", "floating", "characters", "special", "timestamp", "document", "tuple", "octets"]
+user_value_fields = ["integer", "floating", "characters", "special", "timestamp", "document", "tuple", "octets",
+                     "array", "blob"]
+
+
+class _EntryRule(NamedTuple):
+    """ What an entry of a particular behavior may contain; None means anything is accepted.
+
+        subjects: names from the entry's "subject" oneof (None when unset, "" for an empty key)
+        occupants: value field names, "pointee", "deletion", or None when nothing is contained
+        container: whether the entry must reference a container
+        check: an additional test of the entry, if any
+    """
+    subjects: Optional[FrozenSet[Optional[str]]]
+    occupants: Optional[FrozenSet[Optional[str]]]
+    container: bool = False
+    check: Optional[Callable[[EntryBuilder], bool]] = None
+
+
+_NOT_KEYED = frozenset({None, "pair", "describing"})
+_VALUES = frozenset(user_value_fields)
+_HOLDS = _VALUES | {"pointee"}
+_HOLDS_OR_DELETES = _HOLDS | {"deletion"}
+_NO_VALUE = frozenset({None, "pointee", "deletion"})
+
+_entry_rules: Dict[int, _EntryRule] = {
+    Behavior.BOX: _EntryRule(_NOT_KEYED, _HOLDS),
+    Behavior.SEQUENCE: _EntryRule(_NOT_KEYED, _HOLDS),
+    Behavior.PAIR_MAP: _EntryRule(frozenset({"pair"}), _HOLDS_OR_DELETES),
+    Behavior.DIRECTORY: _EntryRule(frozenset({"key"}), _HOLDS_OR_DELETES),
+    Behavior.KEY_SET: _EntryRule(frozenset({"key"}), _NO_VALUE),
+    Behavior.GROUP: _EntryRule(frozenset({"describing"}), _NO_VALUE),
+    Behavior.PAIR_SET: _EntryRule(frozenset({"pair"}), _NO_VALUE),
+    Behavior.PROPERTY: _EntryRule(frozenset({"describing"}), _HOLDS_OR_DELETES),
+    Behavior.BRAID: _EntryRule(frozenset({"describing"}), frozenset({"integer", "floating", "deletion"})),
+    Behavior.VERTEX: _EntryRule(None, None, container=True),
+    Behavior.EDGE_TYPE: _EntryRule(frozenset({"pair"}), None),
+    Behavior.ACCUMULATOR: _EntryRule(
+        None, frozenset({"integer"}), check=lambda entry: fullmatch(r"-?\d+", entry.value.integer) is not None),
+    Behavior.BLOB_CHUNKS: _EntryRule(frozenset({"key"}), frozenset({"octets"})),
+}
+
+
+def validate_entry(entry: EntryBuilder) -> None:
+    """ Ensures an entry is valid for its behavior. Throws a ValueError if not. """
+    rule = _entry_rules.get(entry.behavior)
+    if rule is None:
+        raise ValueError(f"unknown behavior: {entry.behavior}")
+    if rule.subjects is not None:
+        subject = entry.WhichOneof("subject")
+        if subject == "key" and entry.key.WhichOneof("key") is None:
+            subject = ""
+        if subject not in rule.subjects:
+            raise ValueError("Bundle validation failed.")
+    if rule.occupants is not None:
+        occupant = entry.WhichOneof("contains")
+        if occupant == "value":
+            occupant = entry.value.WhichOneof("value") or "value"
+        elif occupant == "deletion" and not entry.deletion:
+            occupant = None
+        if occupant not in rule.occupants:
+            raise ValueError("Bundle validation failed.")
+    if rule.container and not entry.HasField("container"):
+        raise ValueError("Bundle validation failed.")
+    if rule.check is not None and not rule.check(entry):
+        raise ValueError("Bundle validation failed.")
+
 
 def validate_bundle(bundle_builder: BundleBuilder) -> None:
     """ Ensures entries in the bundle are valid for the container behavior. Throws a ValueError if not. """
-    changes = bundle_builder.changes
-    for change in changes:
-        assert isinstance(change, ChangeBuilder)
-        if change.HasField("entry"):
-            assert isinstance(change.entry, EntryBuilder)
-            # Value is a oneof field, so the proto will have already ensured this is only one item.
-            value_field_name: str = ""
-            key_field_name: str = ""
-            try:
-                value_field_name = change.entry.value.ListFields()[0][0].name
-            except IndexError:
-                pass
-            try:
-                key_field_name = change.entry.key.ListFields()[0][0].name
-            except IndexError:
-                pass
-
-            if change.entry.behavior == Behavior.BOX:
-                if change.entry.HasField("key"):
-                    raise ValueError("Bundle validation failed.")
-
-                if not ((value_field_name in user_value_fields) or \
-                change.entry.HasField("pointee")):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.SEQUENCE:
-                if change.entry.HasField("key"):
-                    raise ValueError("Bundle validation failed.")
-                if not ((value_field_name in user_value_fields) or \
-                change.entry.HasField("pointee")):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.PAIR_MAP:
-                if not change.entry.HasField("pair"):
-                    raise ValueError("Bundle validation failed.")
-                if not ((value_field_name in user_value_fields) or \
-                change.entry.HasField("pointee") or \
-                change.entry.deletion):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.DIRECTORY:
-                if not key_field_name in user_key_fields:
-                    raise ValueError("Bundle validation failed.")
-                if not ((value_field_name in user_value_fields) or \
-                change.entry.HasField("pointee") or \
-                change.entry.deletion):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.KEY_SET:
-                if not key_field_name in user_key_fields:
-                    raise ValueError("Bundle validation failed.")
-                if change.entry.HasField("value"):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.GROUP:
-                if not change.entry.HasField("describing"):
-                    raise ValueError("Bundle validation failed.")
-                if change.entry.HasField("value"):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.PAIR_SET:
-                if not change.entry.HasField("pair"):
-                    raise ValueError("Bundle validation failed.")
-                if change.entry.HasField("value"):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.PROPERTY:
-                if not change.entry.HasField("describing"):
-                    raise ValueError("Bundle validation failed.")
-                if not ((value_field_name in user_value_fields) or \
-                change.entry.HasField("pointee") or \
-                change.entry.deletion):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.BRAID:
-                if not change.entry.HasField("describing"):
-                    raise ValueError("Bundle validation failed.")
-                if not (value_field_name in ("integer", "floating") or \
-                change.entry.deletion):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.VERTEX:
-                if not change.entry.HasField("container"):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.EDGE_TYPE:
-                if not change.entry.HasField("pair"):
-                    raise ValueError("Bundle validation failed.")
-
-            elif change.entry.behavior == Behavior.ACCUMULATOR:
-                if not (change.entry.HasField("value") and change.entry.value.HasField("integer")):
-                    raise ValueError("Bundle validation failed.")
-                if not fullmatch(r"-?\d+", change.entry.value.integer):
-                    raise ValueError("Bundle validation failed.")
-            else:
-                raise ValueError(f"unknown behavior: {change.entry.behavior}")
+    for change in bundle_builder.changes:
+        if change.WhichOneof("obj") == "entry":
+            validate_entry(change.entry)
 
 
 def is_needed(new_info: BundleInfo, old_info: Optional[BundleInfo]) -> bool:
@@ -400,12 +372,13 @@ def combine(
     signed = signing_key.sign(serialized)
     return signed
 
-def summarize(decomposition: Decomposition) -> Optional[str]:
+def summarize(decomposition: Decomposition, changes: Optional[Sequence[ChangeBuilder]] = None) -> Optional[str]:
+    """ Describes a bundle; pass changes when they had to be decrypted (see AbstractStore.get_changes). """
     from .get_container import container_classes
     from .builders import ContainerBuilder
     from .coding import decode_key
-    bundle_builder = decomposition.get_builder()
-    changes = bundle_builder.changes
+    if changes is None:
+        changes = decomposition.get_builder().changes
     if len(changes) > 1:
         return "<multiple changes>"
     if len(changes) == 0:
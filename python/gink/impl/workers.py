@@ -0,0 +1,63 @@
+""" Contains fork_workers, used to run several relay processes that share one store file.
+
+    Each worker opens the store itself after the fork (LMDB environments mustn't be carried
+    across a fork) and listens on the same port with SO_REUSEPORT, so the kernel spreads
+    incoming connections between them.  Bundles one worker writes reach the other workers'
+    peers through the store watcher, which makes each Relay refresh() and fan them out.
+"""
+from os import fork, wait, kill, WIFEXITED, WEXITSTATUS, WTERMSIG
+from signal import signal, SIGTERM, SIGINT, SIG_IGN, SIG_DFL
+from logging import getLogger
+from typing import Optional, Dict, Tuple
+
+_logger = getLogger(__name__)
+
+
+def fork_workers(count: int) -> Tuple[Optional[int], int]:
+    """ Forks count worker processes, returning (worker index, exit status).
+
+        In each worker this returns the worker's index (0 to count-1) and 0.  In the parent it
+        waits for all the workers to exit, passing SIGTERM along to them, then returns None and
+        the status the parent should exit with: 0 if every worker exited cleanly (or was
+        terminated), otherwise the highest worker exit status (128 + signal for ones killed).
+        (SIGINT from a terminal already goes to the whole process group, so it's ignored here.)
+    """
+    if count < 1:
+        raise ValueError("need at least one worker")
+    children: Dict[int, int] = {}
+    for index in range(count):
+        pid = fork()
+        if pid == 0:
+            return index, 0
+        children[pid] = index
+    _logger.info("started %d workers: %s", count, sorted(children))
+
+    def forward(signum, _):
+        for child in children:
+            try:
+                kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    previous_term = signal(SIGTERM, forward)
+    previous_int = signal(SIGINT, SIG_IGN)
+    exit_status = 0
+    try:
+        while children:
+            try:
+                pid, status = wait()
+            except ChildProcessError:
+                break
+            worker: Optional[int] = children.pop(pid, None)
+            if WIFEXITED(status):
+                _logger.info("worker %s (pid %d) exited with status %d", worker, pid, WEXITSTATUS(status))
+                exit_status = max(exit_status, WEXITSTATUS(status))
+            elif WTERMSIG(status) == SIGTERM:
+                _logger.info("worker %s (pid %d) terminated", worker, pid)
+            else:
+                _logger.warning("worker %s (pid %d) killed by signal %d", worker, pid, WTERMSIG(status))
+                exit_status = max(exit_status, 128 + WTERMSIG(status))
+    finally:
+        signal(SIGTERM, previous_term or SIG_DFL)
+        signal(SIGINT, previous_int or SIG_DFL)
+    return None, exit_status
@@ -5,10 +5,12 @@ The point of this class is to integrate within the Database select loop.
 
 from socket import socket as Socket, SOL_SOCKET, SO_REUSEADDR, AF_INET, SOCK_STREAM
 from logging import getLogger
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 from .connection import Connection
 from .looping import Selectable
+from .wsgi_workers import WsgiWorkers
+from .sse_feed import SseFeed
 
 
 class WsgiListener(Selectable):
@@ -16,8 +18,20 @@ class WsgiListener(Selectable):
     socket_type = SOCK_STREAM
     request_queue_size = 1024
 
-    def __init__(self, app, ip_addr: str = "", port: int = 8081):
+    def __init__(
+            self,
+            app,
+            ip_addr: str = "",
+            port: int = 8081,
+            threads: int = 0,
+            sse_feed: Optional[SseFeed] = None):
+        """ With threads, requests are handled on a pool of that many threads instead of in the loop.
+
+            With an sse_feed, requests for its paths get a stream of changes (and app can be None).
+        """
         self._app = app
+        self._sse_feed = sse_feed
+        self._workers: Optional[WsgiWorkers] = WsgiWorkers(threads) if threads else None
         self._socket = Socket(self.address_family, self.socket_type)
         self._fd = self._socket.fileno()
         self._logger = getLogger(self.__class__.__name__)
@@ -33,6 +47,10 @@ class WsgiListener(Selectable):
     def fileno(self) -> int:
         return self._fd
 
+    def get_selectables(self) -> Iterable[Selectable]:
+        """ The worker pool (if any), which the loop needs to watch to send responses. """
+        return [self._workers] if self._workers else []
+
     def on_ready(self) -> Iterable[Connection]:
         """ Called when the wsgi server receives a connection.
             Returns an iterable with a single new Connection object.
@@ -41,11 +59,15 @@ class WsgiListener(Selectable):
         yield Connection(
             wsgi_func=self._app,
             socket=socket,
-            port=self._server_port)
+            port=self._server_port,
+            wsgi_workers=self._workers,
+            sse_feed=self._sse_feed)
 
     def close(self):
         """ Close the socket for this server. """
         self._socket.close()
+        if self._workers:
+            self._workers.close()
         self._closed = True
 
     def is_closed(self) -> bool:
@@ -0,0 +1,103 @@
+"""
+WsgiWorkers runs WSGI applications on a bounded thread pool, so a slow request doesn't hold
+up the select loop (and with it websocket sync for every peer).
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from logging import getLogger
+from socket import socketpair
+from typing import Callable, Deque, Iterable, List, Tuple
+
+from .typedefs import Selectable
+
+# what a worker hands back to the loop: (status, headers, body chunks)
+WsgiResponse = Tuple[str, List[Tuple[str, str]], List[bytes]]
+
+
+class WsgiWorkers(Selectable):
+    """ A pool of threads that call a WSGI application, handing each response back to the loop.
+
+        The application is called with its whole response collected (including iterating over the
+        result) on a worker, then the done callback runs on the loop's thread when it selects this
+        object, so connections are only ever written to from the loop.  Since requests run
+        concurrently the application must be thread safe; reading a Database backed by an
+        LmdbStore is, as each read runs in its own read-only transaction (a consistent snapshot).
+    """
+
+    def __init__(self, max_workers: int = 4):
+        if max_workers < 1:
+            raise ValueError("need at least one worker")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gink-wsgi")
+        self._max_workers = max_workers
+        self._wake_receive, self._wake_send = socketpair()
+        self._wake_receive.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._done: Deque[Tuple[Callable[[Future], None], Future]] = deque()
+        self._logger = getLogger(self.__class__.__name__)
+        self._closed = False
+
+    def get_max_workers(self) -> int:
+        return self._max_workers
+
+    def submit(self, app: Callable, environ: dict, on_done: Callable[[Future], None]) -> Future:
+        """ Calls app(environ, start_response) on a worker; on_done gets the future (of a WsgiResponse) on the loop. """
+        future = self._executor.submit(self._call, app, environ)
+        future.add_done_callback(lambda _: self._finished(on_done, future))
+        return future
+
+    @staticmethod
+    def _call(app: Callable, environ: dict) -> WsgiResponse:
+        started: List = []
+        chunks: List[bytes] = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            if exc_info and chunks:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [status, headers]
+            return chunks.append
+
+        result: Iterable[bytes] = app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, "close"):
+                getattr(result, "close")()
+        if not started:
+            raise ValueError("application didn't call start_response")
+        return started[0], started[1], chunks
+
+    def _finished(self, on_done: Callable[[Future], None], future: Future) -> None:
+        """ Called on the worker thread: queues the callback and wakes the loop. """
+        self._done.append((on_done, future))
+        try:
+            self._wake_send.send(b"1")
+        except (BlockingIOError, OSError):
+            pass  # the socket is full of wake-ups (so the loop will get to it), or we're closed
+
+    def fileno(self) -> int:
+        return self._wake_receive.fileno()
+
+    def on_ready(self) -> Iterable[Selectable]:
+        try:
+            while self._wake_receive.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._done:
+            on_done, future = self._done.popleft()
+            try:
+                on_done(future)
+            except Exception:
+                self._logger.exception("problem finishing wsgi response")
+        return ()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._wake_receive.close()
+        self._wake_send.close()
+
+    def is_closed(self) -> bool:
+        return self._closed
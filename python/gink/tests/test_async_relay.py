@@ -0,0 +1,133 @@
+""" tests for syncing through asyncio with AsyncRelay """
+from asyncio import run, sleep, wait_for, to_thread
+from threading import current_thread
+from contextlib import closing
+from typing import Any
+
+from pytest import raises
+
+from ..impl.async_relay import AsyncRelay
+from ..impl.database import Database
+from ..impl.directory import Directory
+from ..impl.lmdb_store import LmdbStore
+from ..impl.memory_store import MemoryStore
+from ..impl.looping import loop
+
+
+async def _eventually(check, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if check():
+            return
+        await sleep(0.01)
+    assert check()
+
+
+def test_async_relays_sync():
+    """ Two AsyncRelays exchange history on connect, then stream new bundles both ways. """
+    async def scenario(server_db: Database, client_db: Database):
+        server_root: Directory[str, Any] = Directory(root=True, database=server_db)
+        client_root: Directory[str, Any] = Directory(root=True, database=client_db)
+        server_root.set("from server", 1)
+        client_root.set("from client", 2)
+        server_relay = AsyncRelay(server_db)
+        client_relay = AsyncRelay(client_db)
+        try:
+            server = await server_relay.start_listening(addr="127.0.0.1", port=0)
+            port = server.sockets[0].getsockname()[1]
+            connection = await client_relay.connect_to(f"ws://127.0.0.1:{port}")
+            await wait_for(connection.initial_bundles_received.wait(), 2)
+            await _eventually(lambda: server_root.get("from client") == 2)
+            assert client_root.get("from server") == 1
+            client_root.set("live", "update")
+            await _eventually(lambda: server_root.get("live") == "update")
+            server_root.set("live", "reply")
+            await _eventually(lambda: client_root.get("live") == "reply")
+            assert len(server_relay.get_connections()) == 1
+        finally:
+            client_relay.close()
+            server_relay.close()
+            await sleep(0.01)
+
+    for server_store, client_store in [(LmdbStore(), MemoryStore()), (MemoryStore(), LmdbStore())]:
+        with closing(server_store), closing(client_store):
+            run(scenario(Database(server_store), Database(client_store)))
+
+
+def test_connect_to_rejected():
+    """ connect_to raises, rather than waiting forever, when the server turns the connection down. """
+    async def scenario(server_db: Database, client_db: Database):
+        server_relay = AsyncRelay(server_db)
+        client_relay = AsyncRelay(client_db)
+        try:
+            server = await server_relay.start_listening(addr="127.0.0.1", port=0, auth=lambda _: 0)
+            port = server.sockets[0].getsockname()[1]
+            with raises(ConnectionError):
+                await wait_for(client_relay.connect_to(f"ws://127.0.0.1:{port}"), 2)
+            assert not client_relay.get_connections()
+        finally:
+            client_relay.close()
+            server_relay.close()
+            await sleep(0.01)
+
+    with closing(MemoryStore()) as server_store, closing(MemoryStore()) as client_store:
+        run(scenario(Database(server_store), Database(client_store)))
+
+
+def test_async_relay_with_looped_database():
+    """ A Database driven by looping.loop can sync with an AsyncRelay. """
+    async def scenario(server_db: Database, client_db: Database):
+        server_root: Directory[str, str] = Directory(root=True, database=server_db)
+        server_root.set("greeting", "hello")
+        client_root: Directory[str, str] = Directory(root=True, database=client_db)
+        client_root.set("reply", "hi")
+        async_relay = AsyncRelay(server_db)
+        try:
+            server = await async_relay.start_listening(addr="127.0.0.1", port=0)
+            port = server.sockets[0].getsockname()[1]
+            client_db.connect_to(f"ws://127.0.0.1:{port}")
+            await to_thread(loop, client_db, until=0.5)
+            assert client_root.get("greeting") == "hello"
+            assert server_root.get("reply") == "hi"
+        finally:
+            async_relay.close()
+            await sleep(0.01)
+
+    with closing(LmdbStore()) as server_store, closing(MemoryStore()) as client_store:
+        run(scenario(Database(server_store), Database(client_store)))
+
+
+def test_picks_up_writes_from_other_processes(tmp_path):
+    """ Bundles written to the file by another store get sent on, with callbacks run on the loop. """
+    async def scenario(path):
+        database = Database(LmdbStore(path))
+        async_relay = AsyncRelay(database)
+        readable = []
+        on_store_readable = async_relay._on_store_readable
+
+        def counting():
+            readable.append(1)
+            on_store_readable()
+
+        async_relay._on_store_readable = counting  # type: ignore
+        threads = []
+        async_relay.add_callback(lambda _: threads.append(current_thread()))
+        try:
+            source = Database(MemoryStore())
+            bundles: list = []
+            source.add_callback(bundles.append)
+            Directory(root=True, database=source).set("first", 1)
+            for bundle in bundles:
+                assert await async_relay.receive(bundle)  # applied on the writer thread
+            with closing(LmdbStore(path)) as other_store:
+                Directory(root=True, database=Database(other_store)).set("elsewhere", 1)
+            await _eventually(lambda: len(threads) > len(bundles))
+            await sleep(0.2)
+            assert set(threads) == {current_thread()}
+            assert len(readable) < 5, len(readable)  # not once per loop turn while the refresh runs
+            assert Directory(root=True, database=database).get("elsewhere") == 1
+        finally:
+            async_relay.close()
+            database.close()
+            await sleep(0.01)
+
+    run(scenario(tmp_path / "shared.gink"))
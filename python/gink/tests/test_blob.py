@@ -0,0 +1,81 @@
+""" tests for chunked blob storage """
+from contextlib import closing
+from io import SEEK_END, StringIO
+from os import urandom
+
+from ..impl.blob import Blob, BlobWriter, CHUNKS, put_chunks
+from ..impl.builders import Behavior
+from ..impl.directory import Directory
+from ..impl.memory_store import MemoryStore
+from ..impl.lmdb_store import LmdbStore
+from ..impl.database import Database
+
+
+def test_write_read_round_trip():
+    """ Writes a blob in uneven pieces and reads it back, whole and streaming. """
+    for store in [LmdbStore(), MemoryStore()]:
+        with closing(store):
+            database = Database(store=store)
+            payload = urandom(10_000)
+            with BlobWriter(database, chunk_size=1024, chunks_per_bundle=3) as writer:
+                for start in range(0, len(payload), 777):
+                    writer.write(payload[start:start + 777])
+            blob = writer.get_blob()
+            assert len(blob) == len(payload)
+            assert len(blob.digests) == 10
+
+            root = Directory(root=True, database=database)
+            root.set("big", blob)
+            found = root.get("big")
+            assert isinstance(found, Blob) and found == blob
+            assert found.read(database) == payload
+
+            reader = found.open(database)
+            assert reader.read(100) == payload[:100]
+            reader.seek(5000)
+            assert reader.read(2000) == payload[5000:7000]
+            reader.seek(-10, SEEK_END)
+            assert reader.read() == payload[-10:]
+            reader.seek(0)
+            assert reader.read() == payload
+
+
+def test_chunks_are_deduplicated():
+    """ Identical chunks are only stored once. """
+    for store in [LmdbStore(), MemoryStore()]:
+        with closing(store):
+            database = Database(store=store)
+            chunk = urandom(512)
+            with BlobWriter(database, chunk_size=512) as writer:
+                writer.write(chunk * 8)
+            assert len(set(writer.get_blob().digests)) == 1
+            before = len(store.get_bundle_infos())
+            with BlobWriter(database, chunk_size=512) as writer:
+                writer.write(chunk * 3)
+            assert len(store.get_bundle_infos()) == before
+            assert len(list(store.get_keyed_entries(CHUNKS, Behavior.BLOB_CHUNKS, -1))) == 1
+            assert writer.get_blob().read(database) == chunk * 3
+
+
+def test_dump_and_load():
+    """ A database's dump brings its blobs' contents along. """
+    for store in [LmdbStore(), MemoryStore()]:
+        with closing(store):
+            database = Database(store=store)
+            payload = urandom(3000)
+            with BlobWriter(database, chunk_size=1024) as writer:
+                writer.write(payload)
+            Directory(root=True, database=database).set("big", writer.get_blob())
+            string_io = StringIO()
+            database.dump(file=string_io)
+            dumped = string_io.getvalue()
+
+            loaded = Database(store=MemoryStore())
+            exec(dumped.replace("\n\t", ""), {"Blob": Blob, "put_chunks": put_chunks, "Directory": Directory})
+            found = Directory(root=True, database=loaded).get("big")
+            assert isinstance(found, Blob) and found == writer.get_blob()
+            assert found.read(loaded) == payload
+
+            without_blobs = StringIO()
+            Database(store=MemoryStore()).dump(file=without_blobs)
+            assert "put_chunks" not in without_blobs.getvalue()
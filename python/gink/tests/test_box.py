@@ -2,6 +2,7 @@
 """ test the box class """
 from contextlib import closing
 import time
+import pytest
 
 from ..impl.muid import Muid
 from ..impl.box import Box
@@ -10,6 +11,7 @@ from ..impl.lmdb_store import LmdbStore
 from ..impl.database import Database
 from ..impl.abstract_store import AbstractStore
 from ..impl.utilities import generate_timestamp
+from ..impl.coding import make_array
 
 def test_creation():
     """ test that I can create new boxes as well as proxies for existing ones """
@@ -148,3 +150,33 @@ def test_as_of():
             assert box1.get(as_of=-2) == "first"
             assert box1.get(as_of=-1) == "second"
             assert box1.get() == "third"
+
+
+def test_numeric_array():
+    """ Test that a box can hold a numeric array and gives back a read-only view. """
+    numpy = pytest.importorskip("numpy")
+    for store in [LmdbStore(), MemoryStore()]:
+        with closing(store):
+            database = Database(store=store)
+            box = Box(database=database)
+            frame = numpy.linspace(0.0, 1.0, 100_000)
+            box.set(frame)
+            found = box.get()
+            assert isinstance(found, numpy.ndarray)
+            assert numpy.array_equal(found, frame)
+            assert not found.flags.writeable
+
+
+def test_numeric_array_dump():
+    """ Test that a dump of a box holding an array loads back with all of the array. """
+    numpy = pytest.importorskip("numpy")
+    database = Database(store=MemoryStore())
+    box = Box(database=database)
+    frame = numpy.linspace(0.0, 1.0, 5000)
+    box.set(frame)
+    dumped = box.dumps()
+    assert "..." not in dumped
+    Database(store=MemoryStore())  # the one the dump is loaded into
+    loaded = eval(dumped, {"Box": Box, "Muid": Muid, "make_array": make_array})
+    assert loaded._database is not database
+    assert numpy.array_equal(loaded.get(), frame)
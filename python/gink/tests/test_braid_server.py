@@ -27,3 +27,42 @@ def test_happy_path():
 
     external_root2 = Directory(database=external2, root=True)
     assert external_root2["foo"] == "bar"
+    for database in (external1, external2, braid_server, relay, control_db):
+        database.close()
+
+
+def test_limits_kept_in_memory():
+    """ connections sharing a braid share its limits, which are kept up to date without store reads """
+    relay = Relay(MemoryStore())
+    control_db = Database(MemoryStore())
+    test_braid = Braid(database=control_db)
+    braid_server = BraidServer(
+        data_relay=relay, braid_func=lambda _: Braid(muid=test_braid.get_muid(), database=control_db))
+    braid_server.start_listening(port=9998)
+    external1 = Database(MemoryStore())
+    external1.connect_to(target="localhost:9998", name="external1")
+    external2 = Database(MemoryStore())
+    external2.connect_to(target="localhost:9998", name="external2")
+    loop(braid_server, external1, external2, until=0.1)
+    assert list(getattr(braid_server, "_braid_limits")) == [test_braid]
+    assert len(getattr(braid_server, "_braid_connection_map")[test_braid]) == 2
+
+    def no_reads(*_, **__):
+        raise AssertionError("fan-out shouldn't read braid limits from the store")
+
+    original_get = Braid.get
+    setattr(Braid, "get", no_reads)
+    try:
+        Directory(database=external1, root=True)["foo"] = "bar"
+        loop(braid_server, external1, external2, until=0.1)
+        assert Directory(database=external2, root=True)["foo"] == "bar"
+    finally:
+        setattr(Braid, "get", original_get)
+    [(chain, _)] = test_braid.items()
+    assert getattr(braid_server, "_braid_limits")[test_braid] == {chain: inf}
+
+    test_braid.delete(chain)  # changed outside the server: the table follows
+    assert getattr(braid_server, "_braid_limits")[test_braid] == {}
+    assert chain not in getattr(braid_server, "_chain_braids_map")
+    for database in (external1, external2, braid_server, control_db):
+        database.close()
@@ -41,3 +41,31 @@ def test_to_greeting_message():
     assert entries[1].medallion == 123
     assert entries[1].chain_start == 888
     assert entries[1].seen_through == 899
+
+
+def test_packed_greeting():
+    """ Packed greeting entries decode to the same HasMap and take less space. """
+    has_map = HasMap()
+    for i in range(100):
+        chain_start = 1_700_000_000_000_000 + i * 7_919
+        has_map.mark_as_having(BundleInfo(
+            medallion=2**48 + (i * 104_729) % 1_000_003, chain_start=chain_start, timestamp=chain_start + i))
+    full = has_map.to_greeting_message()
+    packed = has_map.to_greeting_message(packed=True)
+    assert not packed.greeting.entries and packed.greeting.packed_entries
+    assert len(packed.SerializeToString()) < len(full.SerializeToString()) // 2
+    assert HasMap(packed).to_greeting_message() == full
+
+
+def test_get_earliest_missing():
+    """ Tests finding where the bundles one HasMap is missing from another start. """
+    mine, theirs = HasMap(), HasMap()
+    theirs.mark_as_having(BundleInfo(medallion=123, chain_start=345, timestamp=789))
+    theirs.mark_as_having(BundleInfo(medallion=222, chain_start=888, timestamp=900))
+    assert mine.get_earliest_missing(theirs) == 345
+    mine.mark_as_having(BundleInfo(medallion=123, chain_start=345, timestamp=500))
+    assert mine.get_earliest_missing(theirs) == 501
+    mine.mark_as_having(BundleInfo(medallion=123, chain_start=345, timestamp=789))
+    assert mine.get_earliest_missing(theirs) == 888
+    mine.mark_as_having(BundleInfo(medallion=222, chain_start=888, timestamp=900))
+    assert mine.get_earliest_missing(theirs) is None
@@ -23,3 +23,28 @@ def test_order():
     assert stuff[0] == info1, stuff
     assert stuff[1] == info2, stuff
     assert stuff[2] == info3, stuff
+
+
+def test_bytes_round_trip():
+    """ Makes sure that packing and unpacking keep the raw digest and comment. """
+    digest = bytes(range(32))
+    info = BundleInfo(timestamp=125, medallion=3, chain_start=123, previous=123, digest=digest, comment='x')
+    packed = bytes(info)
+    assert len(packed) == 65
+    unpacked = BundleInfo.from_bytes(packed)
+    assert unpacked == info
+    assert unpacked.digest == digest
+    assert unpacked.hex_hash == digest.hex()
+    assert unpacked.previous == 123 and unpacked.comment == 'x'
+    assert bytes(unpacked) is packed
+    assert BundleInfo(timestamp=125, medallion=3, chain_start=123, hex_hash=digest.hex()).digest == digest
+
+
+def test_cached_chain_and_ack():
+    """ Makes sure the chain is cached and that acks round trip. """
+    info = BundleInfo(timestamp=125, medallion=3, chain_start=123, previous=123)
+    assert info.get_chain() is info.get_chain()
+    assert info.get_chain() == (3, 123)
+    from_ack = BundleInfo.from_ack(info.as_acknowledgement())
+    assert from_ack == info and hash(from_ack) == hash(info)
+    assert from_ack.previous == 123 and from_ack.digest is None
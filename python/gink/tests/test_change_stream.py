@@ -0,0 +1,131 @@
+""" Tests ChangeStream (Database.changes). """
+from asyncio import gather, run, sleep as async_sleep, wait_for
+from contextlib import closing
+from threading import Thread, get_ident
+
+from ..impl.database import Database
+from ..impl.memory_store import MemoryStore
+from ..impl.lmdb_store import LmdbStore
+from ..impl.directory import Directory
+from ..impl.change_stream import Resync
+
+
+def _keys(events):
+    return [change.entry.key.characters for event in events for _, change in event.changes]
+
+
+def test_blocking_iteration_and_filter():
+    database = Database(MemoryStore())
+    watched = Directory(database=database)
+    other = Directory(database=database)
+    with database.changes(containers=[watched]) as stream:
+        with database.bundler() as bundler:
+            watched.set("a", 1, bundler=bundler)
+            other.set("b", 1, bundler=bundler)
+        watched.set("c", 1)
+        assert _keys([stream.get(timeout=1), stream.get(timeout=1)]) == ["a", "c"]
+        assert stream.get(timeout=0.01) is None
+    assert list(stream) == []  # closed
+
+
+def test_overflow_policies():
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    dropping = database.changes(max_queued=2, overflow="drop")
+    coalescing = database.changes(max_queued=2)
+    for i in range(5):
+        directory.set(f"k{i}", i)
+    assert _keys([dropping.get(timeout=1), dropping.get(timeout=1)]) == ["k0", "k1"]
+    assert dropping.get(timeout=0.01) is None and dropping.get_dropped() == 3
+
+    resync = coalescing.get(timeout=1)
+    assert isinstance(resync, Resync) and resync.dropped == 5
+    replayed = [coalescing.get(timeout=1) for _ in range(5)]  # what was missed, from the store
+    assert _keys(replayed) == [f"k{i}" for i in range(5)]
+    directory.set("after", 1)
+    assert _keys([coalescing.get(timeout=1)]) == ["after"]
+    assert coalescing.get(timeout=0.01) is None
+
+
+def test_block_and_resume():
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    stream = database.changes(max_queued=1, overflow="block")
+    received = []
+
+    def consume():
+        for event in stream:
+            received.append(event)
+            if len(received) == 2:
+                break
+
+    consumer = Thread(target=consume)
+    consumer.start()
+    directory.set("a", 1)
+    directory.set("b", 2)  # waits for the consumer if it hasn't caught up
+    consumer.join(timeout=5)
+    assert _keys(received) == ["a", "b"]
+    position = stream.get_position()
+    stream.close()
+    directory.set("c", 3)
+    directory.set("d", 4)
+    resumed = database.changes(since=position)
+    assert _keys([resumed.get(timeout=1), resumed.get(timeout=1)]) == ["c", "d"]
+    assert resumed.get(timeout=0.01) is None
+
+
+def test_async_iteration():
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+
+    async def main():
+        stream = database.changes()
+
+        async def produce():
+            for key in ("x", "y"):
+                await async_sleep(0.01)
+                directory.set(key, 1)
+
+        async def consume():
+            seen = []
+            async for event in stream:
+                seen.append(event)
+                if len(seen) == 2:
+                    return seen
+
+        _, seen = await wait_for(gather(produce(), consume()), 5)
+        return seen
+
+    assert _keys(run(main())) == ["x", "y"]
+
+
+def test_async_replay_reads_off_the_loop():
+    with closing(LmdbStore()) as store:
+        database = Database(store)
+        directory = Directory(database=database)
+        for i in range(5):
+            directory.set(f"k{i}", i)
+        position = database.changes().get_position()
+        for i in range(5, 10):
+            directory.set(f"k{i}", i)
+        reading_threads, starts = set(), []
+        get_bundles = store.get_bundles
+
+        def recording_get_bundles(*args, **kwargs):
+            reading_threads.add(get_ident())
+            starts.append(kwargs.get("start_after"))
+            return get_bundles(*args, **kwargs)
+
+        setattr(store, "get_bundles", recording_get_bundles)
+
+        async def main():
+            stream = database.changes(since=position, max_queued=2)  # slices of two bundles
+            seen = []
+            async for event in stream:
+                seen.append(event)
+                if len(seen) == 5:
+                    return seen
+
+        assert _keys(run(wait_for(main(), 5))) == [f"k{i}" for i in range(5, 10)]
+        assert reading_threads and get_ident() not in reading_threads
+        assert None not in starts  # resumed from what it had seen rather than rescanning the store
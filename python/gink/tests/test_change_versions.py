@@ -0,0 +1,62 @@
+""" Tests the ChangeVersions class. """
+from time import sleep
+
+from ..impl.database import Database
+from ..impl.memory_store import MemoryStore
+from ..impl.directory import Directory
+from ..impl.sequence import Sequence
+from ..impl.change_versions import ChangeVersions
+from ..impl.utilities import generate_timestamp
+
+
+def test_versions_follow_changes():
+    database = Database(MemoryStore())
+    first = Directory(database=database)
+    second = Directory(database=database)
+    versions = ChangeVersions(database)
+    before = versions.get_version()
+    first_before = versions.get_version(first)
+    second_before = versions.get_version(second)
+    assert versions.get_version() == before
+
+    first.set("a", 1)
+    assert versions.get_version() != before
+    assert versions.get_version(first) != first_before
+    assert versions.get_version(second) == second_before  # untouched
+    assert versions.get_etag(first, second) != versions.get_etag(second)
+
+    second_before = versions.get_version(second)
+    second.clear()
+    assert versions.get_version(second) != second_before
+
+    # starting over from the same store gives the same token
+    assert ChangeVersions(database).get_version() == ChangeVersions(database).get_version()
+
+
+def test_expiry_changes_version():
+    database = Database(MemoryStore())
+    sequence = Sequence(database=database)
+    versions = ChangeVersions(database)
+    sequence.append("soon gone", expiry=generate_timestamp() + 50_000)
+    version = versions.get_version(sequence)
+    sleep(0.1)
+    assert versions.get_version(sequence) != version
+
+
+def test_not_modified():
+    database = Database(MemoryStore())
+    root = Directory(root=True, database=database)
+    versions = ChangeVersions(database)
+    started = []
+
+    def start_response(status, headers):
+        started.append((status, headers))
+
+    etag = versions.get_etag(root)
+    environ = {"REQUEST_METHOD": "GET", "HTTP_IF_NONE_MATCH": f'"other", W/{etag}'}
+    assert versions.not_modified(environ, start_response, root) == []
+    assert started == [("304 Not Modified", [("ETag", etag)])]
+    assert versions.not_modified(dict(environ, REQUEST_METHOD="PUT"), start_response, root) is None
+    root.set("key", "value")
+    assert versions.not_modified(environ, start_response, root) is None
+    assert len(started) == 1
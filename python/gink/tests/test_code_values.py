@@ -1,8 +1,11 @@
 """ tests the conversion functions in code_values
 """
 from datetime import datetime as DateTime
+from array import array
+import pytest
 
 from ..impl.builders import ChangeBuilder
+from ..impl import coding
 from ..impl.coding import (
     encode_value, decode_value, Placement, QueueMiddleKey, SEQUENCE, DIRECTORY, PAIR_SET, VERTEX)
 from ..impl.muid import Muid
@@ -60,6 +63,36 @@ def test_compound():
     assert decoded == original, "%r != %r" % (decoded, original)
 
 
+def test_numpy_array():
+    """ Tests that numpy arrays round trip as read-only views over the stored bytes. """
+    numpy = pytest.importorskip("numpy")
+    for original in (numpy.arange(12, dtype=numpy.float32).reshape(3, 4),
+                     numpy.array([1, -2, 3], dtype=">i8"), numpy.array(7, dtype=numpy.uint8),
+                     numpy.zeros((0, 5)), numpy.array([True, False])):
+        encoded = encode_value(original)
+        assert encoded.WhichOneof("value") == "array"
+        decoded = decode_value(encoded)
+        assert decoded.shape == original.shape
+        assert decoded.dtype == original.dtype.newbyteorder("<")
+        assert numpy.array_equal(decoded, original)
+        assert not decoded.flags.writeable
+    with pytest.raises(ValueError):
+        encode_value(numpy.array(["not", "numbers"]))
+
+
+def test_array_without_numpy(monkeypatch):
+    """ Tests that typed buffers can be stored and viewed through a memoryview. """
+    monkeypatch.setattr(coding, "numpy", None)
+    encoded = encode_value(array("d", [1.5, 2.5, 3.5]))
+    assert encoded.array.dtype == "<f8"
+    decoded = decode_value(encoded)
+    assert isinstance(decoded, memoryview) and decoded.readonly
+    assert decoded.tolist() == [1.5, 2.5, 3.5]
+    grid = decode_value(encode_value(memoryview(bytes(range(6))).cast("B", (2, 3))))
+    assert grid.tolist() == [[0, 1, 2], [3, 4, 5]]
+    assert decode_value(encode_value(bytearray(b"abc"))) == b"abc"
+
+
 def test_entry_key_sorting():
     """ ensures that entry keys sort as expected """
     global_directory = Muid(-1, -1, 7)
@@ -124,3 +157,11 @@ def test_entry_to_from_builder():
         # From builder
         assert Placement.from_builder(
             entry_builder, info, offset=PAIR_SET).middle == (Muid(-1, -1, 7), Muid(124, 54, 7))
+
+
+def test_array_dtype_checked():
+    """ Tests that only the supported element types are accepted from a peer, with or without numpy. """
+    encoded = encode_value(array("d", [1.5]))
+    encoded.array.dtype = "|O8"  # type: ignore
+    with pytest.raises(ValueError):
+        decode_value(encoded)
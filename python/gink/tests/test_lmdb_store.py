@@ -43,3 +43,41 @@ def test_close_closes_watcher():
         assert watcher.closed
     finally:
         store.close()
+
+
+def test_has_map_sees_other_writers(tmp_path):
+    """ The cached HasMap is rebuilt when another handle on the same file has written. """
+    path = tmp_path / "shared.gink"
+    with closing(LmdbStore(path)) as first, closing(LmdbStore(path)) as second:
+        info1 = BundleInfo(medallion=123, chain_start=456, timestamp=456)
+        info2 = BundleInfo(medallion=123, chain_start=456, timestamp=789, previous=456)
+        bundle1 = make_empty_bundle(info1)
+        first.apply_bundle(bundle1)
+        assert first.get_has_map().has(info1)
+        second.apply_bundle(make_empty_bundle(info2, bundle1))
+        assert first.get_has_map().has(info2)
+
+
+def test_interrupted_snapshot_discarded(tmp_path):
+    """ A snapshot only partly installed when the store was closed is thrown away on reopening. """
+    with closing(LmdbStore(tmp_path / "source.gink")) as source:
+        info = BundleInfo(medallion=123, chain_start=456, timestamp=456)
+        source.apply_bundle(make_empty_bundle(info))
+        has_map, parts = source.get_snapshot()
+        parts = list(parts)
+        assert has_map.has(info)
+        with pytest.raises(ValueError):
+            source.begin_snapshot()  # not empty
+    path = tmp_path / "target.gink"
+    with closing(LmdbStore(path)) as target:
+        target.begin_snapshot()
+        for table, keys, values in parts:
+            if table != "chains":
+                target.add_snapshot_part(table, keys, values)
+    with closing(LmdbStore(path)) as target:
+        assert not target.get_bundle_infos() and not target.get_has_map()
+        target.begin_snapshot()
+        for table, keys, values in parts:
+            target.add_snapshot_part(table, keys, values)
+        target.finish_snapshot()
+        assert target.get_bundle_infos() == [info] and target.get_has_map().has(info)
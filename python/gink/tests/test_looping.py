@@ -0,0 +1,64 @@
+""" tests for the select loop's timer scheduling """
+from socket import socketpair
+from time import monotonic, process_time
+
+from ..impl.looping import loop, Scheduler
+from ..impl.typedefs import Finished
+
+
+def test_timers_run_in_order():
+    """ One-shot and periodic timers fire when due, and cancelled ones don't. """
+    scheduler = Scheduler()
+    fired = []
+    scheduler.call_later(0.03, lambda: fired.append("later"))
+    scheduler.call_at(monotonic() + 0.01, lambda: fired.append("at"))
+    cancelled = scheduler.call_later(0.02, lambda: fired.append("cancelled"))
+    cancelled.cancel()
+    periodic = scheduler.call_every(0.02, lambda: fired.append("every"))
+    scheduler.call_later(0.07, periodic.cancel)
+    loop(scheduler=scheduler, until=0.12)
+    assert fired[:2] == ["at", "every"]
+    assert "cancelled" not in fired
+    assert "later" in fired
+    assert 2 <= fired.count("every") <= 3
+    assert len(scheduler) == 0
+
+
+class _Pipe:
+    """ minimal selectable that counts wake-ups """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.received = []
+        self.timeouts = 0
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def on_ready(self):
+        data = self._sock.recv(100)
+        if not data:
+            raise Finished()
+        self.received.append(data)
+
+    def on_timeout(self):
+        self.timeouts += 1
+
+    def close(self):
+        self._sock.close()
+
+
+def test_idle_loop_blocks():
+    """ With nothing to do the loop waits in select instead of polling. """
+    left, right = socketpair()
+    pipe = _Pipe(left)
+    scheduler = Scheduler()
+    scheduler.call_later(0.05, lambda: right.send(b"hello"))
+    before = process_time()
+    loop(pipe, scheduler=scheduler, until=0.3)
+    assert pipe.received == [b"hello"]
+    # once at startup and once after the message, not every 10ms
+    assert pipe.timeouts == 2
+    assert process_time() - before < 0.1
+    pipe.close()
+    right.close()
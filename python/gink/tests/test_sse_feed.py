@@ -0,0 +1,112 @@
+""" Tests SseFeed (server-sent events of a database's changes). """
+from json import loads
+from socket import socketpair
+
+from pytest import raises
+
+from ..impl.database import Database
+from ..impl.memory_store import MemoryStore
+from ..impl.directory import Directory
+from ..impl.connection import Connection
+from ..impl.sse_feed import SseFeed
+from ..impl.typedefs import Finished
+
+
+def _open(feed: SseFeed, path: str, last_event_id=None):
+    """ Requests path from the feed over a socketpair, returning (server side, client socket, header). """
+    server_socket, client_socket = socketpair()
+    client_socket.settimeout(1)
+    connection = Connection(socket=server_socket, sse_feed=feed)
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n"
+    if last_event_id:
+        request += f"Last-Event-ID: {last_event_id}\r\n"
+    client_socket.sendall((request + "\r\n").encode())
+    try:
+        connection.on_ready()
+    except Finished:
+        assert client_socket.recv(4096).startswith(b"HTTP/1.1 404")
+        raise
+    header = b""
+    while b"\r\n\r\n" not in header:
+        header += client_socket.recv(4096)
+    assert header.endswith(b"\r\n\r\n")
+    return connection, client_socket, header
+
+
+def _read_events(client_socket, count: int):
+    received = b""
+    while received.count(b"\n\n") < count:
+        received += client_socket.recv(2**16)
+    events = []
+    for message in received.decode().split("\n\n")[:count]:
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["id"], loads(fields["data"])))
+    return events
+
+
+def test_shared_events():
+    database = Database(MemoryStore())
+    watched = Directory(database=database)
+    other = Directory(database=database)
+    feed = SseFeed(database)
+    first, first_client, header = _open(feed, f"/changes/{watched.get_muid()}")
+    assert header.startswith(b"HTTP/1.1 200") and b"text/event-stream" in header
+    second, second_client, _ = _open(feed, f"/changes/{watched.get_muid()}")
+    everything, everything_client, _ = _open(feed, "/changes")
+    other.set("ignored", 1)
+    watched.set("a", 1)
+
+    [(event_id, data)] = _read_events(first_client, 1)
+    assert _read_events(second_client, 1) == [(event_id, data)]
+    assert data["container"] == str(watched.get_muid())
+    assert [(change["key"], change["value"]) for change in data["changes"]] == [("a", 1)]
+    assert [data["changes"][0]["key"] for _, data in _read_events(everything_client, 2)] == ["ignored", "a"]
+    assert feed.get_stats()["events_encoded"] == 2  # once for each, however many clients
+
+    for connection in (first, second, everything):
+        connection.close()
+    assert feed.get_stats()["clients"] == 0
+    with raises(Finished):
+        _open(feed, "/changes/nonsense")
+
+
+def test_resume_with_last_event_id():
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    feed = SseFeed(database, replay_slice_bytes=1)  # a bundle per slice
+    connection, client, _ = _open(feed, "/changes")
+    directory.set("a", 1)
+    [(event_id, _)] = _read_events(client, 1)
+    connection.close()
+
+    for key in ("b", "c", "d"):
+        directory.set(key, 1)
+    resumed, client, _ = _open(feed, "/changes", last_event_id=event_id)
+    directory.set("e", 1)  # arrives while replaying, so gets sent as part of the replay
+    while resumed.wants_write():
+        resumed.on_write_ready()
+    events = _read_events(client, 4)
+    assert [data["changes"][0]["key"] for _, data in events] == ["b", "c", "d", "e"]
+    directory.set("f", 1)  # and live once caught up
+    assert _read_events(client, 1)[0][1]["changes"][0]["key"] == "f"
+    resumed.close()
+
+
+def test_resume_within_a_bundle():
+    database = Database(MemoryStore())
+    first, second = Directory(database=database), Directory(database=database)
+    feed = SseFeed(database)
+    connection, client, _ = _open(feed, "/changes")
+    with database.bundler() as bundler:
+        first.set("a", 1, bundler=bundler)
+        second.set("b", 1, bundler=bundler)
+    [(first_id, _), (second_id, _)] = _read_events(client, 2)
+    assert first_id != second_id
+    connection.close()
+
+    resumed, client, _ = _open(feed, "/changes", last_event_id=first_id)  # as if dropped after the first
+    while resumed.wants_write():
+        resumed.on_write_ready()
+    [(event_id, data)] = _read_events(client, 1)
+    assert event_id == second_id and data["container"] == str(second.get_muid())
+    resumed.close()
@@ -285,6 +285,12 @@ def generic_test_tracks(store_maker: StoreMaker):
         assert tracker.has(info3)
         assert tracker.has(info4)
         assert not tracker.has(info5)
+        tracker.mark_as_having(info5)
+        assert not store.get_has_map().has(info5), "callers get their own copy"
+        store.apply_bundle(make_empty_bundle(info5, cs4))
+        assert store.get_has_map().has(info5)
+        assert store.get_has_map(limit_to={info5.get_chain(): info5.timestamp}).has(info5)
+        assert not store.get_has_map(limit_to={info5.get_chain(): info5.timestamp}).has(info1)
 
 
 def generic_test_get_ordered_entries(store_maker: StoreMaker):
@@ -499,7 +505,11 @@ def generic_test_encryption(store_maker: StoreMaker):
         bundle_builder.encrypted = secret_box.encrypt(inside_serialized)
         bundle_builder.prior_hash = digest(first)
         outside_serialized = bundle_builder.SerializeToString()  # type: ignore
-        store.apply_bundle(signing_key.sign(outside_serialized))
+        encrypted_bundle = Decomposition(signing_key.sign(outside_serialized))
+        store.apply_bundle(encrypted_bundle)
+        changes = store.get_changes(encrypted_bundle)
+        assert len(changes) == 2
+        assert store.get_changes(Decomposition(encrypted_bundle.get_bytes())) is changes
         global_box_id = Muid(-1, -1, 1)
         result = store.get_entry_by_key(global_box_id, None, -1)
         assert result is not None
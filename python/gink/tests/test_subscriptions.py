@@ -0,0 +1,52 @@
+""" Tests Database.subscribe. """
+from ..impl.database import Database
+from ..impl.memory_store import MemoryStore
+from ..impl.directory import Directory
+from ..impl.sequence import Sequence
+from ..impl.subscriptions import ContainerChanges
+
+
+def test_subscribe_to_container():
+    database = Database(MemoryStore())
+    watched = Directory(database=database)
+    other = Directory(database=database)
+    events = []
+    subscription = database.subscribe(watched, events.append)
+    with database.bundler() as bundler:
+        watched.set("a", 1, bundler=bundler)
+        other.set("b", 2, bundler=bundler)
+        watched.set("c", 3, bundler=bundler)
+    assert len(events) == 1  # one event for the bundle's changes to the container
+    event = events[0]
+    assert isinstance(event, ContainerChanges)
+    assert event.container == watched.get_muid()
+    assert [change.entry.key.characters for _, change in event.changes] == ["a", "c"]
+    assert all(muid.timestamp == event.info.timestamp for muid, _ in event.changes)
+
+    watched.clear()
+    assert events[-1].changes[0][1].HasField("clearance")
+    by_muid = []
+    database.subscribe(watched.get_muid(), by_muid.append)
+    subscription.cancel()
+    watched.set("d", 4)
+    assert len(events) == 2 and len(by_muid) == 1
+
+
+def test_subscribe_with_descendants():
+    database = Database(MemoryStore())
+    top = Directory(database=database)
+    existing = Directory(database=database)
+    top.set("existing", existing)
+    events = []
+    direct = []
+    database.subscribe(top, events.append, include_descendants=True)
+    database.subscribe(top, direct.append)
+    existing.set("x", 1)
+    assert [event.container for event in events] == [existing.get_muid()]
+    added = Sequence(database=database)
+    existing.set("added", added)  # put into the tree after subscribing
+    added.append("y")
+    assert [event.container for event in events[-2:]] == [existing.get_muid(), added.get_muid()]
+    Directory(database=database).set("z", 1)  # not in the tree
+    assert len(events) == 3
+    assert direct == []
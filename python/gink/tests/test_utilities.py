@@ -1,4 +1,11 @@
-from ..impl.utilities import decode_from_hex, encode_to_hex, experimental, is_named_tuple, shorter_hash
+from ..impl.utilities import (
+    decode_from_hex, encode_to_hex, experimental, is_named_tuple, shorter_hash, validate_bundle)
+from ..impl.builders import BundleBuilder, Behavior, EntryBuilder
+from ..impl import relay
+from ..impl.database import Database
+from ..impl.decomposition import Decomposition
+from ..impl.directory import Directory
+from ..impl.memory_store import MemoryStore
 from ..impl.muid import Muid
 from ..impl.tuples import Chain
 
@@ -28,3 +35,83 @@ def test_is_named_tuple():
 def test_hash13():
     assert shorter_hash(b"") == 841205362792771
     assert shorter_hash(b"\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0a\x0b") == 2464109268650891
+
+
+def test_validate_bundle():
+    """ Checks that the behavior rule table accepts good entries and rejects bad ones. """
+    def bundle_with(**fields) -> BundleBuilder:
+        bundle_builder = BundleBuilder()
+        entry = bundle_builder.changes.add().entry  # type: ignore
+        Muid(-1, -1, fields.pop("behavior")).put_into(entry.container)
+        entry.behavior = entry.container.offset
+        for name, value in fields.items():
+            if name == "key":
+                entry.key.characters = value
+            elif name == "value":
+                entry.value.characters = value
+            elif name == "integer":
+                entry.value.integer = value
+            elif name == "describing":
+                Muid(1, 2, 3).put_into(entry.describing)
+            else:
+                setattr(entry, name, value)
+        return bundle_builder
+
+    good = [
+        bundle_with(behavior=Behavior.DIRECTORY, key="a", value="b"),
+        bundle_with(behavior=Behavior.DIRECTORY, key="a", deletion=True),
+        bundle_with(behavior=Behavior.BOX, value="b"),
+        bundle_with(behavior=Behavior.KEY_SET, key="a"),
+        bundle_with(behavior=Behavior.GROUP, describing=True),
+        bundle_with(behavior=Behavior.ACCUMULATOR, integer="-12"),
+    ]
+    bad = [
+        bundle_with(behavior=Behavior.DIRECTORY, value="b"),
+        bundle_with(behavior=Behavior.DIRECTORY, key="a"),
+        bundle_with(behavior=Behavior.BOX, key="a", value="b"),
+        bundle_with(behavior=Behavior.KEY_SET, key="a", value="b"),
+        bundle_with(behavior=Behavior.GROUP, value="b"),
+        bundle_with(behavior=Behavior.ACCUMULATOR, integer="1.5"),
+        bundle_with(behavior=Behavior.BRAID, describing=True, value="b"),
+    ]
+    for bundle_builder in good:
+        validate_bundle(bundle_builder)
+    for bundle_builder in bad:
+        try:
+            validate_bundle(bundle_builder)
+        except ValueError:
+            continue
+        raise AssertionError(f"expected validation to fail: {bundle_builder}")
+
+
+def test_local_bundles_skip_validation(monkeypatch):
+    """ Entries checked as they're added aren't validated again, but bundles from peers are. """
+    checked = []
+
+    def counting(bundle_builder: BundleBuilder) -> None:
+        checked.append(bundle_builder)
+        validate_bundle(bundle_builder)
+
+    source = Database(MemoryStore())
+    directory = Directory(database=source)
+    monkeypatch.setattr(relay, "validate_bundle", counting)
+    directory.set("a", "b")
+    assert checked == []
+
+    monkeypatch.setattr(relay, "validate_bundle", lambda _: None)  # so the source will commit a bad entry
+    entry = EntryBuilder()
+    directory.get_muid().put_into(entry.container)  # type: ignore
+    entry.behavior = Behavior.DIRECTORY  # type: ignore
+    entry.value.characters = "no key"  # type: ignore
+    with source.bundler() as bundler:
+        bundler.add_change(entry)
+    bad = Decomposition(bundler.get_decomposition().get_bytes())  # type: ignore
+
+    monkeypatch.setattr(relay, "validate_bundle", counting)
+    destination = Database(MemoryStore())
+    try:
+        destination.receive(bad)
+    except ValueError:
+        assert len(checked) == 1
+    else:
+        raise AssertionError("expected an invalid remote bundle to be rejected")
@@ -0,0 +1,13 @@
+""" tests for fork_workers """
+from os import _exit
+
+from ..impl.workers import fork_workers
+
+
+def test_exit_status_of_workers():
+    """ The parent gets back a non-zero status when any worker fails. """
+    for failing, expected in [(None, 0), (1, 3)]:
+        index, status = fork_workers(2)
+        if index is not None:
+            _exit(3 if index == failing else 0)  # don't run pytest's teardown in the workers
+        assert status == expected
@@ -5,6 +5,8 @@ and the endpoints will be reachable as expected.
 import requests
 from flask import Flask
 from multiprocessing import Process, set_start_method
+from socket import create_connection
+from time import sleep, monotonic
 
 from ..impl.wsgi_listener import WsgiListener
 from ..impl.looping import loop
@@ -42,5 +44,107 @@ def test_wsgi_integration():
         p2.terminate()
 
 
+def streaming_app(environ, start_response):
+    """ Echoes the request body, or streams the path back in pieces (so with no content-length). """
+    body = environ["wsgi.input"].read()
+    if body:
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return [body]
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return (part.encode() for part in environ["PATH_INFO"].split("/"))
+
+def _read_response(sock, buffered: bytes):
+    """ Reads one response from a raw socket, returning (head, body, leftover bytes). """
+    while b"\r\n\r\n" not in buffered:
+        buffered += sock.recv(4096)
+    head, rest = buffered.split(b"\r\n\r\n", 1)
+    headers = {
+        line.split(b":")[0].strip().lower(): line.split(b":", 1)[1].strip() for line in head.split(b"\r\n")[1:]}
+    if b"content-length" in headers:
+        length = int(headers[b"content-length"])
+        while len(rest) < length:
+            rest += sock.recv(4096)
+        return head, rest[:length], rest[length:]
+    assert headers.get(b"transfer-encoding") == b"chunked"
+    body = b""
+    while True:
+        while b"\r\n" not in rest:
+            rest += sock.recv(4096)
+        size_line, rest = rest.split(b"\r\n", 1)
+        size = int(size_line, 16)
+        while len(rest) < size + 2:
+            rest += sock.recv(4096)
+        body, rest = body + rest[:size], rest[size + 2:]
+        if size == 0:
+            return head, body, rest
+
+def test_keep_alive_and_pipelining():
+    listener = WsgiListener(streaming_app, port=8083)
+    process = Process(target=loop, args=[listener])
+    process.start()
+    try:
+        for _ in range(50):
+            try:
+                sock = create_connection(("localhost", 8083))
+                break
+            except ConnectionRefusedError:
+                sleep(0.1)
+        with sock:
+            # two requests in one write, the second with a body
+            sock.sendall(
+                b"GET /a/b/c HTTP/1.1\r\nHost: localhost\r\n\r\n"
+                b"POST /echo HTTP/1.1\r\nHost: localhost\r\nContent-Length: 10\r\n\r\nhello")
+            head, body, rest = _read_response(sock, b"")
+            assert head.startswith(b"HTTP/1.1 200") and body == b"abc", (head, body)
+            sleep(0.1)
+            sock.sendall(b" worl")  # the rest of the body arrives separately
+            head, body, rest = _read_response(sock, rest)
+            assert body == b"hello worl", body
+            sock.sendall(b"POST /echo HTTP/1.1\r\nContent-Length: 1\r\n\r\nd"
+                         b"GET /x HTTP/1.1\r\nConnection: close\r\n\r\n")
+            head, body, rest = _read_response(sock, rest)
+            assert body == b"d", body
+            head, body, rest = _read_response(sock, rest)
+            assert b"connection: close" in head.lower() and body == b"x"
+            assert sock.recv(4096) == b""  # and then the server hangs up
+    finally:
+        process.terminate()
+
+
+def slow_app(environ, start_response):
+    """ Takes a while for /slow, and says whether it's being run on multiple threads. """
+    if environ["PATH_INFO"] == "/slow":
+        sleep(1.0)
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return [str(environ["wsgi.multithread"]).encode()]
+
+def test_threaded_handlers():
+    listener = WsgiListener(slow_app, port=8084, threads=2)
+    process = Process(target=loop, args=[listener])
+    process.start()
+    try:
+        for _ in range(50):
+            try:
+                slow = create_connection(("localhost", 8084))
+                break
+            except ConnectionRefusedError:
+                sleep(0.1)
+        with slow, create_connection(("localhost", 8084)) as fast:
+            started = monotonic()
+            slow.sendall(b"GET /slow HTTP/1.1\r\n\r\n")
+            sleep(0.1)
+            # pipelined requests on one connection are still answered in order
+            fast.sendall(b"GET /fast HTTP/1.1\r\n\r\nGET /fast HTTP/1.1\r\n\r\n")
+            _, body, rest = _read_response(fast, b"")
+            assert body == b"True"
+            _, body, rest = _read_response(fast, rest)
+            assert body == b"True"
+            assert monotonic() - started < 0.8, "fast requests waited on the slow one"
+            head, body, _ = _read_response(slow, b"")
+            assert head.startswith(b"HTTP/1.1 200") and body == b"True"
+    finally:
+        process.terminate()
+
+
 if __name__ == "__main__":
     loop(WsgiListener(wsgi_app))
@@ -0,0 +1,77 @@
+""" Measures the cost of sending each new bundle on to many peers, with and without a shared encoding.
+
+    A number of server connections (the relay's side) each get every bundle through
+    send_bundle and flush, as Relay does when fanning bundles out.  With --shared the
+    connections share an EncodedMessages, so each bundle is serialized and framed once
+    rather than once per peer.  The peers' ends of the socketpairs are drained in between
+    rounds so the socket buffers don't fill; only the sending side is timed.
+"""
+from socket import socketpair
+from time import perf_counter
+import json
+
+from gink.impl.connection import Connection, EncodedMessages
+from gink.impl.has_map import HasMap
+
+from receive_performance import make_bundles
+
+
+def measure(peers: int, size: int, count: int, shared: bool) -> dict:
+    bundles = make_bundles(size, count)
+    greet = lambda _: HasMap().to_greeting_message()
+    encoded = EncodedMessages() if shared else None
+    senders = []
+    receivers = []
+    for _ in range(peers):
+        server_socket, client_socket = socketpair()
+        server = Connection(socket=server_socket, conn_func=greet, encoded=encoded)
+        client = Connection(socket=client_socket, is_client=True, conn_func=greet)
+        list(server.receive_objects())
+        list(client.receive_objects())
+        list(server.receive_objects())
+        senders.append(server)
+        receivers.append(client_socket)
+    elapsed = 0.0
+    for bundle in bundles:
+        before = perf_counter()
+        for sender in senders:
+            sender.send_bundle(bundle)
+        for sender in senders:
+            sender.flush()
+            while sender.wants_write():
+                sender.on_write_ready()
+        if encoded is not None:
+            encoded.clear()
+        elapsed += perf_counter() - before
+        for receiver in receivers:
+            receiver.setblocking(False)
+            try:
+                while receiver.recv(2**20):
+                    pass
+            except BlockingIOError:
+                pass
+    for sender in senders:
+        sender.close()
+    for receiver in receivers:
+        receiver.close()
+    result = {
+        "seconds": round(elapsed, 4),
+        "sends_per_second": round(peers * len(bundles) / elapsed, 1),
+    }
+    print(f"{len(bundles)} bundles of {size} bytes to {peers} peers, shared={shared}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-p", "--peers", help="number of peers to send to", type=int, default=200)
+    parser.add_argument("-s", "--size", help="bundle size in bytes", type=int, default=2**12)
+    parser.add_argument("-n", "--count", help="bundles to broadcast", type=int, default=50)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = {str(shared): measure(args.peers, args.size, args.count, shared) for shared in (False, True)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -0,0 +1,157 @@
+""" Benchmarks for BundleInfo handling: decoding stored keys, HasMap building, and log scans.
+
+    The synthetic tests work directly on packed BundleInfo keys (what the stores keep in their
+    bundle_infos and chains tables), so they can be run with a million bundles quickly.
+    The store tests write real signed bundles to an LmdbStore and time get_has_map / get_bundles.
+"""
+from datetime import datetime
+from pathlib import Path
+from random import randint
+from sortedcontainers import SortedDict  # type: ignore
+import json
+import os
+from nacl.signing import SigningKey
+
+from gink import *
+from gink.impl.decomposition import Decomposition
+from gink.impl.has_map import HasMap
+from gink.impl.utilities import combine, digest
+
+
+def make_packed_infos(count: int, chains: int) -> list:
+    """ Creates count packed BundleInfo keys spread over the given number of chains. """
+    medallions = [randint(2**48, 2**49) for _ in range(chains)]
+    chain_start = generate_timestamp()
+    packed = []
+    previous = [0] * chains
+    for i in range(count):
+        which = i % chains
+        timestamp = chain_start + i + 1
+        info = BundleInfo(
+            medallion=medallions[which],
+            chain_start=chain_start,
+            timestamp=timestamp,
+            previous=previous[which],
+            digest=digest(timestamp.to_bytes(8, "big")),
+        )
+        previous[which] = timestamp
+        packed.append(bytes(info))
+    return packed
+
+
+def report(name: str, count: int, before: datetime, after: datetime) -> dict:
+    total_time = round((after - before).total_seconds(), 4)
+    per_second = count / total_time if total_time else float("inf")
+    print(f"- {name}: {total_time} seconds ({round(per_second, 2)} per second)")
+    return {"total_time": total_time, "per_second": per_second}
+
+
+def test_synthetic(count: int, chains: int) -> dict:
+    """ Times decoding, sorting and HasMap building on packed infos without a store. """
+    print(f"Testing BundleInfo handling on {count} synthetic bundles in {chains} chains.")
+    packed = make_packed_infos(count, chains)
+    results = {}
+
+    before = datetime.now()
+    infos = [BundleInfo.from_bytes(data) for data in packed]
+    results["decode"] = report("decode", count, before, datetime.now())
+
+    before = datetime.now()
+    for info in infos:
+        bytes(info)
+    results["encode"] = report("encode", count, before, datetime.now())
+
+    before = datetime.now()
+    sorted_dict = SortedDict()
+    for info in infos:
+        sorted_dict[info] = None
+    results["sorted_insert"] = report("sorted insert", count, before, datetime.now())
+
+    before = datetime.now()
+    has_map = HasMap()
+    for info in infos:
+        has_map.mark_as_having(info)
+    results["has_map"] = report("has map build", count, before, datetime.now())
+
+    before = datetime.now()
+    for info in infos:
+        has_map.has(info)
+    results["has_map_lookup"] = report("has map lookup", count, before, datetime.now())
+    print()
+    return results
+
+
+def test_store(db_file_path: Path, count: int, chains: int) -> dict:
+    """ Times get_has_map and get_bundles on an LmdbStore holding count real bundles. """
+    print(f"Testing LmdbStore scans on {count} bundles in {chains} chains.")
+    signing_key = SigningKey.generate()
+    results = {}
+    store = LmdbStore(db_file_path, True)
+    try:
+        last = []
+        for _ in range(chains):
+            chain_start = generate_timestamp()
+            chain = Chain(medallion=generate_medallion(), chain_start=chain_start)
+            bundle_bytes = combine(chain=chain, timestamp=chain_start, signing_key=signing_key, identity="perf")
+            store.apply_bundle(bundle_bytes)
+            last.append((chain, bundle_bytes))
+        for i in range(count - chains):
+            which = i % chains
+            chain, prior = last[which]
+            prior_info = Decomposition(prior).get_info()
+            bundle_bytes = combine(
+                chain=chain,
+                timestamp=generate_timestamp(),
+                previous=prior_info.timestamp,
+                prior_hash=prior_info.digest,
+                signing_key=signing_key,
+            )
+            store.apply_bundle(bundle_bytes)
+            last[which] = (chain, bundle_bytes)
+
+        before = datetime.now()
+        store.get_has_map()
+        results["get_has_map"] = report("get_has_map", chains, before, datetime.now())
+
+        seen = [0]
+
+        def callback(decomposition: Decomposition):
+            decomposition.get_info()
+            seen[0] += 1
+
+        before = datetime.now()
+        store.get_bundles(callback)
+        results["get_bundles"] = report("get_bundles", seen[0], before, datetime.now())
+
+        before = datetime.now()
+        for _ in store.get_some(BundleInfo):
+            pass
+        results["get_some"] = report("get_some(BundleInfo)", count, before, datetime.now())
+    finally:
+        store.close()
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-c", "--count", help="number of synthetic bundles", type=int, default=1_000_000)
+    parser.add_argument("-s", "--store_count", help="number of bundles written to the store", type=int,
+                        default=10_000)
+    parser.add_argument("-n", "--chains", help="number of chains", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    parser.add_argument("-d", "--dir", help="directory for temporary database", default="./perf_test_temp", type=Path)
+    args: Namespace = parser.parse_args()
+    try:
+        os.mkdir(args.dir)
+    except FileExistsError:
+        pass
+    results = {
+        "synthetic": test_synthetic(args.count, args.chains),
+        "store": test_store(Path(args.dir) / "bundle_info.db", args.store_count, min(args.chains, args.store_count)),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -0,0 +1,56 @@
+""" Shows how much a change stream with a consumer that has fallen behind holds on to, by overflow policy.
+
+    A stream is opened, --count commits are made without the consumer taking anything,
+    and then the consumer drains it.  Reported are the events queued at the end of the
+    commits, tracemalloc's peak while committing (the stream's queue is the part that
+    differs between policies), and how fast the consumer then got through the events.
+    An unbounded queue (--max_queued of the count) is included for comparison.
+"""
+from time import perf_counter
+import json
+import tracemalloc
+
+from gink import Database, MemoryStore, Directory
+
+
+def measure(count: int, max_queued: int, overflow: str) -> dict:
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    stream = database.changes(max_queued=max_queued, overflow=overflow)
+    tracemalloc.start()
+    for i in range(count):
+        directory.set(f"key{i % 100}", "x" * 100)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queued = stream.qsize()
+    before = perf_counter()
+    taken = 0
+    while stream.get(timeout=0) is not None:
+        taken += 1
+    elapsed = perf_counter() - before
+    result = {
+        "queued": queued,
+        "peak_mb": round(peak / 2**20, 2),
+        "events_taken": taken,
+        "events_per_second": round(taken / elapsed, 1) if elapsed else None,
+    }
+    print(f"{overflow} (max_queued={max_queued}): {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-n", "--count", help="commits to make", type=int, default=5000)
+    parser.add_argument("-q", "--max_queued", help="bound on the stream's queue", type=int, default=256)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = {
+        "unbounded": measure(args.count, args.count, "drop"),
+        "drop": measure(args.count, args.max_queued, "drop"),
+        "coalesce": measure(args.count, args.max_queued, "coalesce"),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
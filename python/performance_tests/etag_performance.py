@@ -0,0 +1,62 @@
+""" Compares serving a JSON dump of a directory with answering the same poll with 304 Not Modified.
+
+    The app below serves a directory of --entries entries as JSON with an ETag from
+    ChangeVersions; a dashboard polling with If-None-Match gets a 304 until the directory
+    changes.  The app is called directly (no sockets), so this is just the handler's CPU time.
+"""
+from io import BytesIO
+from time import perf_counter
+import json
+
+from gink import Database, MemoryStore, Directory, ChangeVersions
+
+
+def measure(entries: int, count: int) -> dict:
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    with database.bundler() as bundler:
+        for i in range(entries):
+            directory.set(f"key{i}", i, bundler=bundler)
+    versions = ChangeVersions(database)
+
+    def app(environ, start_response):
+        not_modified = versions.not_modified(environ, start_response, directory)
+        if not_modified is not None:
+            return not_modified
+        etag = versions.get_etag(directory)
+        body = json.dumps(dict(directory.items())).encode()
+        start_response("200 OK", [("Content-type", "application/json"), ("ETag", etag)])
+        return [body]
+
+    headers = []
+    start_response = lambda status, response_headers: headers.append(dict(response_headers))
+    result = {}
+    for name in ("full", "not_modified"):
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "wsgi.input": BytesIO()}
+        if name == "not_modified":
+            environ["HTTP_IF_NONE_MATCH"] = headers[-1]["ETag"]
+        sent = 0
+        before = perf_counter()
+        for _ in range(count):
+            sent += sum(len(chunk) for chunk in app(environ, start_response))
+        elapsed = perf_counter() - before
+        result[name] = {
+            "ms_per_request": round(elapsed / count * 1000, 4),
+            "bytes_per_request": sent // count,
+        }
+    print(f"{entries} entries: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-e", "--entries", help="entries in the directory served", type=int, default=1000)
+    parser.add_argument("-n", "--count", help="requests to time each way", type=int, default=200)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = measure(args.entries, args.count)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -0,0 +1,67 @@
+""" Measures how much CPU the select loop burns while there's nothing to do.
+
+    The "polling" case emulates the old behavior of waking every 10ms to give on_timeout
+    handlers a turn; the "blocking" case is the loop as it is now, which only wakes for
+    file descriptor activity, timers, or the until deadline.
+"""
+from socket import socketpair
+from time import process_time, monotonic
+import json
+
+from gink.impl.looping import loop, Scheduler
+
+
+class IdleSelectable:
+    """ Stands in for the console: a socket nobody writes to, plus an on_timeout handler. """
+
+    def __init__(self):
+        self._sock, self._other = socketpair()
+        self.timeouts = 0
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def on_ready(self):
+        self._sock.recv(100)
+
+    def on_timeout(self):
+        self.timeouts += 1
+
+    def close(self):
+        self._sock.close()
+        self._other.close()
+
+
+def measure(seconds: float, polling: bool) -> dict:
+    name = "polling" if polling else "blocking"
+    selectable = IdleSelectable()
+    scheduler = Scheduler()
+    if polling:
+        scheduler.call_every(0.01, selectable.on_timeout)
+    before_cpu = process_time()
+    before_wall = monotonic()
+    loop(selectable, scheduler=scheduler, until=seconds)
+    cpu = process_time() - before_cpu
+    wall = monotonic() - before_wall
+    selectable.close()
+    percent = round(100 * cpu / wall, 3)
+    print(f"- {name}: {round(cpu, 4)} cpu seconds over {round(wall, 2)} seconds ({percent}%), "
+          f"{selectable.timeouts} wake-ups")
+    return {"cpu_seconds": cpu, "wall_seconds": wall, "cpu_percent": percent, "wake_ups": selectable.timeouts}
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-s", "--seconds", help="how long to leave each loop idle", type=float, default=5.0)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    print(f"Measuring idle loop CPU use over {args.seconds} seconds.")
+    results = {
+        "polling": measure(args.seconds, polling=True),
+        "blocking": measure(args.seconds, polling=False),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
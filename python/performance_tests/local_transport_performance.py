@@ -0,0 +1,111 @@
+""" Compares replication latency and CPU between peers on one host over TCP and over a unix domain socket.
+
+    For each transport the main process runs a relay listening on a localhost port or a unix
+    socket, and an echo process connects to it; the main process sets "ping" in the root
+    directory, and the echo process sets "pong" to the same value as soon as the ping reaches
+    it.  The round trip (commit, replicate, commit, replicate back) is timed for each ping, and
+    the CPU time both processes spent over the run is reported.
+"""
+from multiprocessing import Process, Pipe
+from pathlib import Path
+from statistics import mean, median
+from tempfile import mkdtemp
+from time import perf_counter, process_time
+import json
+import shutil
+
+from gink import *
+from gink.impl.looping import loop, call_later
+
+
+def run_echo(target: str, count: int, conn):
+    database = Database(MemoryStore())
+    root = Directory(root=True, database=database)
+    database.connect_to(target)
+    state = {"seen": -1}
+
+    def respond():
+        ping = root.get("ping")
+        if ping is not None and ping > state["seen"]:
+            state["seen"] = ping
+            root.set("pong", ping)
+
+    database.add_callback(lambda _: call_later(0, respond))
+    conn.send("ready")
+    started = process_time()
+    while state["seen"] < count - 1:
+        loop(database, until=0.05)
+    loop(database, until=0.1)  # let the last pong go out
+    conn.send(process_time() - started)
+    database.close()
+
+
+def measure(target: str, count: int, **listen_args) -> dict:
+    database = Database(MemoryStore())
+    database.start_listening(**listen_args)
+    root = Directory(root=True, database=database)
+    parent_end, child_end = Pipe()
+    echo = Process(target=run_echo, args=(target, count, child_end))
+    echo.start()
+    parent_end.recv()
+    for _ in range(40):  # until the echo process has connected and caught up
+        loop(database, until=0.05)
+        if any(not connection.is_closed() for connection in database.get_connections()):
+            break
+    root.set("ping", -1)
+    root.set("pong", -1)
+    loop(database, until=0.2)
+    times = []
+    state = {"next": 0, "sent_at": 0.0}
+
+    def send_ping():
+        state["sent_at"] = perf_counter()
+        root.set("ping", state["next"])
+
+    def on_bundle(_):
+        if state["next"] < count and root.get("pong") == state["next"]:
+            times.append(perf_counter() - state["sent_at"])
+            state["next"] += 1
+            if state["next"] < count:
+                call_later(0, send_ping)
+
+    database.add_callback(on_bundle)
+    started = process_time()
+    send_ping()
+    while state["next"] < count:
+        loop(database, until=0.05)
+    relay_cpu = process_time() - started
+    echo_cpu = parent_end.recv()
+    echo.join()
+    for connection in list(database.get_connections()):
+        connection.close()
+    database.close()
+    result = {
+        "mean_ms": round(mean(times) * 1000, 3),
+        "median_ms": round(median(times) * 1000, 3),
+        "cpu_ms_per_round_trip": round((relay_cpu + echo_cpu) / count * 1000, 3),
+    }
+    print(f"{target}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-n", "--count", help="round trips to time for each transport", type=int, default=500)
+    parser.add_argument("-p", "--port", help="localhost port for the tcp listener", type=int, default=18182)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    directory = Path(mkdtemp())
+    socket_path = directory / "relay.sock"
+    try:
+        results = {
+            "tcp": measure(f"ws://127.0.0.1:{args.port}", args.count, addr="127.0.0.1", port=args.port),
+            "unix": measure(f"unix://{socket_path}", args.count, unix_path=socket_path),
+        }
+    finally:
+        shutil.rmtree(directory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
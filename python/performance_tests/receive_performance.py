@@ -0,0 +1,99 @@
+""" Measures how fast a Connection takes in large bundles, and how much it copies doing so.
+
+    A server connection sends bundles of a given size over a socketpair as plain bundle
+    messages; the client reads them with receive_objects until it has them all.  Besides
+    throughput this reports tracemalloc's peak, which shows the intermediate copies made
+    between reading the socket and handing the bundle bytes on to the store (the sender runs
+    in a child process, so its allocations don't count).
+"""
+from socket import socketpair
+from multiprocessing import Process
+from time import perf_counter
+import json
+import tracemalloc
+
+from nacl.signing import SigningKey
+
+from gink.impl.connection import Connection
+from gink.impl.decomposition import Decomposition
+from gink.impl.has_map import HasMap
+from gink.impl.tuples import Chain
+from gink.impl.utilities import combine, generate_timestamp, generate_medallion
+from gink.impl.builders import ChangeBuilder, Behavior
+
+
+def make_bundles(size: int, count: int) -> list:
+    signing_key = SigningKey.generate()
+    chain_start = generate_timestamp()
+    chain = Chain(medallion=generate_medallion(), chain_start=chain_start)
+    bundles = [Decomposition(combine(chain=chain, timestamp=chain_start, signing_key=signing_key, identity="x"))]
+    for i in range(count):
+        change = ChangeBuilder()
+        change.entry.behavior = Behavior.DIRECTORY
+        change.entry.container.timestamp = -1
+        change.entry.container.medallion = -1
+        change.entry.container.offset = Behavior.DIRECTORY
+        change.entry.key.number = i
+        change.entry.value.octets = bytes(size)
+        prior = bundles[-1].get_info()
+        bundles.append(Decomposition(combine(
+            chain=chain, timestamp=generate_timestamp(), signing_key=signing_key,
+            previous=prior.timestamp, prior_hash=prior.digest, changes=[change])))
+    return bundles
+
+
+def measure(size: int, count: int) -> dict:
+    bundles = make_bundles(size, count)
+    server_socket, client_socket = socketpair()
+    greet = lambda _: HasMap().to_greeting_message()
+    server = Connection(socket=server_socket, conn_func=greet, max_batch_count=1)
+    client = Connection(socket=client_socket, is_client=True, conn_func=greet)
+    list(server.receive_objects())
+    list(client.receive_objects())
+    list(server.receive_objects())
+
+    def send_all():
+        for bundle in bundles:
+            server.send_bundle(bundle)
+            while server.wants_write():
+                server.on_write_ready()
+
+    sender = Process(target=send_all)  # a separate process, so only the receiving side is traced
+    sender.start()
+    tracemalloc.start()
+    before = perf_counter()
+    received = 0
+    client_socket.setblocking(True)
+    while received < len(bundles):
+        for thing in client.receive_objects():
+            if isinstance(thing, Decomposition):
+                received += 1
+    elapsed = perf_counter() - before
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sender.join()
+    server.close()
+    client.close()
+    megabytes = size * count / 2**20
+    result = {
+        "seconds": round(elapsed, 4),
+        "mb_per_second": round(megabytes / elapsed, 1),
+        "peak_mb": round(peak / 2**20, 1),
+    }
+    print(f"{count} bundles of {size / 2**20:.1f} MB: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-s", "--sizes", help="bundle sizes in bytes", type=int, nargs="+",
+                        default=[2**16, 2**20, 2**22])
+    parser.add_argument("-n", "--count", help="bundles to send for each size", type=int, default=8)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = {str(size): measure(size, args.count) for size in args.sizes}
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
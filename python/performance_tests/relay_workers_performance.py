@@ -0,0 +1,111 @@
+""" Measures how many bundles per second a relay can take in from many peers, with and without --workers.
+
+    For each worker count this starts `python -m gink <db> --listen_on ... --workers N --loop`,
+    connects a number of client processes that each commit a series of small bundles,
+    and times how long it takes until they've all landed in the shared LMDB file.
+"""
+from datetime import datetime
+from multiprocessing import Process, Event
+from pathlib import Path
+from socket import create_connection
+from subprocess import Popen, DEVNULL
+from time import sleep
+import json
+import os
+import shutil
+import sys
+
+from gink import *
+from gink.impl.looping import loop
+
+
+def run_client(port: int, count: int, started, done):
+    """ Commits count bundles through a connection to the relay, then keeps the connection serviced. """
+    database = Database(MemoryStore())
+    database.connect_to(f"ws://127.0.0.1:{port}")
+    loop(database, until=0.2)
+    root = Directory(root=True, database=database)
+    started.set()
+    for i in range(count):
+        root.set(f"key{i % 10}", i)
+        loop(database, until=0.0)
+    while not done.is_set():
+        loop(database, until=0.05)
+    database.close()
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    for _ in range(int(timeout / 0.05)):
+        try:
+            create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            sleep(0.05)
+    raise TimeoutError(f"nothing listening on {port}")
+
+
+def count_bundles(path: Path) -> int:
+    store = LmdbStore(path)
+    try:
+        return len(store.get_bundle_infos())
+    finally:
+        store.close()
+
+
+def test_workers(directory: Path, port: int, workers: int, clients: int, count: int) -> dict:
+    print(f"Testing {clients} clients sending {count} bundles each to {workers} worker(s).")
+    path = directory / f"workers_{workers}.gink"
+    if path.exists():
+        shutil.rmtree(path) if path.is_dir() else path.unlink()
+    LmdbStore(path).close()
+    server = Popen([sys.executable, "-m", "gink", str(path), "--listen_on", f"127.0.0.1:{port}",
+                    "--workers", str(workers), "--loop", "--verbosity", "WARNING"], stdin=DEVNULL)
+    try:
+        wait_for_port(port)
+        baseline = count_bundles(path)
+        done = Event()
+        starts = [Event() for _ in range(clients)]
+        processes = [Process(target=run_client, args=(port, count, starts[i], done)) for i in range(clients)]
+        for process in processes:
+            process.start()
+        for started in starts:
+            started.wait()
+        before = datetime.now()
+        expected = baseline + clients * (count + 1)  # each client also starts a chain
+        while count_bundles(path) < expected:
+            sleep(0.05)
+        after = datetime.now()
+        done.set()
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    total_time = round((after - before).total_seconds(), 4)
+    per_second = round(clients * count / total_time, 2)
+    print(f"- {workers} worker(s): {total_time} seconds ({per_second} bundles per second)\n")
+    return {"total_time": total_time, "per_second": per_second}
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-w", "--workers", help="worker counts to compare", type=int, nargs="+",
+                        default=[1, os.cpu_count() or 1])
+    parser.add_argument("-c", "--clients", help="number of client processes", type=int, default=8)
+    parser.add_argument("-n", "--count", help="bundles committed per client", type=int, default=500)
+    parser.add_argument("-p", "--port", help="port for the relay to listen on", type=int, default=18181)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    parser.add_argument("-d", "--dir", help="directory for temporary database", default="./perf_test_temp", type=Path)
+    args: Namespace = parser.parse_args()
+    try:
+        os.mkdir(args.dir)
+    except FileExistsError:
+        pass
+    results = {}
+    for worker_count in args.workers:
+        results[str(worker_count)] = test_workers(args.dir, args.port, worker_count, args.clients, args.count)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -0,0 +1,60 @@
+""" Compares serving --subscribers event streams of one directory with SseFeed and with an encoding per stream.
+
+    Each subscriber is a Connection (over a socketpair) that has asked for the directory's
+    changes, and --count commits each set a few keys in it.  SseFeed serializes each event
+    once and queues the same bytes on every connection; the alternative subscribes each
+    connection separately and serializes the event for each of them.
+"""
+from socket import socketpair
+from time import perf_counter
+import json
+
+from gink import Database, MemoryStore, Directory, SseFeed
+from gink.impl.connection import Connection
+from gink.impl.sse_feed import encode_event
+
+
+def measure(subscribers: int, count: int, shared: bool) -> dict:
+    database = Database(MemoryStore())
+    directory = Directory(database=database)
+    feed = SseFeed(database, max_queued_bytes=2**30)
+    sockets = []
+    for _ in range(subscribers):
+        server_socket, client_socket = socketpair()
+        sockets.append(client_socket)
+        connection = Connection(socket=server_socket, sse_feed=feed)
+        if shared:
+            client_socket.sendall(f"GET /changes/{directory.get_muid()} HTTP/1.1\r\n\r\n".encode())
+            connection.on_ready()
+        else:
+            server_socket.setblocking(False)
+            database.subscribe(directory, lambda event, c=connection: c.send_event(encode_event(event)))
+    before = perf_counter()
+    for i in range(count):
+        with database.bundler() as bundler:
+            for key in range(4):
+                directory.set(key, i, bundler=bundler)
+    elapsed = perf_counter() - before
+    for client_socket in sockets:
+        client_socket.close()
+    result = {"seconds": round(elapsed, 4), "commits_per_second": round(count / elapsed, 1)}
+    print(f"{subscribers} subscribers, shared={shared}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-s", "--subscribers", help="numbers of subscribers to try", type=int, nargs="+",
+                        default=[10, 100, 500])
+    parser.add_argument("-n", "--count", help="commits to make for each", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = {
+        str(subscribers): {str(shared): measure(subscribers, args.count, shared) for shared in (False, True)}
+        for subscribers in args.subscribers
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -0,0 +1,61 @@
+""" Compares routing bundles to per-container subscribers with Database.subscribe and with add_callback.
+
+    There are --subscribers directories, each with one subscriber interested only in it, and
+    --count commits each setting a few keys in one of them.  With add_callback every subscriber
+    gets every bundle and walks its changes looking for its container; with subscribe the
+    changes are grouped by container once and only the interested subscriber is called.
+"""
+from time import perf_counter
+import json
+
+from gink import Database, MemoryStore, Directory, Muid
+
+
+def measure(subscribers: int, count: int, indexed: bool) -> dict:
+    database = Database(MemoryStore())
+    directories = [Directory(database=database) for _ in range(subscribers)]
+    received = [0]
+
+    def on_changes(_):
+        received[0] += 1
+
+    for directory in directories:
+        if indexed:
+            database.subscribe(directory, on_changes)
+        else:
+            def on_bundle(decomposition, muid=directory.get_muid()):
+                info = decomposition.get_info()
+                found = [change for change in decomposition.get_builder().changes
+                         if change.HasField("entry") and Muid.create(info, change.entry.container) == muid]
+                if found:
+                    on_changes(found)
+            database.add_callback(on_bundle)
+    before = perf_counter()
+    for i in range(count):
+        directory = directories[i % subscribers]
+        with database.bundler() as bundler:
+            for key in range(4):
+                directory.set(key, i, bundler=bundler)
+    elapsed = perf_counter() - before
+    assert received[0] == count
+    result = {"seconds": round(elapsed, 4), "commits_per_second": round(count / elapsed, 1)}
+    print(f"{subscribers} subscribers, indexed={indexed}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-s", "--subscribers", help="numbers of subscribers to try", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("-n", "--count", help="commits to make for each", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    results = {
+        str(subscribers): {str(indexed): measure(subscribers, args.count, indexed) for indexed in (False, True)}
+        for subscribers in args.subscribers
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
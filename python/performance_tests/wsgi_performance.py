@@ -0,0 +1,85 @@
+""" Measures requests per second through the built-in WSGI path, with and without keep-alive.
+
+    A WsgiListener serving a small app runs in a child process; the main process sends
+    requests over raw sockets in three ways: a new connection for every request (as before
+    keep-alive was supported), one keep-alive connection with a request at a time, and one
+    connection with requests pipelined in groups of --depth.  With --threads the app is run on a
+    pool of worker threads rather than in the loop, which shows the cost of handing requests off.
+"""
+from multiprocessing import Process, set_start_method
+from socket import create_connection
+from time import perf_counter, sleep
+import json
+
+from gink.impl.wsgi_listener import WsgiListener
+from gink.impl.looping import loop
+
+
+def app(_, start_response):
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return [b'hello']
+
+
+REQUEST = b"GET /hello HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+def read_responses(sock, count: int, buffered: bytes = b"") -> bytes:
+    """ Reads count responses of the app above, returning any bytes past them. """
+    for _ in range(count):
+        while True:
+            head_end = buffered.find(b"\r\n\r\n")
+            if head_end >= 0 and len(buffered) >= head_end + 4 + 5:
+                break
+            data = sock.recv(2**16)
+            if not data:
+                raise ConnectionError("server hung up")
+            buffered += data
+        buffered = buffered[head_end + 4 + 5:]
+    return buffered
+
+
+def measure(port: int, count: int, mode: str, depth: int) -> dict:
+    before = perf_counter()
+    if mode == "new_connection":
+        for _ in range(count):
+            with create_connection(("127.0.0.1", port)) as sock:
+                sock.sendall(b"GET /hello HTTP/1.0\r\n\r\n")
+                while sock.recv(2**16):
+                    pass
+    else:
+        group = depth if mode == "pipelined" else 1
+        with create_connection(("127.0.0.1", port)) as sock:
+            rest = b""
+            for _ in range(count // group):
+                sock.sendall(REQUEST * group)
+                rest = read_responses(sock, group, rest)
+    elapsed = perf_counter() - before
+    result = {"seconds": round(elapsed, 4), "requests_per_second": round(count / elapsed, 1)}
+    print(f"{mode}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, Namespace
+
+    parser: ArgumentParser = ArgumentParser(allow_abbrev=False)
+    parser.add_argument("-n", "--count", help="requests to send in each mode", type=int, default=5000)
+    parser.add_argument("-d", "--depth", help="requests per pipelined write", type=int, default=16)
+    parser.add_argument("-p", "--port", help="localhost port to serve on", type=int, default=18183)
+    parser.add_argument("-t", "--threads", help="wsgi worker threads (default: run in the loop)", type=int, default=0)
+    parser.add_argument("-o", "--output", help="json file to save output. default to no file, stdout")
+    args: Namespace = parser.parse_args()
+    set_start_method("fork")
+    server = Process(target=loop, args=[WsgiListener(app, ip_addr="127.0.0.1", port=args.port, threads=args.threads)])
+    server.start()
+    sleep(0.2)
+    try:
+        results = {
+            mode: measure(args.port, args.count, mode, args.depth)
+            for mode in ("new_connection", "keep_alive", "pipelined")
+        }
+    finally:
+        server.terminate()
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results))
@@ -40,6 +40,7 @@ setup(
         "test": ["pytest", "flask"],
         "lint": ["mypy"],
         "performance": ["matplotlib"],
+        "numpy": ["numpy"],
         "docs": [
             "sphinx",
             "myst-parser",